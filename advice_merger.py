@@ -0,0 +1,229 @@
+import json
+import math
+import os
+
+import instrumentation
+from gemini_query import parse_advice
+
+BUY_ACTIONS = {"Buy"}
+SELL_ACTIONS = {"Sell", "Reduce", "Close"}
+STOP_ACTIONS = {"Fix Stop", "Add Stop"}
+
+# Confidence points a BUY loses per unit of (positive) correlation with the portfolio,
+# so with a risk model a BUY that moves in lockstep with the holdings ranks 3 points lower
+CONCENTRATION_PENALTY = 3.0
+
+
+def merge_advice(advices, portfolio, quotes=None, risk=None, penalty=CONCENTRATION_PENALTY):
+    """
+    Turns per-ticker structured advice into one list of actions that fits the
+    cash budget - the deterministic replacement for the second Gemini call.
+
+    SELLs are counted first (at the low end of their price range) and add to the
+    budget. BUYs are then funded by confidence, highest first, at the high end
+    of their range; a BUY that doesn't fit entirely is cut to the whole shares
+    the remaining budget affords (a partial buy) or skipped. With a risk model,
+    each BUY's confidence is lowered by `penalty` times its correlation with the
+    portfolio (after the SELLs), so concentrated BUYs are funded last.
+
+    Args:
+        advices (list): Advice dicts as returned by `gemini_query.parse_advice`.
+        portfolio (dict): Portfolio data with `cash_usd` and `positions`.
+        quotes (QuoteService): Prices actions that come without a price range.
+        risk (RiskModel): Covariance of the positions and BUY candidates (see risk.py).
+        penalty (float): Confidence points per unit of correlation with the portfolio.
+
+    Returns:
+        dict: {"rows": [...], "total_buy", "total_sell", "cash", "cash_after"}, plus
+              "portfolio_vol" / "portfolio_vol_after" with a risk model. Each row has
+              symbol, action, qty, requested_qty, price, stop_price, confidence,
+              reason and note; BUY rows also get "risk" (see `RiskModel.buy_risk`).
+    """
+    shares = {p["symbol"]: p["shares"] for p in portfolio.get("positions", [])}
+    rows = []
+    for advice in advices:
+        for item in advice.get("actions", []):
+            rows.append(_row(advice.get("symbol"), item, shares))
+
+    # 1. Price what the model left unpriced, in one batch
+    unpriced = [r["symbol"] for r in rows if r["price"] is None and r["action"] in BUY_ACTIONS | SELL_ACTIONS]
+    if unpriced and quotes is not None:
+        prices = quotes.get_prices(unpriced)
+        for row in rows:
+            if row["price"] is None:
+                row["price"] = prices.get(row["symbol"])
+
+    # 2. SELLs free cash
+    cash = float(portfolio.get("cash_usd", 0.0))
+    total_sell = 0.0
+    for row in rows:
+        if row["action"] in SELL_ACTIONS:
+            if row["price"] is None:
+                row["note"] = "no price - not counted"
+                continue
+            total_sell += row["qty"] * row["price"]
+
+    # 3. BUYs by confidence (less the concentration penalty) until the budget runs out
+    budget = cash + total_sell
+    total_buy = 0.0
+    buys = [r for r in rows if r["action"] in BUY_ACTIONS]
+    if risk is not None:
+        weights, equity = _portfolio_weights(rows, portfolio, risk, cash)
+        buy_risk = risk.buy_risk(weights, {r["symbol"]: r["requested_qty"] * r["price"] / equity
+                                           for r in buys if r["price"] and equity})
+        for row in buys:
+            row["risk"] = buy_risk.get(row["symbol"])
+    buys.sort(key=lambda r: -_priority(r, penalty))
+    for row in buys:
+        if not row["price"]:
+            row["qty"] = 0
+            row["note"] = "skipped - no price"
+            continue
+        affordable = math.floor(max(budget - total_buy, 0.0) / row["price"])
+        if affordable < row["requested_qty"]:
+            row["qty"] = affordable
+            row["note"] = f"partial - {affordable:g} of {row['requested_qty']:g} (budget)" if affordable \
+                else "skipped - budget"
+        total_buy += row["qty"] * row["price"]
+
+    merged = {"rows": rows, "total_buy": total_buy, "total_sell": total_sell,
+              "cash": cash, "cash_after": cash + total_sell - total_buy}
+    if risk is not None and risk.symbols:
+        funded = {}
+        for row in buys:
+            if row["qty"]:
+                funded[row["symbol"]] = funded.get(row["symbol"], 0.0) + row["qty"] * row["price"]
+        merged["portfolio_vol"] = risk.portfolio_vol(weights)
+        merged["portfolio_vol_after"] = risk.portfolio_vol(weights + risk.exposure(funded, equity))
+    return merged
+
+
+def _portfolio_weights(rows, portfolio, risk, cash):
+    """Position weights after the counted SELLs, valued at the latest close, and the total equity."""
+    values = {}
+    for p in portfolio.get("positions", []):
+        price = risk.last_close.get(p["symbol"], p.get("avg_cost") or 0.0)
+        values[p["symbol"]] = values.get(p["symbol"], 0.0) + p["shares"] * price
+    equity = cash + sum(values.values())
+    for row in rows:
+        if row["action"] in SELL_ACTIONS and row["price"] is not None and row["symbol"] in values:
+            values[row["symbol"]] -= row["qty"] * risk.last_close.get(row["symbol"], row["price"])
+    return risk.exposure(values, equity), equity
+
+
+def _priority(row, penalty):
+    corr = (row.get("risk") or {}).get("corr_to_portfolio")
+    return (row["confidence"] or 0) - penalty * max(corr or 0.0, 0.0)
+
+
+def _row(symbol, item, shares):
+    action = item.get("action", "Hold")
+    qty = item.get("qty") or 0
+    if action == "Close" or (action in STOP_ACTIONS and not qty):
+        qty = shares.get(symbol, qty)
+    low, high = item.get("price_low"), item.get("price_high")
+    # Conservative: pay the top of a BUY range, receive the bottom of a SELL range
+    if action in BUY_ACTIONS:
+        price = high or low
+    else:
+        price = low or high
+    return {
+        "symbol": symbol,
+        "action": action,
+        "qty": qty,
+        "requested_qty": qty,
+        "price": price,
+        "stop_price": item.get("stop_price"),
+        "confidence": item.get("confidence"),
+        "reason": item.get("reason", ""),
+        "note": "",
+    }
+
+
+def to_order_actions(merged):
+    """Rows that change orders, in the format `order_engine.OrderEngine` takes."""
+    actions = []
+    for row in merged["rows"]:
+        # Nothing to send for holds, unfunded buys or stops without shares
+        if row["action"] not in BUY_ACTIONS | SELL_ACTIONS | STOP_ACTIONS or not row["qty"]:
+            continue
+        action = {"symbol": row["symbol"], "action": row["action"], "qty": row["qty"]}
+        if row["action"] not in STOP_ACTIONS and row["price"]:
+            action["limit_price"] = row["price"]
+        if row["stop_price"]:
+            action["stop_price"] = row["stop_price"]
+        actions.append(action)
+    return actions
+
+
+def format_actions_table(merged):
+    lines = [f"{'SYMBOL':<7} {'ACTION':<9} {'QTY':>7} {'PRICE':>10} {'STOP':>10} {'CONF':>4}  REASON"]
+    for row in merged["rows"]:
+        price = f"{row['price']:.2f}" if row["price"] else ""
+        stop = f"{row['stop_price']:.2f}" if row["stop_price"] else ""
+        reason = row["reason"] + (f" [{row['note']}]" if row["note"] else "")
+        corr = (row.get("risk") or {}).get("corr_to_portfolio")
+        if corr is not None:
+            reason += f" [corr {corr:.2f} to portfolio]"
+        lines.append(f"{row['symbol']:<7} {row['action']:<9} {row['qty']:>7g} {price:>10} {stop:>10} "
+                     f"{row['confidence'] if row['confidence'] is not None else '':>4}  {reason}")
+    lines.append("")
+    lines.append(f"Total BUY: ${merged['total_buy']:,.2f}")
+    lines.append(f"Total SELL: ${merged['total_sell']:,.2f}")
+    lines.append(f"Cash: ${merged['cash']:,.2f} -> ${merged['cash_after']:,.2f} after these actions")
+    if "portfolio_vol" in merged:
+        lines.append(f"Portfolio volatility (annualized): {merged['portfolio_vol']:.1%} -> "
+                     f"{merged['portfolio_vol_after']:.1%} after these actions")
+    return "\n".join(lines)
+
+
+@instrumentation.traced("merge")
+def merge_advice_files(portfolio, dir_path="gemini_output", quotes=None, store=None, interval="1wk"):
+    """
+    Merges every `<SYMBOL>-advice.json` in `dir_path` and writes
+    `merged-actions.txt` (the table) and `actions.json` (input for the order engine).
+
+    Args:
+        portfolio (dict): Portfolio data with `cash_usd` and `positions`.
+        dir_path (str): Folder holding the structured advice files.
+        quotes (QuoteService): Prices actions that come without a price range.
+        store (BarStore): When given, the positions' and BUYs' stored bars of
+                          `interval` feed a risk model that penalizes concentrated BUYs.
+
+    Returns:
+        dict: The merge result (see `merge_advice`), or None without advice files.
+    """
+    advices = []
+    for fname in sorted(os.listdir(dir_path)):
+        if not fname.endswith("-advice.json"):
+            continue
+        with open(os.path.join(dir_path, fname), "r", encoding="utf-8") as f:
+            advice = parse_advice(f.read())
+        if advice is None:
+            print(f"Warning: skipping {fname} (not valid advice JSON)")
+            continue
+        advice.setdefault("symbol", fname[:-len("-advice.json")])
+        advices.append(advice)
+
+    if not advices:
+        print(f"No structured advice files found in `{dir_path}`.")
+        return None
+
+    risk = None
+    if store is not None:
+        from risk import load_risk_model
+
+        symbols = [p["symbol"] for p in portfolio.get("positions", [])] + [a["symbol"] for a in advices]
+        with instrumentation.span("merge.risk", tickers=len(symbols)):
+            risk = load_risk_model(symbols, store, interval=interval)
+    merged = merge_advice(advices, portfolio, quotes=quotes, risk=risk)
+    table = format_actions_table(merged)
+    out_path = os.path.join(dir_path, "merged-actions.txt")
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(table)
+    with open(os.path.join(dir_path, "actions.json"), "w", encoding="utf-8") as f:
+        json.dump(to_order_actions(merged), f, indent=2)
+    instrumentation.record_bytes("merge", len(table.encode("utf-8")))
+    print(table)
+    print(f"Wrote merged actions to {out_path}")
+    return merged
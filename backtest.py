@@ -0,0 +1,270 @@
+"""
+Walk-forward backtest of stop-loss rules and buy ranges over a ticker x time panel.
+
+At every signal bar a limit buy is placed some offset below the close. It fills
+when a later bar trades down to it (at the open on a gap down). A stop is set
+from information available at the signal bar, and the position is held until
+the stop is hit (at the open on a gap through it) or for `horizon` bars. Every
+(entry offset, stop rule, ticker, signal bar) combination is simulated at
+once with NumPy array ops; the simulation only loops over ticker chunks, to
+bound memory. The volume profile stop levels are the exception: they are built
+with one `volume_profiles` pass (over all tickers) per signal bar.
+"""
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from screener import build_panel
+from stocks_data import OHLCV_COLUMNS, atr_matrix, load_history
+from volume_profile import volume_profiles
+
+STOP_KINDS = ("percent", "atr", "swing_low", "volume_profile")
+
+# (kind, value): percent below entry, ATR multiple below entry, lowest Low of the
+# last `value` bars, or a volume profile level ("poc" / "value_area_low")
+DEFAULT_STOP_RULES = [
+    ("percent", 0.05), ("percent", 0.08), ("percent", 0.12),
+    ("atr", 1.5), ("atr", 2.0), ("atr", 3.0),
+    ("swing_low", 5), ("swing_low", 10), ("swing_low", 20),
+    ("volume_profile", "value_area_low"), ("volume_profile", "poc"),
+]
+
+# Buy limit as a share below the signal bar's close
+DEFAULT_ENTRY_OFFSETS = (0.0, 0.02, 0.05)
+
+# Stops closer to the entry than this share of it don't count as trades
+MIN_RISK_PCT = 0.005
+
+# Tickers simulated per array pass
+CHUNK_SIZE = 256
+
+
+def stop_label(rule):
+    kind, value = rule
+    if kind == "percent":
+        return f"percent {value:.0%}"
+    if kind == "atr":
+        return f"atr {value:g}x"
+    return f"{kind} {value}"
+
+
+def backtest(panel, stop_rules=DEFAULT_STOP_RULES, entry_offsets=DEFAULT_ENTRY_OFFSETS, horizon=12,
+             entry_window=2, step=1, warmup=50, signals=None, profile_bins=50, profile_lookback=90,
+             min_risk_pct=MIN_RISK_PCT, by_ticker=False, chunk_size=CHUNK_SIZE):
+    """
+    Simulates every entry offset x stop rule on every ticker and signal bar.
+
+    Args:
+        panel (dict): Field -> DataFrame (dates x tickers) with Open, High, Low, Close
+                      and Volume, as returned by `screener.build_panel`.
+        stop_rules (list): (kind, value) tuples, see DEFAULT_STOP_RULES.
+        entry_offsets (tuple): Buy limits as shares below the signal close.
+        horizon (int): Bars a filled position is held when the stop isn't hit.
+        entry_window (int): Bars after the signal bar the limit buy stays open.
+        step (int): Walk-forward step between signal bars.
+        warmup (int): First signal bar (indicators need history).
+        signals (DataFrame): Optional boolean entry signal, shaped like the panel;
+                             only bars where it is True are traded.
+        profile_bins, profile_lookback (int): Volume profile for the volume_profile stops.
+        min_risk_pct (float): Trades whose stop is closer than this share of the entry
+                              are skipped (R-multiples of near-zero risk are meaningless).
+        by_ticker (bool): Report one row per (offset, rule, ticker) instead of per (offset, rule).
+        chunk_size (int): Tickers simulated per array pass.
+
+    Returns:
+        DataFrame: One row per entry offset x stop rule (x ticker) with
+                   signals, trades, fill_rate, stop_hit_rate, win_rate, avg_r,
+                   total_r, avg_risk_pct, avg_drawdown and worst_drawdown (adverse
+                   excursion from entry, as a share) and max_drawdown_r (peak to
+                   trough of the cumulative R over the signal bars).
+    """
+    for kind, _ in stop_rules:
+        if kind not in STOP_KINDS:
+            raise ValueError(f"Unknown stop rule: {kind}")
+    tickers = list(panel["Close"].columns)
+    open_, high, low, close, volume = (panel[f].to_numpy(dtype=float).T for f in OHLCV_COLUMNS)
+    n_bars = close.shape[1]
+    signal_bars = np.arange(warmup, n_bars - entry_window - horizon, step)
+    if not len(signal_bars):
+        raise ValueError(f"Not enough bars ({n_bars}) for warmup={warmup}, entry_window={entry_window}, "
+                         f"horizon={horizon}")
+
+    # 1. Stop inputs known at each signal bar, for every ticker
+    atr = atr_matrix(high, low, close)
+    levels = {}
+    for kind, value in stop_rules:
+        if kind == "atr":
+            levels[(kind, value)] = atr[:, signal_bars] * value
+        elif kind == "swing_low":
+            levels[(kind, value)] = panel["Low"].rolling(value).min().to_numpy(dtype=float).T[:, signal_bars]
+    profile_rules = [value for kind, value in stop_rules if kind == "volume_profile"]
+    if profile_rules:
+        # Every window has its own bin edges, so nothing carries over between signal bars.
+        # Stacking all windows into one call gives the same levels but is ~2x slower
+        # (memory bound), so this stays one call per signal bar.
+        profiles = [volume_profiles(high[:, :s + 1], low[:, :s + 1], volume[:, :s + 1],
+                                    bins=profile_bins, lookback=profile_lookback) for s in signal_bars]
+        for value in profile_rules:
+            levels[("volume_profile", value)] = np.stack([p[value] for p in profiles], axis=1)
+
+    traded = np.isfinite(close[:, signal_bars])
+    if signals is not None:
+        traded &= signals.reindex(index=panel["Close"].index, columns=tickers).fillna(False) \
+            .to_numpy(dtype=bool).T[:, signal_bars]
+
+    # 2. Simulate ticker chunks, accumulating the statistics
+    offsets = np.asarray(entry_offsets, dtype=float)
+    totals, per_ticker = None, []
+    for start in range(0, len(tickers), chunk_size):
+        rows = slice(start, start + chunk_size)
+        trades = _simulate(open_[rows], high[rows], low[rows], close[rows], signal_bars, offsets, stop_rules,
+                           {rule: level[rows] for rule, level in levels.items()}, horizon, entry_window,
+                           min_risk_pct)
+        trades["traded"] = np.broadcast_to(traded[rows], trades["filled"].shape)
+        if by_ticker:
+            per_ticker.append(_reduce(trades, axis=(3,)))
+        else:
+            chunk = _reduce(trades, axis=(2, 3))
+            totals = chunk if totals is None else _combine(totals, chunk)
+
+    # 3. Report
+    labels = [stop_label(rule) for rule in stop_rules]
+    if by_ticker:
+        stats = {key: np.concatenate([p[key] for p in per_ticker], axis=2) for key in per_ticker[0]}
+        index = pd.MultiIndex.from_product([offsets, labels, tickers], names=["entry_offset", "stop", "ticker"])
+    else:
+        stats = totals
+        index = pd.MultiIndex.from_product([offsets, labels], names=["entry_offset", "stop"])
+    return _report(stats, index)
+
+
+def _simulate(open_, high, low, close, signal_bars, offsets, stop_rules, levels, horizon, entry_window,
+              min_risk_pct):
+    """
+    Trade outcomes shaped (offsets, stop rules, tickers, signal bars).
+
+    Stops are checked from the bar after the fill; whether the fill bar itself
+    traded through the stop can't be told from OHLC bars.
+    """
+    rows = np.arange(close.shape[0])[None, :, None]
+
+    # Entry: first bar within the window that trades down to the limit
+    limit = close[:, signal_bars][None] * (1 - offsets[:, None, None])
+    window = signal_bars[:, None] + 1 + np.arange(entry_window)
+    touched = low[:, window][None] <= limit[..., None]
+    filled = touched.any(axis=-1)
+    fill_bar = signal_bars + 1 + touched.argmax(axis=-1)
+    fill_open = open_[rows, fill_bar]
+    entry = np.where(fill_open < limit, fill_open, limit)
+
+    # Stop levels, (offsets, rules, tickers, signal bars)
+    stops = []
+    for kind, value in stop_rules:
+        if kind == "percent":
+            stops.append(entry * (1 - value))
+        elif kind == "atr":
+            stops.append(entry - levels[(kind, value)][None])
+        else:
+            stops.append(np.broadcast_to(levels[(kind, value)][None], entry.shape))
+    stop = np.stack(stops, axis=1)
+    entry = entry[:, None]
+
+    # Holding period: the `horizon` bars after the fill
+    hold = fill_bar[..., None] + 1 + np.arange(horizon)
+    hold_low = low[rows[..., None], hold][:, None]
+    hit = hold_low <= stop[..., None]
+    stopped = hit.any(axis=-1)
+    hold_open = open_[rows[..., None], hold][:, None]
+    hit_open = np.take_along_axis(hold_open, hit.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    last_close = close[rows, hold[..., -1]][:, None]
+    exit_price = np.where(stopped, np.minimum(hit_open, stop), last_close)
+
+    risk = entry - stop
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = filled[:, None] & np.isfinite(stop) & (risk >= min_risk_pct * entry) & np.isfinite(exit_price)
+        r_multiple = np.where(valid, (exit_price - entry) / risk, np.nan)
+        # Worst price while held: the exit when stopped (earlier lows were above the stop)
+        worst = np.where(stopped, exit_price, np.min(hold_low, axis=-1))
+        drawdown = np.where(valid, np.minimum(worst - entry, 0.0) / entry, np.nan)
+        risk_pct = np.where(valid, risk / entry, np.nan)
+
+    return {
+        "filled": np.broadcast_to(filled[:, None], valid.shape),
+        "valid": valid,
+        "stopped": stopped & valid,
+        "r": r_multiple,
+        "drawdown": drawdown,
+        "risk_pct": risk_pct,
+    }
+
+
+def _reduce(trades, axis, signal_axis=3):
+    """Sums (and minima) of the trade arrays over `axis`; cumulative R per signal bar."""
+    traded = trades["traded"]
+    valid = trades["valid"] & traded
+    r = np.where(valid, trades["r"], 0.0)
+    return {
+        "signals": traded.sum(axis=axis),
+        "filled": (trades["filled"] & traded).sum(axis=axis),
+        "trades": valid.sum(axis=axis),
+        "stopped": (trades["stopped"] & traded).sum(axis=axis),
+        "wins": (valid & (r > 0)).sum(axis=axis),
+        "total_r": r.sum(axis=axis),
+        "risk_pct": np.where(valid, trades["risk_pct"], 0.0).sum(axis=axis),
+        "drawdown": np.where(valid, trades["drawdown"], 0.0).sum(axis=axis),
+        "worst_drawdown": np.where(valid, trades["drawdown"], 0.0).min(axis=axis),
+        # R per signal bar (summed over the reduced tickers), for the equity drawdown
+        "r_by_bar": r.sum(axis=tuple(a for a in axis if a != signal_axis)),
+    }
+
+
+def _combine(a, b):
+    combined = {key: a[key] + b[key] for key in a}
+    combined["worst_drawdown"] = np.minimum(a["worst_drawdown"], b["worst_drawdown"])
+    return combined
+
+
+def _report(stats, index):
+    trades = stats["trades"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        equity = np.cumsum(stats["r_by_bar"], axis=-1)
+        max_drawdown_r = (np.maximum.accumulate(np.maximum(equity, 0.0), axis=-1) - equity).max(axis=-1)
+        columns = {
+            "signals": stats["signals"],
+            "trades": trades,
+            "fill_rate": stats["filled"] / stats["signals"],
+            "stop_hit_rate": stats["stopped"] / trades,
+            "win_rate": stats["wins"] / trades,
+            "avg_r": stats["total_r"] / trades,
+            "total_r": stats["total_r"],
+            "max_drawdown_r": max_drawdown_r,
+            "avg_risk_pct": stats["risk_pct"] / trades,
+            "avg_drawdown": stats["drawdown"] / trades,
+            "worst_drawdown": stats["worst_drawdown"],
+        }
+    return pd.DataFrame({name: np.asarray(values).ravel() for name, values in columns.items()}, index=index)
+
+
+@instrumentation.traced("backtest")
+def run_backtest(tickers, interval="1wk", download=None, store=None, refresh=False, **kwargs):
+    """
+    Loads the tickers' 5y history through the bar store and runs `backtest` on it.
+
+    Args:
+        tickers (list): Symbols to test.
+        interval (str): Bar interval ("1wk" or "1d"); `horizon` etc. count these bars.
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        store (BarStore): Bar store to use, defaults to `BarStore()`.
+        refresh (bool): Re-download the full history instead of only new bars.
+        **kwargs: Passed on to `backtest`.
+
+    Returns:
+        DataFrame: See `backtest`.
+    """
+    frames, errors = load_history(tickers, period="5y", interval=interval, download=download,
+                                  store=store, refresh=refresh)
+    for ticker, error in errors.items():
+        print(f"Warning: {error} for {ticker}, not tested")
+    if not frames:
+        return pd.DataFrame()
+    return backtest(build_panel(frames, fields=OHLCV_COLUMNS), **kwargs)
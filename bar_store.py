@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from indicator_state import INDICATOR_COLUMNS, IndicatorState
+
+DEFAULT_DB_PATH = os.path.join("data", "bars.sqlite")
+
+
+class BarStore:
+    """
+    Local on-disk OHLCV history, one series per (ticker, interval).
+
+    Bars are keyed by their start date, so re-saving a bar (e.g. the still-forming
+    current week) overwrites the previous version instead of duplicating it.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        # WAL + NORMAL sync: many small per-ticker commits without an fsync each
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (ticker, interval, date)
+            )
+        """)
+        # Streaming indicator state (see indicator_state.py) and the values it produced
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS indicator_state (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                last_date TEXT NOT NULL,
+                last_close REAL NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (ticker, interval)
+            )
+        """)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS indicator_values (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                date TEXT NOT NULL,
+                {", ".join(f"{col} REAL" for col in INDICATOR_COLUMNS)},
+                PRIMARY KEY (ticker, interval, date)
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def last_bar_date(self, ticker, interval):
+        """Returns the date of the newest stored bar, or None if nothing is stored."""
+        row = self.conn.execute(
+            "SELECT MAX(date) FROM bars WHERE ticker = ? AND interval = ?",
+            (ticker, interval)
+        ).fetchone()
+        return pd.Timestamp(row[0]) if row and row[0] else None
+
+    def tail(self, ticker, interval, count):
+        """Returns the newest `count` stored bars (oldest first), like `load`."""
+        df = pd.read_sql_query(
+            "SELECT date, open, high, low, close, volume FROM bars WHERE ticker = ? AND interval = ? "
+            "ORDER BY date DESC LIMIT ?",
+            self.conn, params=[ticker, interval, count]
+        ).iloc[::-1]
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.set_index("date")
+        df.index.name = "Date"
+        df.columns = ["Open", "High", "Low", "Close", "Volume"]
+        return df
+
+    def load(self, ticker, interval, start=None):
+        """
+        Loads stored bars as a DataFrame indexed by Date with OHLCV columns.
+
+        Args:
+            ticker (str): Ticker symbol.
+            interval (str): yfinance interval string, e.g. "1wk".
+            start (Timestamp): Optional first date to include.
+        """
+        query = "SELECT date, open, high, low, close, volume FROM bars WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        query += " ORDER BY date"
+
+        df = pd.read_sql_query(query, self.conn, params=params)
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.set_index("date")
+        df.index.name = "Date"
+        df.columns = ["Open", "High", "Low", "Close", "Volume"]
+        return df
+
+    def save(self, ticker, interval, df, replace=False):
+        """
+        Stores freshly fetched bars for a ticker.
+
+        The fetched range replaces whatever was stored from its first date onward,
+        which drops stale partial bars. With `replace`, the whole stored series is
+        dropped first.
+        """
+        if df.empty:
+            return
+        rows = [
+            (ticker, interval, idx.strftime('%Y-%m-%d'),
+             _to_float(row.get("Open")), _to_float(row.get("High")), _to_float(row.get("Low")),
+             _to_float(row.get("Close")), _to_float(row.get("Volume")))
+            for idx, row in zip(df.index, df.to_dict("records"))
+        ]
+        rows.sort(key=lambda r: r[2])
+        with self.conn:
+            if replace:
+                self.clear(ticker, interval, commit=False)
+            else:
+                self.conn.execute(
+                    "DELETE FROM bars WHERE ticker = ? AND interval = ? AND date >= ?",
+                    (ticker, interval, rows[0][2])
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def clear(self, ticker=None, interval=None, commit=True):
+        """Deletes stored bars, optionally limited to one ticker and/or interval."""
+        query, params = "DELETE FROM bars WHERE 1 = 1", []
+        if ticker is not None:
+            query += " AND ticker = ?"
+            params.append(ticker)
+        if interval is not None:
+            query += " AND interval = ?"
+            params.append(interval)
+        self.conn.execute(query, params)
+        if commit:
+            self.conn.commit()
+
+    def load_indicator_state(self, ticker, interval):
+        """
+        Returns (state, last_date, last_close) for the stored indicator state,
+        or (None, None, None) if there is none.
+        """
+        row = self.conn.execute(
+            "SELECT last_date, last_close, state FROM indicator_state WHERE ticker = ? AND interval = ?",
+            (ticker, interval)
+        ).fetchone()
+        if not row:
+            return None, None, None
+        return IndicatorState.from_dict(json.loads(row[2])), pd.Timestamp(row[0]), row[1]
+
+    def load_indicator_values(self, ticker, interval, start=None):
+        """Loads stored indicator values as a DataFrame indexed by Date."""
+        query = (f"SELECT date, {', '.join(INDICATOR_COLUMNS)} FROM indicator_values "
+                 "WHERE ticker = ? AND interval = ?")
+        params = [ticker, interval]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        query += " ORDER BY date"
+
+        rows = self.conn.execute(query, params).fetchall()
+        index = pd.to_datetime([row[0] for row in rows]).rename("Date")
+        return pd.DataFrame([row[1:] for row in rows], index=index, columns=INDICATOR_COLUMNS, dtype=float)
+
+    def save_indicators(self, ticker, interval, values, state=None, last_date=None, last_close=None):
+        """
+        Upserts indicator rows (dict of date -> {column: value}) and, if given, the
+        state they were computed with, in one transaction.
+        """
+        rows = [
+            (ticker, interval, pd.Timestamp(date).strftime('%Y-%m-%d'),
+             *(_to_float(row.get(col)) for col in INDICATOR_COLUMNS))
+            for date, row in values.items()
+        ]
+        placeholders = ", ".join("?" * (len(INDICATOR_COLUMNS) + 3))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO indicator_values VALUES ({placeholders})", rows)
+            if state is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?, ?, ?)",
+                    (ticker, interval, pd.Timestamp(last_date).strftime('%Y-%m-%d'), float(last_close),
+                     json.dumps(state.to_dict()))
+                )
+
+    def clear_indicators(self, ticker, interval):
+        """Drops the indicator state and values of one series (forces a rebuild)."""
+        with self.conn:
+            for table in ("indicator_state", "indicator_values"):
+                self.conn.execute(f"DELETE FROM {table} WHERE ticker = ? AND interval = ?", (ticker, interval))
+
+
+def _to_float(value):
+    return None if value is None or pd.isna(value) else float(value)
@@ -0,0 +1,98 @@
+"""
+Backtest engine: vectorized panel simulation vs. a per-trade Python loop.
+
+Runs the default grid (entry offsets x stop rules) over synthetic weekly
+panels, reports rule/ticker combinations per second, and checks the
+vectorized trade counts and total R against the loop on a few tickers.
+
+Usage: python benchmarks/bench_backtest.py [n_tickers]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from backtest import DEFAULT_ENTRY_OFFSETS, DEFAULT_STOP_RULES, MIN_RISK_PCT, backtest, stop_label
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+from screener import build_panel
+from stocks_data import OHLCV_COLUMNS, calculate_atr
+from volume_profile import volume_profiles
+
+HORIZON, ENTRY_WINDOW, WARMUP = 12, 2, 50
+
+
+def loop_backtest(df, atr, offset, rule):
+    """One ticker, one rule, one trade at a time - the hand-written pandas way."""
+    kind, value = rule
+    o, h, l, c, v = (df[f].to_numpy() for f in OHLCV_COLUMNS)
+    trades, total_r = 0, 0.0
+    for s in range(WARMUP, len(c) - ENTRY_WINDOW - HORIZON):
+        limit = c[s] * (1 - offset)
+        fill = next((i for i in range(s + 1, s + 1 + ENTRY_WINDOW) if l[i] <= limit), None)
+        if fill is None:
+            continue
+        entry = o[fill] if o[fill] < limit else limit
+        if kind == "percent":
+            stop = entry * (1 - value)
+        elif kind == "atr":
+            stop = entry - atr[s] * value
+        elif kind == "swing_low":
+            stop = l[s - value + 1:s + 1].min()
+        else:
+            stop = volume_profiles(h[:s + 1], l[:s + 1], v[:s + 1], lookback=90)[value][0]
+        if not np.isfinite(stop) or entry - stop < MIN_RISK_PCT * entry:
+            continue
+        exit_price = c[fill + HORIZON]
+        for i in range(fill + 1, fill + 1 + HORIZON):
+            if l[i] <= stop:
+                exit_price = min(o[i], stop)
+                break
+        trades += 1
+        total_r += (exit_price - entry) / (entry - stop)
+    return trades, total_r
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    frames = {t: make_ohlcv(260, seed=ticker_seed(t)) for t in tickers}
+    panel = build_panel(frames, fields=OHLCV_COLUMNS)
+
+    start = time.perf_counter()
+    summary = backtest(panel, horizon=HORIZON, entry_window=ENTRY_WINDOW, warmup=WARMUP)
+    elapsed = time.perf_counter() - start
+    combos = len(DEFAULT_ENTRY_OFFSETS) * len(DEFAULT_STOP_RULES) * n_tickers
+    trades = int(summary["signals"].iloc[0]) * len(DEFAULT_ENTRY_OFFSETS) * len(DEFAULT_STOP_RULES)
+
+    # Parity on a few tickers against the loop (which is also timed)
+    check = tickers[:3]
+    small = {field: frame[check] for field, frame in panel.items()}
+    by_ticker = backtest(small, horizon=HORIZON, entry_window=ENTRY_WINDOW, warmup=WARMUP, by_ticker=True)
+    mismatches, loop_start = 0, time.perf_counter()
+    for ticker in check:
+        # The loop takes its ATR from the per-ticker payload path
+        atr = calculate_atr(frames[ticker].copy())["ATR"].to_numpy()
+        for offset in DEFAULT_ENTRY_OFFSETS:
+            for rule in DEFAULT_STOP_RULES:
+                n, total_r = loop_backtest(frames[ticker], atr, offset, rule)
+                row = by_ticker.loc[(offset, stop_label(rule), ticker)]
+                mismatches += int(n != row["trades"] or abs(total_r - row["total_r"]) > 1e-6)
+    loop_s = (time.perf_counter() - loop_start) / len(check) * n_tickers
+
+    print(json.dumps({"benchmark": "backtest", "tickers": n_tickers, "results": {
+        "vectorized_s": round(elapsed, 3),
+        "loop_estimate_s": round(loop_s, 1),
+        "rule_ticker_combinations_per_s": round(combos / elapsed),
+        "simulated_trades_per_s": round(trades / elapsed),
+        "parity_mismatches": mismatches,
+        "best_rules": summary.sort_values("avg_r", ascending=False).head(3)[["trades", "win_rate", "avg_r"]]
+            .round(3).reset_index().to_dict("records"),
+    }}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Resident daemon vs. cold evening runs, on a simulated clock.
+
+The daemon runs against the offline stand-ins (fake IB with position events,
+synthetic bars, fake Gemini client) with an injected clock that jumps ahead on
+every wait. Scenario: first close (everything is new), an intraday position
+change in one ticker (IB event), then the next close with nothing else changed.
+Reports the Gemini requests and wall time of each run next to a cold full
+pipeline run (fresh process state, everything re-analyzed). The fake IB replays
+positions and open orders as events on every fetch, like ib_insync; the script
+exits non-zero if those echoes trigger runs of their own or handlers stack up.
+
+Usage: python benchmarks/bench_daemon.py [n_symbols] [llm_latency_s]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fakes import FakeDownload, FakeGenaiClient, FakeIB, make_portfolio
+from ib_session import IBSession
+
+
+class SimulatedClock:
+    """Market-time clock that only moves when `sleep` is called; runs `events` at their times."""
+
+    def __init__(self, start, events=()):
+        self.now = start
+        self.events = sorted(events, key=lambda e: e[0])
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += timedelta(seconds=max(seconds, 1))
+        while self.events and self.events[0][0] <= self.now:
+            self.events.pop(0)[1]()
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    llm_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    symbols = [f"S{i:03d}" for i in range(n_symbols)]
+    positions, orders = make_portfolio(symbols)
+    held = {p[0] for p in positions}
+    candidates = [s for s in symbols if s not in held]
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as stack:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        stack.callback(os.chdir, cwd)
+        for folder in ("output", "gemini_output", "data"):
+            os.makedirs(folder)
+
+        import yfinance as yf
+        import calc_cash_balance
+        import gemini_client
+        import main as pipeline
+        from daemon import MARKET_TZ, PipelineDaemon
+
+        download = FakeDownload()
+        llm = FakeGenaiClient(latency=llm_latency)
+        fake_ib = FakeIB(positions=positions, open_orders=orders)
+        yf.download = download
+        gemini_client.set_client(llm)
+        pipeline.GEMINI_REQUESTS_PER_MINUTE = 0
+        pipeline.UNIVERSE_FILE = None
+        pipeline.GEMINI_CACHE_ENABLED = False
+        calc_cash_balance._quotes = None
+
+        # Cold run: what `python main.py` does every evening
+        from bar_store import BarStore
+        session = IBSession(ib_factory=lambda: fake_ib)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            data = session.fetch_portfolio()
+            pipeline.stream_to_gemini(pipeline.enrich_portfolio(data, candidates=candidates, split=False),
+                                      download=download, store=BarStore(os.path.join("data", "cold.sqlite")))
+            pipeline.merge_results(data)
+            cold = {"seconds": round(time.perf_counter() - start, 3), "llm_requests": len(llm.requests),
+                    "downloads": len(download.calls)}
+
+        # Daemon: Monday 15:00 ET; a fill changes one position at 11:00 on Tuesday
+        start = datetime(2026, 10, 12, 15, 0, tzinfo=MARKET_TZ)
+        changed = positions[0]
+        clock = SimulatedClock(start, events=[
+            (start + timedelta(hours=20), lambda: fake_ib.set_position(changed[0], changed[1] + 10, changed[2])),
+        ])
+        daemon = PipelineDaemon(session, clock=clock, sleep=clock.sleep, download=download, candidates=candidates)
+        runs = []
+        before, downloads_before = len(llm.requests), len(download.calls)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(3):
+                daemon.run_forever(max_runs=1, poll_seconds=600)
+                entry = daemon.history[-1]
+                runs.append({"time": entry["time"], "reason": entry["reason"], "analyzed": len(entry["analyzed"]),
+                             "llm_requests": len(llm.requests) - before,
+                             "downloads": len(download.calls) - downloads_before, "seconds": entry["seconds"]})
+                before, downloads_before = len(llm.requests), len(download.calls)
+
+        handlers = len(fake_ib.positionEvent.handlers)
+
+    print(json.dumps({"benchmark": "daemon", "symbols": n_symbols, "llm_latency_s": llm_latency,
+                      "results": {"cold_full_run": cold, "daemon_runs": runs,
+                                  "position_event_handlers": handlers}}, indent=2))
+    expected = [("close", n_symbols), ("ib-event", 1), ("close", 0)]
+    if [(run["reason"], run["analyzed"]) for run in runs] != expected or handlers != 1:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
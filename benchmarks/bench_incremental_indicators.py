@@ -0,0 +1,76 @@
+"""
+Incremental indicator engine vs. full `ta` recomputation.
+
+Simulates nightly runs: each run appends one closed bar plus a still-forming
+bar, updates the persisted state, and checks every indicator against the
+`ta` values computed over the same bars. Exits non-zero on a mismatch.
+
+Usage: python benchmarks/bench_incremental_indicators.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bar_store import BarStore
+from benchmarks.bench_indicator_kernel import ta_indicators
+from benchmarks.synthetic import make_ohlcv
+from indicator_state import INDICATOR_COLUMNS, update_indicators
+
+TOLERANCE = 1e-6
+
+
+def max_abs_diff(expected, actual):
+    diffs = []
+    for col in INDICATOR_COLUMNS:
+        e, a = expected[col].to_numpy(dtype=float), actual[col].to_numpy(dtype=float)
+        if not np.array_equal(np.isnan(e), np.isnan(a)):
+            return float("inf")
+        mask = ~np.isnan(e)
+        # Relative to price scale so tolerance works for any price level
+        scale = np.maximum(np.abs(e[mask]), 1.0)
+        diffs.append(np.max(np.abs(e[mask] - a[mask]) / scale) if mask.any() else 0.0)
+    return max(diffs)
+
+
+def main():
+    n_tickers, history, runs = 20, 200, 30
+    worst = 0.0
+    incremental_time = ta_time = 0.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars.sqlite"))
+        for i in range(n_tickers):
+            ticker = f"T{i:03d}"
+            bars = make_ohlcv(history + runs + 1, seed=i)
+            for run in range(runs):
+                # closed bars so far + a forming bar with a slightly different close
+                df = bars.iloc[:history + run + 1].copy()
+                df.iloc[-1, df.columns.get_loc("Close")] *= 1.01
+
+                start = time.perf_counter()
+                actual = update_indicators(ticker, df, store)
+                incremental_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                expected = ta_indicators(df.copy())
+                ta_time += time.perf_counter() - start
+
+                worst = max(worst, max_abs_diff(expected, actual))
+        store.close()
+
+    calls = n_tickers * runs
+    print(f"{calls} nightly updates over {n_tickers} tickers")
+    print(f"  incremental: {incremental_time / calls * 1000:6.2f} ms per ticker-run (incl. SQLite I/O)")
+    print(f"  ta recompute: {ta_time / calls * 1000:6.2f} ms per ticker-run")
+    print(f"  max relative difference vs ta: {worst:.2e} (tolerance {TOLERANCE:.0e})")
+    if worst > TOLERANCE:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Fused indicator kernel vs. the chain of `ta` indicator objects it replaced.
+
+Runs the `ta` chain per ticker and the kernel once over the NaN-padded
+(tickers, bars) close matrix - histories of mixed lengths, like a real
+universe - and checks every indicator of every ticker against `ta`. The
+compiled loop is checked too when numba is installed. Exits non-zero on a mismatch.
+
+Usage: python benchmarks/bench_indicator_kernel.py [n_tickers] [n_bars]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import ta
+
+from benchmarks.synthetic import make_ohlcv
+from indicator_kernel import indicator_matrix, numba
+from indicator_state import INDICATOR_COLUMNS
+
+TOLERANCE = 1e-9
+
+
+def ta_indicators(df):
+    """The original `stocks_data.calculate_indicators` (one `ta` object per indicator)."""
+    df['RSI'] = ta.momentum.RSIIndicator(df['Close'], window=14).rsi()
+    df['SMA_20'] = ta.trend.SMAIndicator(df['Close'], window=20).sma_indicator()
+    df['SMA_50'] = ta.trend.SMAIndicator(df['Close'], window=50).sma_indicator()
+    df['SMA_100'] = ta.trend.SMAIndicator(df['Close'], window=100).sma_indicator()
+    df['SMA_150'] = ta.trend.SMAIndicator(df['Close'], window=150).sma_indicator()
+    macd = ta.trend.MACD(df['Close'])
+    df['MACD'] = macd.macd()
+    df['MACD_Signal'] = macd.macd_signal()
+    df['MACD_Hist'] = macd.macd_diff()
+    indicator_bb = ta.volatility.BollingerBands(close=df["Close"], window=20, window_dev=2)
+    df['BB_High'] = indicator_bb.bollinger_hband()
+    df['BB_Low'] = indicator_bb.bollinger_lband()
+    df['BB_Mid'] = indicator_bb.bollinger_mavg()
+    return df
+
+
+def max_rel_diff(expected, values, close):
+    """Worst difference relative to max(|value|, 1) over all tickers; inf if the NaN layout differs."""
+    worst = 0.0
+    for row, df in enumerate(expected):
+        padding = close.shape[1] - len(df)
+        for col in INDICATOR_COLUMNS:
+            e, a = df[col].to_numpy(dtype=float), values[col][row, padding:]
+            if not np.array_equal(np.isnan(e), np.isnan(a)) or not np.isnan(values[col][row, :padding]).all():
+                return float("inf")
+            mask = ~np.isnan(e)
+            if mask.any():
+                worst = max(worst, float(np.max(np.abs(e[mask] - a[mask]) / np.maximum(np.abs(e[mask]), 1.0))))
+    return worst
+
+
+def timed(func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_bars = int(sys.argv[2]) if len(sys.argv) > 2 else 260
+    rng = np.random.default_rng(0)
+    # A fifth of the universe has a shorter history (recent listings)
+    lengths = np.where(rng.random(n_tickers) < 0.2, rng.integers(20, n_bars, n_tickers), n_bars)
+    frames = [make_ohlcv(int(length), seed=i) for i, length in enumerate(lengths)]
+    close = np.full((n_tickers, n_bars), np.nan)
+    for row, df in enumerate(frames):
+        close[row, n_bars - len(df):] = df["Close"].to_numpy()
+
+    results = {}
+    ta_s, expected = timed(lambda: [ta_indicators(df.copy()) for df in frames], repeat=1)
+    results["ta_chain_s"] = round(ta_s, 4)
+
+    worst = 0.0
+    engines = {"numpy": False}
+    if numba is not None:
+        indicator_matrix(close[:2], use_numba=True)  # compile outside the timing
+        engines["numba"] = True
+    for name, use_numba in engines.items():
+        seconds, values = timed(lambda: indicator_matrix(close, use_numba=use_numba))
+        diff = max_rel_diff(expected, values, close)
+        worst = max(worst, diff)
+        results[f"kernel_{name}_s"] = round(seconds, 4)
+        results[f"kernel_{name}_speedup"] = round(ta_s / seconds, 1)
+        results[f"kernel_{name}_max_rel_diff"] = diff
+
+    values = indicator_matrix(close)
+    results["output_mib"] = round(sum(v.nbytes for v in values.values()) / 2 ** 20, 1)
+    results["output_float32_mib"] = round(results["output_mib"] / 2, 1)
+    print(json.dumps({"benchmark": "indicator_kernel", "tickers": n_tickers, "bars": n_bars,
+                      "numba": numba is not None, "tolerance": TOLERANCE, "results": results}, indent=2))
+    if worst > TOLERANCE:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
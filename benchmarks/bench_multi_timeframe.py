@@ -0,0 +1,58 @@
+"""
+Daily + weekly inputs: two downloads per run (weekly bars for the indicators,
+daily bars for stops) vs. one daily download with the weekly and monthly bars
+resampled locally (`multi_timeframe=True`).
+
+Uses the offline `FakeDownload` with a fixed latency per request and a fresh
+bar store, so every run is a cold fetch.
+
+Usage: python benchmarks/bench_multi_timeframe.py [n_tickers] [latency_s]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bar_store import BarStore
+from benchmarks.fakes import FakeDownload
+from stocks_data import get_technical_analysis_json, load_history
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        download = FakeDownload(n_bars=1260, latency=latency)
+        store = BarStore(os.path.join(tmp, "two.sqlite"))
+        start = time.perf_counter()
+        get_technical_analysis_json(tickers, download=download, store=store, payload_format="columnar")
+        load_history(tickers, period="5y", interval="1d", download=download, store=store)
+        results["weekly_plus_daily_s"] = round(time.perf_counter() - start, 3)
+        results["weekly_plus_daily_downloads"] = len(download.calls)
+        store.close()
+
+        download = FakeDownload(n_bars=1260, latency=latency)
+        store = BarStore(os.path.join(tmp, "one.sqlite"))
+        start = time.perf_counter()
+        payload = get_technical_analysis_json(tickers, download=download, store=store, payload_format="columnar",
+                                              multi_timeframe=True)
+        results["multi_timeframe_s"] = round(time.perf_counter() - start, 3)
+        results["multi_timeframe_downloads"] = len(download.calls)
+        store.close()
+
+    results["timeframes_in_payload"] = [k for k in ("daily", "weekly", "monthly") if k in payload[0]]
+    results["extra_stop_inputs"] = {"daily_atr": payload[0]["daily_atr"], "swing_lows": len(payload[0]["swing_lows"])}
+    print(json.dumps({"benchmark": "multi_timeframe", "tickers": n_tickers, "latency_s": latency,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
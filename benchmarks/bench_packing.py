@@ -0,0 +1,78 @@
+"""
+Packed Gemini requests: several tickers per request vs. one request per ticker.
+
+Analyzes the same synthetic ticker objects with a fake client, unpacked and
+at a few token budgets, and reports the requests made and the characters
+sent (instructions included). The fake client leaves out each packed section
+at `--drop-rate`, so the re-query path is exercised too; every ticker must end
+up with an advice file, otherwise the script exits non-zero.
+
+Usage:
+    python benchmarks/bench_packing.py --tickers 60 --format summary
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+import gemini_query
+from benchmarks.bench_prompt_prefix import make_ticker_objects
+from benchmarks.fakes import FakeGenaiClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=60)
+    parser.add_argument("--format", default="summary", choices=("records", "columnar", "summary"))
+    parser.add_argument("--structured", action="store_true", help="use the structured advice template")
+    parser.add_argument("--prefix-mode", default="system", choices=gemini_query.PREFIX_MODES)
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="share of packed sections the fake omits")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[4000, 16000, 64000],
+                        help="pack token budgets to compare")
+    args = parser.parse_args()
+
+    objects = make_ticker_objects(args.tickers, args.format)
+    payload_tokens = [gemini_query.estimate_tokens(gemini_query.render_stock_json(o)) for o in objects]
+    results = {}
+    failed = False
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for budget in [None] + args.budgets:
+                os.makedirs("gemini_output", exist_ok=True)
+                client = FakeGenaiClient(latency=0.0, drop_rate=args.drop_rate)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    advice = gemini_query.analyze_stream(objects, client=client, requests_per_minute=0,
+                                                         structured=args.structured, prefix_mode=args.prefix_mode,
+                                                         pack_tokens=budget)
+                missing = [o["symbol"] for o in objects if not advice.get(o["symbol"])
+                           or not os.path.exists(advice[o["symbol"]])]
+                failed = failed or bool(missing)
+                sent = sum(r["prompt_chars"] + r["system_chars"] for r in client.requests)
+                results[f"pack_tokens={budget}"] = {
+                    "requests": len(client.requests),
+                    "chars_sent": sent,
+                    "chars_sent_per_ticker": round(sent / len(objects)),
+                    "missing_advice": missing,
+                }
+                for fname in os.listdir("gemini_output"):
+                    os.remove(os.path.join("gemini_output", fname))
+        finally:
+            os.chdir(cwd)
+
+    print(json.dumps({"benchmark": "packing", "config": vars(args),
+                      "mean_payload_tokens": round(sum(payload_tokens) / len(payload_tokens)),
+                      "results": results}, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Indicator computation across many tickers: serial vs. a process pool.
+
+Bars come from a pre-filled temporary bar store, so only the per-ticker
+compute (indicators, volume profile, payload shaping) is timed.
+
+Usage: python benchmarks/bench_parallel_indicators.py [n_tickers]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bar_store import BarStore
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+from stocks_data import get_technical_analysis_json
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    cpu_count = os.cpu_count() or 1
+
+    def no_new_bars(tickers, **kwargs):
+        return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars.sqlite"))
+        for ticker in tickers:
+            bars = make_ohlcv(260, seed=ticker_seed(ticker), start="2021-11-01")
+            store.save(ticker, "1wk", bars, replace=True)
+
+        baseline = None
+        for workers in sorted({1, 2, 4, cpu_count}):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = get_technical_analysis_json(tickers, download=no_new_bars, store=store,
+                                                      payload_format="columnar", workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} {elapsed:7.2f} s  speedup {baseline / elapsed:4.1f}x  "
+                  f"({len(results)} tickers, {cpu_count} CPUs)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Per-ticker payload: date-keyed "records" schema vs. "columnar" arrays vs. the
+"summary" of locally computed features (with its default tail of raw bars).
+
+Measures build + serialization time and serialized size for each format,
+using the same serialization the splitter uses for it.
+
+Usage: python benchmarks/bench_payload.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bar_store import BarStore
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+from stocks_data import get_technical_analysis_json
+
+TICKERS = [f"T{i:03d}" for i in range(50)]
+
+
+def fake_download(tickers, **kwargs):
+    import pandas as pd
+    frames = {t: make_ohlcv(260, seed=ticker_seed(t)) for t in tickers}
+    return pd.concat(frames, axis=1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars.sqlite"))
+        # Warm the bar store so only indicator + payload work is timed
+        get_technical_analysis_json(TICKERS, download=fake_download, store=store)
+
+        for payload_format, dump_kwargs in (("records", {"indent": 4}),
+                                            ("columnar", {"separators": (",", ":")}),
+                                            ("summary", {"separators": (",", ":")})):
+            start = time.perf_counter()
+            results = get_technical_analysis_json(TICKERS, download=fake_download, store=store,
+                                                  payload_format=payload_format)
+            texts = [json.dumps(r, **dump_kwargs) for r in results]
+            elapsed = time.perf_counter() - start
+            size = sum(len(t) for t in texts) / len(texts)
+            print(f"{payload_format:<9}: {elapsed * 1000:8.1f} ms for {len(TICKERS)} tickers, "
+                  f"{size / 1024:7.1f} KiB per ticker")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+End-to-end offline benchmark of the `main.py` pipeline.
+
+Runs every stage against local stand-ins (synthetic yfinance bars, a fake
+Gemini client with configurable latency and a fake IB gateway) inside a
+temporary working directory, for several universe sizes, and emits the
+timings as JSON.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 10,100,1000 --llm-latency 0.05 --output bench.json
+    python benchmarks/bench_pipeline.py --sizes 100 --streaming
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fakes import FakeDownload, FakeGenaiClient, FakeIB, make_portfolio
+from ib_session import IBSession
+
+
+@contextlib.contextmanager
+def patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    if enabled:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    else:
+        yield
+
+
+def timed(stage, timings):
+    @contextlib.contextmanager
+    def block():
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield
+        timings[stage] = {"wall_s": round(time.perf_counter() - wall, 4),
+                          "cpu_s": round(time.process_time() - cpu, 4)}
+    return block()
+
+
+def run_pipeline(size, args, modules):
+    """Runs one full pipeline pass for a universe of `size` symbols."""
+    main, my_portfolio, gemini_client, yf = modules
+    symbols = [f"S{i:04d}" for i in range(size)]
+    positions, orders = make_portfolio(symbols, held_ratio=args.held_ratio)
+    held = {p[0] for p in positions}
+    candidates = [s for s in symbols if s not in held]
+
+    fake_ib = FakeIB(positions=positions, open_orders=orders, latency=args.ib_latency)
+    download = FakeDownload(latency=args.download_latency)
+    llm = FakeGenaiClient(latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.llm_error_rate)
+
+    timings = {}
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patched(my_portfolio, "_session", IBSession(ib_factory=lambda: fake_ib)))
+        stack.enter_context(patched(yf, "download", download))
+        stack.enter_context(patched(gemini_client, "_client", llm))
+        stack.enter_context(patched(main, "GEMINI_MAX_WORKERS", args.llm_workers))
+        stack.enter_context(patched(main, "GEMINI_REQUESTS_PER_MINUTE", 0))
+        stack.enter_context(patched(main, "GEMINI_CACHE_ENABLED", False))
+        stack.enter_context(patched(main, "INDICATOR_WORKERS", args.indicator_workers))
+        stack.enter_context(quiet(not args.verbose))
+
+        with timed("empty_folders", timings):
+            main.empty_folders()
+        with timed("portfolio_fetch", timings):
+            data = my_portfolio.get_portfolio_json()
+        with timed("split_indicators_cold", timings):
+            main.enrich_portfolio(dict(data), candidates=candidates)
+        data = my_portfolio.get_portfolio_json()
+        if args.streaming:
+            stack.enter_context(patched(main, "WRITE_ARTIFACTS", not args.no_artifacts))
+            with timed("stream_indicators_llm_warm", timings):
+                main.stream_to_gemini(main.enrich_portfolio(data, candidates=candidates, split=False))
+        else:
+            with timed("split_indicators_warm", timings):
+                ticker_files = main.split_to_files(main.enrich_portfolio(data, candidates=candidates, split=False))
+            with timed("llm_per_ticker", timings):
+                main.sendToGemini(ticker_files)
+        with timed("merge", timings):
+            main.merge_results(data)
+
+    output_bytes = sum(os.path.getsize(os.path.join("output", f)) for f in os.listdir("output"))
+    return {
+        "universe_size": size,
+        "stages": timings,
+        "total_wall_s": round(sum(t["wall_s"] for t in timings.values()), 4),
+        "download_calls": len(download.calls),
+        "llm_requests": len(llm.requests),
+        "llm_prompt_chars": sum(r["prompt_chars"] for r in llm.requests),
+        "output_bytes": output_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma separated universe sizes")
+    parser.add_argument("--held-ratio", type=float, default=0.3, help="share of the universe held as positions")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake Gemini latency per request (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random latency per request (s)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of requests failing with 429/503")
+    parser.add_argument("--llm-workers", type=int, default=8, help="concurrent Gemini requests")
+    parser.add_argument("--indicator-workers", type=int, default=None, help="indicator worker processes")
+    parser.add_argument("--ib-latency", type=float, default=0.0, help="fake IB latency per request (s)")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="fake yf.download latency (s)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="time the streaming splitter -> Gemini path instead of split + sendToGemini")
+    parser.add_argument("--no-artifacts", action="store_true", help="streaming path: skip writing output/ files")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        work_dir = os.path.join(tmp, "work")
+        os.makedirs(os.path.join(work_dir, "output"))
+        os.makedirs(os.path.join(work_dir, "gemini_output"))
+        os.chdir(work_dir)
+        try:
+            import yfinance as yf
+            import gemini_client
+            import main as pipeline
+            import my_portfolio
+            modules = (pipeline, my_portfolio, gemini_client, yf)
+
+            for size in (int(s) for s in args.sizes.split(",")):
+                # Fresh bar store per size so the cold split stage really downloads everything
+                shutil.rmtree(os.path.join(work_dir, "data"), ignore_errors=True)
+                results.append(run_pipeline(size, args, modules))
+                print(f"universe={size}: {results[-1]['total_wall_s']:.2f}s", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "verbose")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
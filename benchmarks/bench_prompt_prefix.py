@@ -0,0 +1,78 @@
+"""
+Benchmark of how the shared prompt instructions are sent to Gemini.
+
+Analyzes the same synthetic ticker objects with a fake client in each prefix
+mode - "inline" (instructions inside every prompt, the previous behaviour),
+"system" (system instruction per request) and "cache" (registered once as
+cached context) - and reports the characters each request carried.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py --tickers 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+import gemini_query
+from benchmarks.fakes import FakeGenaiClient
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+from stocks_data import analyze_frame
+
+
+def make_ticker_objects(n, payload_format):
+    objects = []
+    for i in range(n):
+        symbol = f"S{i:03d}"
+        technical = analyze_frame(symbol, make_ohlcv(260, seed=ticker_seed(symbol)), payload_format=payload_format)
+        objects.append({"symbol": symbol, "shares": 10, "avg_cost": 100.0, "active_orders": [],
+                        "technical_data": technical})
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--format", default="columnar", choices=("records", "columnar", "summary"))
+    parser.add_argument("--structured", action="store_true", help="use the structured advice template")
+    args = parser.parse_args()
+
+    objects = make_ticker_objects(args.tickers, args.format)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "gemini_output"))
+        os.chdir(tmp)
+        # Let the short instruction block through the context cache size check
+        original_min = gemini_query.CONTEXT_CACHE_MIN_TOKENS
+        gemini_query.CONTEXT_CACHE_MIN_TOKENS = 0
+        try:
+            for mode in gemini_query.PREFIX_MODES:
+                client = FakeGenaiClient(latency=0.0)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    gemini_query.analyze_stream(objects, client=client, requests_per_minute=0,
+                                                structured=args.structured, prefix_mode=mode)
+                sent = [r["prompt_chars"] + r["system_chars"] for r in client.requests]
+                results[mode] = {
+                    "requests": len(client.requests),
+                    "mean_chars_sent_per_request": round(statistics.mean(sent)),
+                    "mean_message_chars": round(statistics.mean(r["prompt_chars"] for r in client.requests)),
+                    "cached_chars_referenced": max((r["cached_chars"] for r in client.requests), default=0),
+                    "cached_contents_left": len(client.cached),
+                }
+        finally:
+            gemini_query.CONTEXT_CACHE_MIN_TOKENS = original_min
+            os.chdir(cwd)
+
+    print(json.dumps({"benchmark": "prompt_prefix", "config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of the price lookups behind `calc_cash_balance`.
+
+Compares the old approach - one `yf.Tickers(...).tickers[symbol].info` request
+per order - with `QuoteService` (one IB snapshot batch for all unique symbols,
+then the in-process cache on a repeated run), using offline stand-ins with a
+fixed per-request latency.
+
+Usage:
+    python benchmarks/bench_quotes.py --orders 40 --symbols 15 --latency 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fakes import FakeIB, FakeTickers
+from calc_cash_balance import calculate_projected_cash
+from quote_service import QuoteService
+
+
+def per_order_info(orders, latency):
+    """The previous implementation: a `.info` request for every order."""
+    tickers = FakeTickers(sorted({o["symbol"] for o in orders}), latency=latency)
+    cash = 100_000.0
+    for order in orders:
+        info = tickers.tickers[order["symbol"]].info
+        price = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('previousClose', 0.0)
+        cash += order["qty"] * price * (1 if order["action"] == "SELL" else -1)
+    return cash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=40)
+    parser.add_argument("--symbols", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake latency per quote request (s)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    symbols = [f"S{i:03d}" for i in range(args.symbols)]
+    orders = [{"symbol": rng.choice(symbols), "action": rng.choice(["BUY", "SELL"]), "qty": rng.randint(1, 100),
+               "type": "LMT", "status": "Submitted", "stop_price": 0.0} for _ in range(args.orders)]
+
+    results = {}
+    started = time.perf_counter()
+    expected = per_order_info(orders, args.latency)
+    results["per_order_info_s"] = round(time.perf_counter() - started, 4)
+
+    ib = FakeIB(latency=args.latency).connect()
+    quotes = QuoteService(ib)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "portfolio.json")
+        with open(path, "w") as f:
+            json.dump({"cash_usd": 100_000.0, "open_orders": orders}, f)
+        for run in ("batched_cold_s", "batched_warm_s", "batched_expired_s"):
+            if run == "batched_expired_s":
+                # Prices expired, contracts still qualified - one snapshot round trip only
+                quotes.clear()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                projected = calculate_projected_cash(path, quotes=quotes)
+            results[run] = round(time.perf_counter() - started, 4)
+
+    results["snapshot_batches"] = len(ib.snapshot_calls)
+    results["qualify_batches"] = ib.qualify_calls
+    results["projected_cash_matches"] = abs(projected - expected) < 1e-6
+    print(json.dumps({"benchmark": "quotes", "config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
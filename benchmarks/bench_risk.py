@@ -0,0 +1,130 @@
+"""
+Risk stage of the merge: the vectorized covariance/marginal-risk pass vs.
+pandas' pairwise `DataFrame.cov`, and its effect on BUY allocation.
+
+Returns come from a market + sector factor model, so same-sector tickers are
+correlated like the semiconductor-heavy candidate list. Checks
+the covariance against pandas on a complete panel and exits non-zero on a mismatch.
+
+Usage: python benchmarks/bench_risk.py [n_tickers]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+from advice_merger import merge_advice
+from risk import PERIODS_PER_YEAR, build_risk_model, covariance_matrix, returns_panel
+
+TOLERANCE = 1e-12
+SECTORS = 8
+
+
+def factor_frames(n_tickers, n_bars=300, seed=0, missing_share=0.0):
+    """Daily bars whose returns load on one of SECTORS sector factors; ticker i is in sector i % SECTORS."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.01, n_bars)
+    sectors = rng.normal(0.0, 0.012, (SECTORS, n_bars))
+    index = pd.date_range("2024-01-01", periods=n_bars, freq="B", name="Date")
+    frames = {}
+    for i in range(n_tickers):
+        returns = market + sectors[i % SECTORS] + rng.normal(0.0, 0.01, n_bars)
+        close = 50.0 * np.exp(np.cumsum(returns))
+        start = int(rng.integers(0, n_bars // 2)) if rng.random() < missing_share else 0
+        frames[f"T{i:04d}"] = pd.DataFrame({"Close": close[start:]}, index=index[start:])
+    return frames
+
+
+def timed(func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def allocation_demo():
+    """Two semis held, cash for one BUY: TSM wins on confidence alone, XOM once correlation is penalized."""
+    frames = factor_frames(SECTORS * 3, seed=1)
+    names = {"T0000": "AMD", "T0008": "AVGO", "T0016": "TSM", "T0003": "XOM"}
+    frames = {name: frames[t] for t, name in names.items()}
+    risk = build_risk_model(frames, interval="1d")
+    portfolio = {"cash_usd": 5000.0, "positions": [
+        {"symbol": "AMD", "shares": 200, "avg_cost": 40.0},
+        {"symbol": "AVGO", "shares": 200, "avg_cost": 40.0},
+    ]}
+    advices = [
+        {"symbol": "TSM", "actions": [{"action": "Buy", "qty": 90, "price_high": 50.0, "confidence": 8}]},
+        {"symbol": "XOM", "actions": [{"action": "Buy", "qty": 90, "price_high": 50.0, "confidence": 7}]},
+    ]
+
+    def funded(merged):
+        return {r["symbol"]: r["qty"] for r in merged["rows"] if r["action"] == "Buy"}
+
+    def vol_after(buys):
+        holdings = {p["symbol"]: p["shares"] * risk.last_close[p["symbol"]] for p in portfolio["positions"]}
+        equity = portfolio["cash_usd"] + sum(holdings.values())
+        for symbol, qty in buys.items():
+            holdings[symbol] = holdings.get(symbol, 0.0) + qty * 50.0
+        return round(risk.portfolio_vol(risk.exposure(holdings, equity)), 4)
+
+    plain = merge_advice(advices, portfolio)
+    adjusted = merge_advice(advices, portfolio, risk=risk)
+    return {
+        "funded_without_risk": funded(plain),
+        "funded_with_risk": funded(adjusted),
+        "corr_to_portfolio": {r["symbol"]: r["risk"]["corr_to_portfolio"] for r in adjusted["rows"]},
+        "portfolio_vol": round(adjusted["portfolio_vol"], 4),
+        "portfolio_vol_after_without_risk": vol_after(funded(plain)),
+        "portfolio_vol_after_with_risk": round(adjusted["portfolio_vol_after"], 4),
+    }
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    results = {}
+
+    # 1. Complete panel - must match pandas exactly
+    returns = returns_panel(factor_frames(n_tickers), 252)
+    expected = returns.cov(min_periods=20)
+    symbols, cov = covariance_matrix(returns)
+    diff = float(np.max(np.abs(expected.loc[symbols, symbols].to_numpy() - cov)))
+    results["max_abs_diff_vs_pandas"] = diff
+
+    # 2. A fifth of the tickers with shorter histories - pandas falls back to a loop over pairs
+    frames = factor_frames(n_tickers, missing_share=0.2)
+    returns = returns_panel(frames, 252)
+    pandas_s, expected = timed(lambda: returns.cov(min_periods=20), repeat=1)
+    kernel_s, (symbols, cov) = timed(lambda: covariance_matrix(returns))
+    results["pandas_cov_with_gaps_s"] = round(pandas_s, 4)
+    results["vectorized_cov_with_gaps_s"] = round(kernel_s, 4)
+    results["speedup"] = round(pandas_s / kernel_s, 1)
+    expected = expected.loc[symbols, symbols].to_numpy()
+    gaps_diff = float(np.max(np.abs(expected - cov)))
+    results["max_abs_diff_vs_pandas_with_gaps"] = gaps_diff
+    diff = max(diff, gaps_diff)
+
+    # 3. Whole stage: matrix + portfolio vol + marginal risk of 50 BUYs
+    def stage():
+        risk = build_risk_model(frames, interval="1d")
+        weights = risk.exposure({s: 10_000.0 for s in risk.symbols[:30]}, 500_000.0)
+        return risk, risk.buy_risk(weights, {s: 0.02 for s in risk.symbols[30:80]})
+
+    stage_s, (risk, buys) = timed(stage)
+    results["risk_stage_s"] = round(stage_s, 4)
+    results["annualization"] = PERIODS_PER_YEAR["1d"]
+    results["allocation"] = allocation_demo()
+    print(json.dumps({"benchmark": "risk", "tickers": n_tickers, "tolerance": TOLERANCE, "results": results},
+                     indent=2))
+    if diff > TOLERANCE:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Pre-screening a large universe: one vectorized pass over the panel vs. the
+per-ticker `ta` chain the LLM stage uses.
+
+Bars come from a pre-filled temporary bar store (no network). Also checks that
+the panel indicators match the `ta` chain on the last bar.
+
+Usage: python benchmarks/bench_screener.py [n_tickers]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from bar_store import BarStore
+from benchmarks.bench_indicator_kernel import ta_indicators
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+from screener import build_panel, panel_indicators, screen
+from stocks_data import load_history
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+
+    def no_new_bars(tickers, **kwargs):
+        return None
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(os.path.join(tmp, "bars.sqlite"))
+        for ticker in tickers:
+            store.save(ticker, "1wk", make_ohlcv(260, seed=ticker_seed(ticker), start="2021-11-01"), replace=True)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            frames, _ = load_history(tickers, download=no_new_bars, store=store)
+
+            start = time.perf_counter()
+            per_ticker = {t: ta_indicators(df.copy()).iloc[-1] for t, df in frames.items()}
+            results["per_ticker_ta_s"] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            panel = build_panel(frames)
+            indicators = panel_indicators(panel["Close"])
+            results["panel_indicators_s"] = round(time.perf_counter() - start, 4)
+
+            start = time.perf_counter()
+            top, ranking = screen(tickers, top_n=20, download=no_new_bars, store=store)
+            results["screen_with_load_s"] = round(time.perf_counter() - start, 4)
+        store.close()
+
+    worst = 0.0
+    for name, frame in indicators.items():
+        expected = np.array([per_ticker[t][name] for t in frame.columns], dtype=float)
+        worst = max(worst, float(np.nanmax(np.abs(frame.iloc[-1].to_numpy() - expected))))
+    results["max_abs_diff_vs_ta"] = worst
+    results["speedup"] = round(results["per_ticker_ta_s"] / results["panel_indicators_s"], 1)
+    results["top"] = top[:5]
+    print(json.dumps({"benchmark": "screener", "tickers": n_tickers, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
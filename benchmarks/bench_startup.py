@@ -0,0 +1,100 @@
+"""
+Cold-start benchmark for the `cli.py` commands.
+
+For every command, a fresh interpreter imports `cli` plus the modules that
+command loads (cli.COMMAND_MODULES) and reports the wall time and which heavy
+dependencies got pulled in. `eager` is the old behaviour, where running
+anything meant importing every pipeline module. `cli --help` is the full
+process time of just parsing the command line.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from cli import COMMAND_MODULES
+
+HEAVY_MODULES = ("pandas", "ta", "yfinance", "ib_insync", "google.genai")
+EAGER_MODULES = ("main", "my_portfolio", "result_splitter", "stocks_data", "gemini_query", "ib_insync", "google.genai",
+                 "gemini_merge_results", "calc_cash_balance")
+
+PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+import cli
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_s": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(modules):
+    code = PROBE.format(modules=tuple(modules), heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def measure(modules, repeat):
+    runs = [probe(modules) for _ in range(repeat)]
+    return {
+        "modules": list(modules),
+        "import_s": round(statistics.median(r["import_s"] for r in runs), 4),
+        "process_s": round(statistics.median(r["process_s"] for r in runs), 4),
+        "heavy_imports": runs[0]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per command (median is reported)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = {name: measure(modules, args.repeat) for name, modules in COMMAND_MODULES.items()}
+    results["eager"] = measure(EAGER_MODULES, args.repeat)
+
+    help_runs = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "cli.py", "--help"], cwd=REPO_DIR, capture_output=True, check=True)
+        help_runs.append(time.perf_counter() - started)
+    results["cli --help"] = {"process_s": round(statistics.median(help_runs), 4)}
+
+    for name, r in results.items():
+        imports = f"{r['import_s']:>7.3f}s" if "import_s" in r else f"{'-':>8}"
+        print(f"{name:<12} import {imports}  process {r['process_s']:>7.3f}s  "
+              f"{', '.join(r.get('heavy_imports', []))}", file=sys.stderr)
+
+    report = {
+        "benchmark": "startup",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Volume profile: vectorized High-Low engine vs. the original per-row Close binning.
+
+Usage: python benchmarks/bench_volume_profile.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.synthetic import make_ohlcv, make_panel
+from volume_profile import volume_profile, volume_profiles
+
+
+def legacy_volume_profile(recent_df, price_bins=50):
+    """The original stocks_data implementation (Close-only, apply + groupby)."""
+    price_min = recent_df['Close'].min()
+    price_max = recent_df['Close'].max()
+    price_range = price_max - price_min
+    bin_size = 1 if price_range == 0 else price_range / price_bins
+
+    def get_bin(price):
+        return int((price - price_min) / bin_size) * bin_size + price_min
+
+    recent_df = recent_df.copy()
+    recent_df['Price_Bin'] = recent_df['Close'].apply(get_bin)
+    vp_series = recent_df.groupby('Price_Bin')['Volume'].sum()
+    return [{"price_level": round(p, 2), "volume": int(v)} for p, v in vp_series.items()]
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    lookback = 90
+    frames = [make_ohlcv(260, seed=i) for i in range(300)]
+
+    legacy = timed(lambda: [legacy_volume_profile(df.tail(lookback)) for df in frames], repeat=3)
+    per_ticker = timed(lambda: [volume_profile(df['High'], df['Low'], df['Volume'], lookback=lookback)
+                                for df in frames], repeat=3)
+    print(f"300 tickers x {lookback} bars, one call per ticker:")
+    print(f"  legacy apply/groupby : {legacy * 1000:8.1f} ms")
+    print(f"  vectorized (1-D)     : {per_ticker * 1000:8.1f} ms  ({legacy / per_ticker:.1f}x)")
+
+    for n_tickers, n_bars in ((300, 90), (500, 1000), (1000, 260)):
+        panel = make_panel(n_tickers, n_bars)
+        batch = timed(lambda: volume_profiles(panel["High"], panel["Low"], panel["Volume"]))
+        print(f"{n_tickers} tickers x {n_bars} bars, one batched call: {batch * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Offline stand-ins for yfinance, the Gemini client and ib_insync's IB.
+
+Everything is deterministic for a given symbol/seed so benchmark runs are
+comparable. Latency can be injected where the real service would be slow.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from benchmarks.synthetic import make_ohlcv, ticker_seed
+
+
+# ---------------------------------------------------------
+# yfinance
+# ---------------------------------------------------------
+class FakeDownload:
+    """
+    Callable with the `yf.download` signature returning synthetic weekly (or daily)
+    bars grouped by ticker. Symbols listed in `missing` come back without data.
+    """
+
+    def __init__(self, n_bars=260, latency=0.0, missing=()):
+        self.n_bars = n_bars
+        self.latency = latency
+        self.missing = set(missing)
+        self.calls = []
+
+    def __call__(self, tickers, start=None, period=None, interval="1wk", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.calls.append({"tickers": tickers, "start": start, "period": period, "interval": interval})
+        if self.latency:
+            time.sleep(self.latency)
+
+        freq = "W-MON" if interval == "1wk" else "B"
+        end = pd.Timestamp.now().normalize()
+        if freq == "W-MON":
+            end -= pd.Timedelta(days=end.weekday())
+        frames = {}
+        for ticker in tickers:
+            if ticker in self.missing:
+                continue
+            index = pd.date_range(end=end, periods=self.n_bars, freq=freq, name="Date")
+            df = make_ohlcv(self.n_bars, seed=ticker_seed(ticker), freq=freq).set_axis(index)
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            frames[ticker] = df
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+
+class FakeTicker:
+    """Stand-in for `yf.Ticker` exposing a synthetic `.info`."""
+
+    def __init__(self, symbol, latency=0.0):
+        self.symbol = symbol
+        self.latency = latency
+
+    @property
+    def info(self):
+        if self.latency:
+            time.sleep(self.latency)
+        close = fake_price(self.symbol)
+        return {"currentPrice": close, "regularMarketPrice": close, "previousClose": close}
+
+
+class FakeTickers:
+    """Stand-in for `yf.Tickers`."""
+
+    def __init__(self, symbols, latency=0.0):
+        symbols = symbols.split() if isinstance(symbols, str) else symbols
+        self.tickers = {s: FakeTicker(s, latency) for s in symbols}
+
+
+# ---------------------------------------------------------
+# google-genai
+# ---------------------------------------------------------
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} fake API error")
+        self.code = code
+
+
+class FakeModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        return self.owner._generate(model, contents, config)
+
+
+class FakeCaches:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model, config=None):
+        with self.owner.lock:
+            name = f"cachedContents/fake-{len(self.owner.cached) + 1}"
+            instruction = (config or {}).get("system_instruction") or ""
+            self.owner.cached[name] = len(instruction)
+        return SimpleNamespace(name=name, model=model)
+
+    def delete(self, name):
+        with self.owner.lock:
+            self.owner.cached.pop(name, None)
+            self.owner.deleted.append(name)
+
+
+class FakeGenaiClient:
+    """
+    Stand-in for `genai.Client`: `client.models.generate_content` sleeps for
+    `latency` seconds (+ up to `jitter`), fails with 429/503 at `error_rate`,
+    and records the size of every prompt it receives - the message itself
+    (`prompt_chars`), the system instruction (`system_chars`) and the size of
+    referenced cached content (`cached_chars`). `client.caches` keeps cached
+    contents in memory. Requests for JSON output get a deterministic structured
+    advice for the symbol found in the prompt. Packed requests (several symbols)
+    get one section per symbol, each left out at `drop_rate`.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, seed=0, response_text=None, drop_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_text = response_text
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.models = FakeModels(self)
+        self.caches = FakeCaches(self)
+        self.cached = {}
+        self.deleted = []
+
+    def _generate(self, model, contents, config):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+            prompt_chars = len(contents) if isinstance(contents, str) else len(str(contents))
+            config = config or {}
+            system_chars = len(config.get("system_instruction") or "")
+            cached_chars = self.cached.get(config.get("cached_content"), 0)
+            self.requests.append({"model": model, "prompt_chars": prompt_chars, "system_chars": system_chars,
+                                  "cached_chars": cached_chars})
+        time.sleep(delay)
+        if fail:
+            raise FakeAPIError(self.random.choice([429, 503]))
+
+        symbols = list(dict.fromkeys(re.findall(r'"symbol":\s*"([^"]+)"', str(contents))))
+        packed = (config.get("response_schema") or {}).get("type") == "ARRAY"
+        if self.response_text:
+            text = self.response_text
+        elif packed:
+            text = json.dumps([fake_advice(f'"symbol": "{s}"') for s in self._answered(symbols)])
+        elif config.get("response_mime_type") == "application/json":
+            text = json.dumps(fake_advice(contents))
+        elif len(symbols) > 1:
+            text = "\n\n".join(f"=== {s} ===\n{fake_table(s)}" for s in self._answered(symbols))
+        else:
+            text = fake_table(symbols[0] if symbols else "XXX")
+        input_tokens = (prompt_chars + system_chars + cached_chars) // 4
+        usage = SimpleNamespace(prompt_token_count=input_tokens,
+                                cached_content_token_count=cached_chars // 4,
+                                candidates_token_count=len(text) // 4,
+                                total_token_count=input_tokens + len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+    def _answered(self, symbols):
+        """The symbols a packed answer covers - each one is left out at `drop_rate`."""
+        with self.lock:
+            return [s for s in symbols if self.random.random() >= self.drop_rate]
+
+
+def fake_table(symbol):
+    return f"| Symbol | Action | Reason |\n|---|---|---|\n| {symbol} | Hold | fake advice |"
+
+
+def fake_advice(prompt):
+    """Structured advice for the first symbol in `prompt`: a Buy or a stop fix, by seed."""
+    match = re.search(r'"symbol":\s*"([^"]+)"', str(prompt))
+    symbol = match.group(1) if match else "XXX"
+    seed = ticker_seed(symbol)
+    price = fake_price(symbol)
+    if seed % 3 == 0:
+        action = {"action": "Buy", "qty": 10 + seed % 40, "price_low": round(price * 0.98, 2),
+                  "price_high": round(price, 2), "stop_price": round(price * 0.92, 2),
+                  "confidence": 1 + seed % 10, "reason": "fake breakout"}
+    else:
+        action = {"action": "Fix Stop", "qty": 0, "stop_price": round(price * 0.9, 2),
+                  "confidence": 5, "reason": "fake stop"}
+    return {"symbol": symbol, "actions": [action]}
+
+
+# ---------------------------------------------------------
+# ib_insync
+# ---------------------------------------------------------
+def fake_price(symbol):
+    """Deterministic last price for `symbol` (same as FakeTicker's)."""
+    return float(make_ohlcv(30, seed=ticker_seed(symbol))["Close"].iloc[-1])
+
+
+class FakeEvent:
+    """Minimal `eventkit.Event`: handlers are added with += and called by `emit`."""
+
+    def __init__(self):
+        self.handlers = []
+
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+
+    def __isub__(self, handler):
+        self.handlers.remove(handler)
+        return self
+
+    def emit(self, *args):
+        for handler in list(self.handlers):
+            handler(*args)
+
+
+class FakeIB:
+    """
+    Stand-in for `ib_insync.IB` with the calls `ib_session` and `quote_service`
+    make. Positions, cash and open orders are fixed at construction; `latency` is
+    added per request (the async variants sleep concurrently, like real requests
+    in flight). Symbols in `unpriced` get no snapshot price. `drop()` simulates a
+    lost connection. `set_position()` changes a position and fires `positionEvent`.
+    """
+
+    def __init__(self, positions=None, cash=100_000.0, open_orders=None, latency=0.0, account="DU000000",
+                 unpriced=(), unknown=()):
+        self.latency = latency
+        self.unpriced = set(unpriced)
+        self.unknown = set(unknown)
+        self.qualify_calls = 0
+        self.snapshot_calls = []
+        self._positions = [
+            SimpleNamespace(contract=SimpleNamespace(symbol=sym), position=qty, avgCost=cost)
+            for sym, qty, cost in (positions or [])
+        ]
+        self._summary = [SimpleNamespace(tag="TotalCashValue", currency="USD", value=str(cash), account=account)]
+        self._trades = [
+            SimpleNamespace(
+                contract=SimpleNamespace(symbol=sym),
+                order=SimpleNamespace(action=action, totalQuantity=qty, orderType=order_type,
+                                      auxPrice=aux, lmtPrice=lmt, orderId=i + 1, ocaGroup=""),
+                orderStatus=SimpleNamespace(status="Submitted"),
+            )
+            for i, (sym, action, qty, order_type, aux, lmt) in enumerate(open_orders or [])
+        ]
+        self.wrapper = SimpleNamespace(accounts=[account])
+        self.connected = False
+        self.connect_calls = 0
+        self.placed = []
+        self.cancelled = []
+        self.next_order_id = len(self._trades) + 1
+        self.client = SimpleNamespace(getReqId=self._next_id)
+        self.positionEvent = FakeEvent()
+        self.openOrderEvent = FakeEvent()
+        self.orderStatusEvent = FakeEvent()
+
+    def set_position(self, symbol, qty, avg_cost):
+        """Replaces (or adds) the position in `symbol` and fires `positionEvent`."""
+        position = SimpleNamespace(contract=SimpleNamespace(symbol=symbol), position=qty, avgCost=avg_cost)
+        self._positions = [p for p in self._positions if p.contract.symbol != symbol] + [position]
+        self.positionEvent.emit(position)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def _await(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def connect(self, host="127.0.0.1", port=4001, clientId=1, **kwargs):
+        self._wait()
+        self.connect_calls += 1
+        self.connected = True
+        return self
+
+    def drop(self):
+        self.connected = False
+
+    def isConnected(self):
+        return self.connected
+
+    def disconnect(self):
+        self.connected = False
+
+    def positions(self):
+        self._wait()
+        return list(self._positions)
+
+    def accountSummary(self, account=""):
+        self._wait()
+        return list(self._summary)
+
+    def reqAllOpenOrders(self):
+        self._wait()
+        return [t.order for t in self._trades]
+
+    def openTrades(self):
+        return list(self._trades)
+
+    async def reqPositionsAsync(self):
+        await self._await()
+        # Like ib_insync, every position reply is also emitted as an event
+        for position in self._positions:
+            self.positionEvent.emit(position)
+        return list(self._positions)
+
+    async def accountSummaryAsync(self, account=""):
+        await self._await()
+        return list(self._summary)
+
+    async def reqAllOpenOrdersAsync(self):
+        await self._await()
+        for trade in self._trades:
+            self.openOrderEvent.emit(trade)
+        return list(self._trades)
+
+    async def qualifyContractsAsync(self, *contracts):
+        await self._await()
+        return self._qualify(contracts)
+
+    def run(self, *awaitables, timeout=None):
+        async def gather():
+            return await asyncio.wait_for(asyncio.gather(*awaitables), timeout)
+        # Private loop, so the caller's event loop (ib_insync needs one) stays installed
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(gather())
+        finally:
+            loop.close()
+        return results[0] if len(awaitables) == 1 else results
+
+    def _next_id(self):
+        order_id = self.next_order_id
+        self.next_order_id += 1
+        return order_id
+
+    def placeOrder(self, contract, order):
+        if not getattr(order, "orderId", 0):
+            order.orderId = self._next_id()
+        self.placed.append((contract.symbol, order))
+        for trade in self._trades:
+            if trade.order.orderId == order.orderId:
+                trade.order = order
+                self.openOrderEvent.emit(trade)
+                return trade
+        trade = SimpleNamespace(contract=contract, order=order, orderStatus=SimpleNamespace(status="Submitted"))
+        self._trades.append(trade)
+        self.openOrderEvent.emit(trade)
+        return trade
+
+    def cancelOrder(self, order):
+        self.cancelled.append(order.orderId)
+        for trade in [t for t in self._trades if t.order.orderId == order.orderId]:
+            self._trades.remove(trade)
+            trade.orderStatus.status = "Cancelled"
+            self.orderStatusEvent.emit(trade)
+
+    def sleep(self, seconds=0):
+        time.sleep(seconds)
+
+    def qualifyContracts(self, *contracts):
+        self._wait()
+        return self._qualify(contracts)
+
+    def _qualify(self, contracts):
+        self.qualify_calls += 1
+        for contract in contracts:
+            if contract.symbol not in self.unknown:
+                contract.conId = ticker_seed(contract.symbol) + 1
+        return [c for c in contracts if c.conId]
+
+    def reqTickers(self, *contracts, regulatorySnapshot=False):
+        self._wait()
+        self.snapshot_calls.append([c.symbol for c in contracts])
+        tickers = []
+        for contract in contracts:
+            price = float("nan") if contract.symbol in self.unpriced else fake_price(contract.symbol)
+            tickers.append(SimpleNamespace(contract=contract, close=price, marketPrice=lambda p=price: p))
+        return tickers
+
+
+def make_portfolio(symbols, held_ratio=0.3, seed=0):
+    """
+    Splits a universe into (positions, open_orders) for `FakeIB`: the first
+    `held_ratio` of symbols are held, each with a protective stop.
+    """
+    rng = random.Random(seed)
+    held = symbols[:max(1, int(len(symbols) * held_ratio))]
+    positions = [(sym, rng.randint(1, 200), round(rng.uniform(10, 500), 2)) for sym in held]
+    orders = [(sym, "SELL", qty, "STP", round(cost * 0.9, 2), 0.0) for sym, qty, cost in positions]
+    return positions, orders
@@ -0,0 +1,41 @@
+"""
+Deterministic synthetic market data for the offline benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+
+def make_ohlcv(n_bars=260, seed=0, start="2021-01-04", freq="W-MON", start_price=100.0):
+    """
+    Random-walk OHLCV bars shaped like a yfinance download for one ticker.
+
+    The same seed always yields the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.002, 0.04, n_bars)))
+    open_ = close * (1 + rng.normal(0, 0.01, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.02, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.02, n_bars)))
+    volume = rng.integers(100_000, 10_000_000, n_bars).astype(float)
+
+    index = pd.date_range(start, periods=n_bars, freq=freq, name="Date")
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index
+    )
+
+
+def make_panel(n_tickers, n_bars=260, seed=0):
+    """
+    (tickers, bars) arrays of High, Low, Close and Volume for vectorized benchmarks.
+    """
+    frames = [make_ohlcv(n_bars, seed=seed + i) for i in range(n_tickers)]
+    return {
+        field: np.vstack([df[field].to_numpy() for df in frames])
+        for field in ("Open", "High", "Low", "Close", "Volume")
+    }
+
+
+def ticker_seed(ticker):
+    """Stable per-symbol seed (independent of PYTHONHASHSEED)."""
+    return sum((i + 1) * ord(ch) for i, ch in enumerate(ticker))
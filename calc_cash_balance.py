@@ -1,8 +1,31 @@
 import json
-import yfinance as yf
 
+from quote_service import QuoteService
 
-def calculate_projected_cash(json_file_path):
+# Shared across calls in one process so repeated checks reuse fresh quotes
+_quotes = None
+
+
+def default_quote_service():
+    global _quotes
+    if _quotes is None:
+        _quotes = QuoteService()
+    return _quotes
+
+
+def calculate_projected_cash(json_file_path, quotes=None):
+    """
+    Prints the cash balance left after the open (non stop) orders fill at the
+    current price and returns it.
+
+    Args:
+        json_file_path (str): Path to the `portfolio.json` written by my_portfolio.
+        quotes (QuoteService): Price source; defaults to a shared yfinance-backed
+            service, pass one built on a connected IB session to use IB snapshots.
+
+    Returns:
+        float: The projected cash balance, or None when there is nothing to process.
+    """
     # 1. Load the portfolio data
     try:
         with open(json_file_path, 'r') as f:
@@ -19,15 +42,15 @@ def calculate_projected_cash(json_file_path):
 
     # 2. Filter orders (Ignore STP) and collect symbols
     valid_orders = [o for o in open_orders if o['type'] != 'STP']
-    unique_symbols = list(set(o['symbol'] for o in valid_orders))
+    unique_symbols = list(dict.fromkeys(o['symbol'] for o in valid_orders))
 
     if not unique_symbols:
         print("No active Market or Limit orders found to process.")
         return
 
-    # 3. Fetch current market prices for valid orders
+    # 3. Fetch current market prices for all symbols in one batch
     print(f"Fetching current prices for: {', '.join(unique_symbols)}...")
-    tickers = yf.Tickers(' '.join(unique_symbols))
+    prices = (quotes or default_quote_service()).get_prices(unique_symbols)
 
     # projected cash accumulator
     projected_cash = current_cash
@@ -35,44 +58,36 @@ def calculate_projected_cash(json_file_path):
     print("\nProcessing Orders:")
     print(f"{'ACTION':<6} {'QTY':<5} {'SYMBOL':<6} {'TYPE':<4} {'EST. PRICE':<12} {'IMPACT':<12}")
 
+    # 4. Update Cash Balance - one pass over the orders
     for order in valid_orders:
         symbol = order['symbol']
         action = order['action']
         qty = order['qty']
         order_type = order['type']
 
-        # Get current price
-        # Note: 'regularMarketPrice' is standard, but we use a fallback to 'previousClose' if market is closed/data missing
-        try:
-            ticker_info = tickers.tickers[symbol].info
-            # Prioritize current price, fallback to previous close
-            price = ticker_info.get('currentPrice') or ticker_info.get('regularMarketPrice') or ticker_info.get(
-                'previousClose', 0.0)
-        except Exception as e:
-            print(f"Error fetching price for {symbol}: {e}")
-            price = 0.0
-
+        price = prices.get(symbol, 0.0)
         if price == 0.0:
             print(f"Skipping {symbol} (Price not found)")
             continue
 
-        # Calculate trade value
         trade_value = qty * price
-
-        # 4. Update Cash Balance
         if action == 'BUY':
             projected_cash -= trade_value
             impact_str = f"-${trade_value:,.2f}"
         elif action == 'SELL':
             projected_cash += trade_value
             impact_str = f"+${trade_value:,.2f}"
+        else:
+            print(f"Skipping {symbol} (Unknown action {action})")
+            continue
 
         print(f"{action:<6} {qty:<5} {symbol:<6} {order_type:<4} ${price:<11,.2f} {impact_str:<12}")
 
     print("-" * 50)
     print(f"Projected Cash Balance: ${projected_cash:,.2f}")
+    return projected_cash
 
 
 if __name__ == "__main__":
     # Ensure your file is named 'portfolio.json' and is in the same folder
-    calculate_projected_cash('output/portfolio.json')
\ No newline at end of file
+    calculate_projected_cash('output/portfolio.json')
@@ -0,0 +1,226 @@
+"""
+Command line entry point.
+
+    python cli.py portfolio               fetch positions, cash and open orders from IB
+    python cli.py indicators AMD MSFT     print the technical analysis JSON for symbols
+    python cli.py screen [UNIVERSE_FILE]  rank a symbol universe (default: main.UNIVERSE_FILE)
+    python cli.py backtest AMD MSFT       backtest the stop rules and buy ranges on symbols
+    python cli.py analyze [FILE ...]      send ticker files (default: everything in output/) to Gemini
+    python cli.py merge [--llm]           merge gemini_output/ into the actions table
+    python cli.py cash [PORTFOLIO_JSON]   projected cash after the open orders
+    python cli.py orders [ACTIONS_JSON]   plan (or --transmit) the orders for an action list
+    python cli.py run                     the full pipeline (same as `python main.py`)
+    python cli.py daemon                  stay resident: re-run changed tickers after each close / on IB events
+
+Heavy dependencies (pandas, yfinance, ib_insync, google-genai) are imported
+inside the command that needs them, and every Gemini call shares the client
+from `gemini_client`, built on first use.
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+# Same as stocks_data.PAYLOAD_FORMATS (not imported here to keep the cold start fast)
+PAYLOAD_FORMATS = ("records", "columnar", "summary")
+
+# Modules each command imports - kept next to the handlers so
+# benchmarks/bench_startup.py can measure the cold start of every command
+COMMAND_MODULES = {
+    "portfolio": ("my_portfolio", "ib_insync"),
+    "indicators": ("main", "stocks_data"),
+    "screen": ("main", "screener"),
+    "backtest": ("backtest",),
+    "analyze": ("main",),
+    "merge": ("main",),
+    "cash": ("calc_cash_balance",),
+    "orders": ("order_engine", "my_portfolio", "ib_insync"),
+    "run": ("main", "my_portfolio", "result_splitter", "ib_insync"),
+    "daemon": ("daemon", "my_portfolio", "result_splitter", "ib_insync"),
+}
+
+
+def cmd_portfolio(args):
+    import my_portfolio
+
+    # Progress messages go to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        data = my_portfolio.get_portfolio_json()
+    print(json.dumps(data, indent=2) if isinstance(data, dict) else data)
+
+
+def cmd_indicators(args):
+    import main
+    from stocks_data import get_technical_analysis_json
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results = get_technical_analysis_json(args.symbols, refresh=args.refresh,
+                                              payload_format=args.format or main.PAYLOAD_FORMAT,
+                                              workers=main.INDICATOR_WORKERS,
+                                              incremental=main.INCREMENTAL_INDICATORS,
+                                              multi_timeframe=main.MULTI_TIMEFRAME,
+                                              summary_tail=main.SUMMARY_TAIL_BARS)
+    print(json.dumps(results, indent=2))
+
+
+def cmd_screen(args):
+    import main
+    from screener import load_universe, screen
+
+    universe = load_universe(args.universe or main.UNIVERSE_FILE)
+    with contextlib.redirect_stdout(sys.stderr):
+        _, ranking = screen(universe, top_n=args.top or main.SCREEN_TOP_N, refresh=args.refresh,
+                            multi_timeframe=main.MULTI_TIMEFRAME)
+    print(ranking.head(args.top or main.SCREEN_TOP_N).round(3).to_string())
+
+
+def cmd_backtest(args):
+    from backtest import run_backtest
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_backtest(args.symbols, interval="1d" if args.daily else "1wk", refresh=args.refresh,
+                              horizon=args.horizon, by_ticker=args.by_ticker)
+    print(report.round(3).to_string())
+
+
+def cmd_analyze(args):
+    import main
+
+    if args.pack_tokens:
+        main.GEMINI_PACK_TOKENS = args.pack_tokens
+    main.sendToGemini(args.files or None)
+
+
+def cmd_merge(args):
+    import main
+
+    if args.llm:
+        main.merge_gemini_outputs_and_create_table()
+        return
+    with open(args.portfolio, "r", encoding="utf-8") as f:
+        main.merge_results(json.load(f))
+
+
+def cmd_cash(args):
+    from calc_cash_balance import calculate_projected_cash
+
+    quotes = None
+    if args.ib:
+        from my_portfolio import default_session
+        from quote_service import QuoteService
+
+        session = default_session()
+        session.ensure_connected()
+        quotes = QuoteService(session=session)
+    calculate_projected_cash(args.portfolio, quotes=quotes)
+
+
+def cmd_orders(args):
+    from my_portfolio import default_session
+    from order_engine import OrderEngine
+
+    with open(args.actions, "r", encoding="utf-8") as f:
+        actions = json.load(f)
+    OrderEngine(default_session()).execute(actions, dry_run=not args.transmit)
+
+
+def cmd_run(args):
+    import main
+
+    if args.format:
+        main.PAYLOAD_FORMAT = args.format
+    if args.pack_tokens:
+        main.GEMINI_PACK_TOKENS = args.pack_tokens
+    main.run_pipeline()
+
+
+def cmd_daemon(args):
+    from daemon import PipelineDaemon
+    from my_portfolio import default_session
+
+    daemon = PipelineDaemon(default_session())
+    if args.now:
+        daemon.run_once(reason="startup")
+    daemon.run_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", metavar="PATH", nargs="?", const="data/trace.jsonl",
+                        help="record stage timings and Gemini usage (default path: data/trace.jsonl)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("portfolio", help="fetch positions, cash and open orders from IB")
+    p.set_defaults(handler=cmd_portfolio)
+
+    p = commands.add_parser("indicators", help="print the technical analysis JSON for symbols")
+    p.add_argument("symbols", nargs="+", metavar="SYMBOL")
+    p.add_argument("--refresh", action="store_true", help="re-download the full history")
+    p.add_argument("--format", choices=PAYLOAD_FORMATS, help="payload format (default: main.PAYLOAD_FORMAT)")
+    p.set_defaults(handler=cmd_indicators)
+
+    p = commands.add_parser("screen", help="rank a symbol universe by the pre-screen signals")
+    p.add_argument("universe", nargs="?", metavar="UNIVERSE_FILE", help="one symbol per line")
+    p.add_argument("--top", type=int, help="rows to show (default: main.SCREEN_TOP_N)")
+    p.add_argument("--refresh", action="store_true", help="re-download the full history")
+    p.set_defaults(handler=cmd_screen)
+
+    p = commands.add_parser("backtest", help="backtest the stop rules and buy ranges on symbols")
+    p.add_argument("symbols", nargs="+", metavar="SYMBOL")
+    p.add_argument("--daily", action="store_true", help="daily bars (default: weekly)")
+    p.add_argument("--horizon", type=int, default=12, help="bars a position is held without a stop hit")
+    p.add_argument("--by-ticker", action="store_true", help="one row per symbol")
+    p.add_argument("--refresh", action="store_true", help="re-download the full history")
+    p.set_defaults(handler=cmd_backtest)
+
+    p = commands.add_parser("analyze", help="send ticker files to Gemini")
+    p.add_argument("files", nargs="*", metavar="FILE", help="ticker JSON files (default: every output/ticker_*.json)")
+    p.add_argument("--pack-tokens", type=int, metavar="N",
+                   help="pack several tickers per request, up to N estimated tokens of ticker data")
+    p.set_defaults(handler=cmd_analyze)
+
+    p = commands.add_parser("merge", help="merge gemini_output/ into the actions table")
+    p.add_argument("--portfolio", default="output/portfolio.json", help="cash and positions for the budget")
+    p.add_argument("--llm", action="store_true", help="ask Gemini to build the table (second LLM call)")
+    p.set_defaults(handler=cmd_merge)
+
+    p = commands.add_parser("cash", help="projected cash after the open orders")
+    p.add_argument("portfolio", nargs="?", default="output/portfolio.json")
+    p.add_argument("--ib", action="store_true", help="price orders from IB snapshots (yfinance otherwise)")
+    p.set_defaults(handler=cmd_cash)
+
+    p = commands.add_parser("orders", help="plan (or --transmit) the orders for an action list")
+    p.add_argument("actions", metavar="ACTIONS_JSON", nargs="?", default="gemini_output/actions.json",
+                   help='JSON list like [{"symbol": "AMD", "action": "Fix Stop", "stop_price": 140.0}] '
+                        '(default: the one written by merge)')
+    p.add_argument("--transmit", action="store_true", help="submit the orders (default: dry run)")
+    p.set_defaults(handler=cmd_orders)
+
+    p = commands.add_parser("run", help="the full pipeline")
+    p.add_argument("--format", choices=PAYLOAD_FORMATS, help="payload format (default: main.PAYLOAD_FORMAT)")
+    p.add_argument("--pack-tokens", type=int, metavar="N",
+                   help="pack several tickers per Gemini request, up to N estimated tokens of ticker data")
+    p.set_defaults(handler=cmd_run)
+
+    p = commands.add_parser("daemon", help="stay resident and re-run changed tickers after each close")
+    p.add_argument("--now", action="store_true", help="run once at startup instead of waiting for the close")
+    p.set_defaults(handler=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        import instrumentation
+
+        instrumentation.enable(args.trace)
+        try:
+            args.handler(args)
+        finally:
+            instrumentation.finish()
+    else:
+        args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
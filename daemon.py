@@ -0,0 +1,263 @@
+"""
+Resident after-close mode of the pipeline.
+
+Instead of a cold `python main.py` every evening, one process keeps the IB
+session, the shared genai client, the quote cache and the bar store open,
+runs after each market close and in between reacts to IB position/order
+events. Every run re-analyzes only the tickers whose position, open orders
+or latest bar changed since they were last analyzed; the advice of the others
+stays in `gemini_output/` and is merged as before.
+
+    python cli.py daemon
+"""
+import os
+import time as _time
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import main
+from order_engine import DONE_STATUSES
+from stocks_data import OHLCV_COLUMNS, load_history
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_CLOSE = time(16, 0)
+# Give the data provider time to publish the closing bars
+CLOSE_DELAY = timedelta(minutes=15)
+# Quiet period after the last IB event before the affected tickers are re-run
+EVENT_DEBOUNCE = timedelta(seconds=60)
+POLL_SECONDS = 30
+
+
+def next_close_run(now, close=MARKET_CLOSE, delay=CLOSE_DELAY):
+    """
+    The first weekday market close (+ `delay`) after `now`, in market time.
+    Weekends are skipped; exchange holidays are not known, a holiday run just finds nothing changed.
+    """
+    now = now.astimezone(MARKET_TZ)
+    day = now.date()
+    while True:
+        run = datetime.combine(day, close, tzinfo=MARKET_TZ) + delay
+        if run > now and run.weekday() < 5:
+            return run
+        day += timedelta(days=1)
+
+
+def portfolio_state(portfolio):
+    """
+    Comparable positions and open orders of a fetched portfolio. Order status is
+    left out, so PreSubmitted -> Submitted is not a change.
+
+    Returns:
+        tuple: (positions, orders) - symbol -> (shares, avg_cost) and
+               symbol -> sorted tuple of (action, qty, type, stop_price).
+    """
+    positions = {p["symbol"]: (p["shares"], round(p["avg_cost"], 4)) for p in portfolio.get("positions", [])}
+    orders = defaultdict(list)
+    for order in portfolio.get("open_orders", []):
+        orders[order["symbol"]].append(_order_key(order["action"], order["qty"], order["type"], order["stop_price"]))
+    return positions, {symbol: tuple(sorted(keys)) for symbol, keys in orders.items()}
+
+
+def _order_key(action, qty, order_type, stop_price):
+    return action, qty, order_type, stop_price or 0.0
+
+
+def ticker_fingerprints(portfolio, frames, symbols):
+    """
+    What a ticker's analysis depends on: its position, its open orders and its
+    latest bar (see `portfolio_state`).
+
+    Returns:
+        dict: Symbol -> comparable tuple.
+    """
+    positions, orders = portfolio_state(portfolio)
+
+    fingerprints = {}
+    for symbol in symbols:
+        df = frames.get(symbol)
+        bar = None
+        if df is not None and not df.empty:
+            bar = (df.index[-1].isoformat(), *(round(float(v), 4) for v in df.iloc[-1][OHLCV_COLUMNS]))
+        fingerprints[symbol] = (positions.get(symbol), orders.get(symbol, ()), bar)
+    return fingerprints
+
+
+class PipelineDaemon:
+    """
+    Runs the pipeline after every market close and on IB events, for changed tickers only.
+
+    Args:
+        session (IBSession): Kept connected for the life of the daemon.
+        store (BarStore): Bar store shared by every run (defaults to `BarStore()`).
+        clock (callable): Returns the current timezone-aware datetime.
+        sleep (callable): Waits the given seconds; the default `ib.sleep` keeps
+                          dispatching IB events while waiting.
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        candidates (list): Symbols to analyze besides the positions; screened with
+                           `main.screen_candidates` on every run if None.
+        output_dir (str): Folder holding the advice files.
+        quotes (QuoteService): Prices for the merge; defaults to IB snapshots on `session`
+                               with yfinance as the fallback.
+    """
+
+    def __init__(self, session, store=None, clock=None, sleep=None, download=None, candidates=None,
+                 output_dir="gemini_output", quotes=None):
+        from bar_store import BarStore
+        from quote_service import QuoteService
+
+        self.session = session
+        self.store = store or BarStore()
+        self.clock = clock or (lambda: datetime.now(MARKET_TZ))
+        self.sleep = sleep or (lambda seconds: self.session.ensure_connected().sleep(seconds))
+        self.download = download
+        self.quotes = quotes or QuoteService(session=session, download=download)
+        self.candidates = candidates
+        self.output_dir = output_dir
+        self.fingerprints = {}
+        # Latest bars of every symbol and the incremental indicator states, shared by all stages of a run
+        self.frames = {}
+        self.indicator_states = {}
+        # Positions and orders of the last fetched portfolio, to tell real IB events from echoes
+        self.positions = {}
+        self.orders = {}
+        self.fetching = False
+        self.subscribed = False
+        self.pending = set()
+        self.last_event = None
+        self.history = []
+
+    # -------------------------------------------------------
+    # IB EVENTS
+    # -------------------------------------------------------
+    def subscribe(self):
+        """Registers the IB event handlers (once, however often it is called)."""
+        if self.subscribed:
+            return
+        ib = self.session.ensure_connected()
+        ib.positionEvent += self._on_position
+        ib.openOrderEvent += self._on_trade
+        ib.orderStatusEvent += self._on_trade
+        self.subscribed = True
+
+    def _on_position(self, position):
+        # reqPositions replays every position as an event, so only a different one counts
+        symbol = position.contract.symbol
+        if self.fetching or (position.position, round(position.avgCost, 4)) == self.positions.get(symbol):
+            return
+        self._mark(symbol)
+
+    def _on_trade(self, trade):
+        # reqAllOpenOrders replays the open orders too; a known order only counts once it is done
+        symbol, order = trade.contract.symbol, trade.order
+        known = _order_key(order.action, order.totalQuantity, order.orderType, order.auxPrice) \
+            in self.orders.get(symbol, ())
+        if self.fetching or (known and trade.orderStatus.status not in DONE_STATUSES):
+            return
+        self._mark(symbol)
+
+    def _mark(self, symbol):
+        self.pending.add(symbol)
+        self.last_event = self.clock()
+
+    # -------------------------------------------------------
+    # RUNS
+    # -------------------------------------------------------
+    def run_once(self, only=None, reason="close"):
+        """
+        One pass: fetch the portfolio, bring the bars up to date and analyze the
+        tickers whose fingerprint changed (limited to `only` if given), then merge.
+
+        Returns:
+            list: The symbols that were re-analyzed.
+        """
+        started = _time.perf_counter()
+        # 1. Portfolio over the warm session; the events it replays are already in it
+        self.fetching = True
+        try:
+            portfolio = self.session.fetch_portfolio()
+        finally:
+            self.fetching = False
+        self.positions, self.orders = portfolio_state(portfolio)
+        held = {p["symbol"] for p in portfolio["positions"]}
+        ordered = {o["symbol"] for o in portfolio["open_orders"]}
+
+        # 2. Latest bars for every symbol the run can touch (held, ordered and the screening
+        #    universe) - one grouped download of the new bars only, reused by every stage below
+        universe = main.screen_universe(exclude=held) if self.candidates is None else self.candidates
+        interval = "1d" if main.MULTI_TIMEFRAME else "1wk"
+        self.frames, _ = load_history(sorted(held | ordered | set(universe)), period="5y", interval=interval,
+                                      download=self.download, store=self.store)
+
+        candidates = self.candidates
+        if candidates is None:
+            candidates = main.screen_candidates(exclude=held, store=self.store, frames=self.frames)
+        data = main.enrich_portfolio(dict(portfolio), candidates=candidates, split=False)
+        symbols = sorted(held | ordered | set(data["interesting_symbols"]))
+        fingerprints = ticker_fingerprints(portfolio, self.frames, symbols)
+        changed = {sym for sym in symbols if fingerprints[sym] != self.fingerprints.get(sym)}
+        if only is not None:
+            changed &= set(only)
+        removed = self._remove_stale_advice(symbols)
+
+        # 3. LLM stage for the changed tickers only, on the bars loaded above
+        if changed:
+            results = main.stream_to_gemini(_subset(data, changed), store=self.store, frames=self.frames,
+                                            indicator_states=self.indicator_states)
+            # A failed request keeps the old fingerprint, so the ticker is retried next run
+            self.fingerprints.update({sym: fingerprints[sym] for sym in changed if results.get(sym)})
+        if changed or removed:
+            main.merge_results(portfolio, store=self.store, quotes=self.quotes)
+
+        elapsed = _time.perf_counter() - started
+        self.history.append({"time": self.clock().isoformat(), "reason": reason, "analyzed": sorted(changed),
+                             "removed": removed, "seconds": round(elapsed, 3)})
+        print(f"[{reason}] {len(changed)}/{len(symbols)} tickers changed: {sorted(changed)} ({elapsed:.1f}s)")
+        return sorted(changed)
+
+    def _remove_stale_advice(self, symbols):
+        """Deletes advice files of symbols no longer held, ordered or screened in."""
+        keep = set(symbols)
+        removed = []
+        if not os.path.isdir(self.output_dir):
+            return removed
+        for fname in os.listdir(self.output_dir):
+            for suffix in ("-advice.txt", "-advice.json"):
+                if fname.endswith(suffix) and fname[:-len(suffix)] not in keep:
+                    os.remove(os.path.join(self.output_dir, fname))
+                    removed.append(fname[:-len(suffix)])
+                    self.fingerprints.pop(fname[:-len(suffix)], None)
+        return sorted(set(removed))
+
+    def run_forever(self, max_runs=None, poll_seconds=POLL_SECONDS, debounce=EVENT_DEBOUNCE):
+        """
+        Runs after every market close and, once IB events have been quiet for
+        `debounce`, for the tickers they touched. Stops after `max_runs` runs.
+        """
+        self.subscribe()
+        runs = 0
+        next_run = next_close_run(self.clock())
+        print(f"Daemon started, next run at {next_run.isoformat()}")
+        while max_runs is None or runs < max_runs:
+            now = self.clock()
+            if now >= next_run:
+                self.pending.clear()
+                self.run_once(reason="close")
+                next_run = next_close_run(now)
+                runs += 1
+            elif self.pending and now - self.last_event >= debounce:
+                only, self.pending = self.pending, set()
+                self.run_once(only=only, reason="ib-event")
+                runs += 1
+            else:
+                self.sleep(max(min(poll_seconds, (next_run - now).total_seconds()), 0))
+
+
+def _subset(data, symbols):
+    """The enriched portfolio data restricted to `symbols`."""
+    return {
+        **data,
+        "positions": [p for p in data.get("positions", []) if p["symbol"] in symbols],
+        "open_orders": [o for o in data.get("open_orders", []) if o["symbol"] in symbols],
+        "interesting_symbols": [s for s in data.get("interesting_symbols", []) if s in symbols],
+    }
@@ -0,0 +1,37 @@
+import os
+import threading
+
+# Read on first use, relative to the working directory like before
+API_KEY_PATH = os.path.join("..", "api_key")
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the shared genai client, building it on first use.
+
+    google-genai is only imported (and the API key only read) here, so importing
+    the Gemini modules stays cheap for commands that never call the API.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from google import genai
+                from google.genai import types
+
+                with open(API_KEY_PATH, "r") as f:
+                    api_key = f.read().strip()
+                _client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(api_version="v1beta")  # Force beta version
+                )
+    return _client
+
+
+def set_client(client):
+    """Replaces the shared client (e.g. with an offline stand-in); None resets it."""
+    global _client
+    _client = client
@@ -1,27 +1,26 @@
 import os
+import time
 
-from google import genai
-from google.genai import types
+import gemini_client
+import instrumentation
 
-# 1. Setup API Key (Best practice: use environment variable, or paste here for testing)
-API_KEY = open('../api_key', 'r').read().strip()
-client = genai.Client(
-        api_key=API_KEY,
-        http_options=types.HttpOptions(api_version="v1beta")  # Force beta version
-    )
 
-
-def merge_gemini_outputs_and_create_table():
+@instrumentation.traced("merge")
+def merge_gemini_outputs_and_create_table(client=None):
     """
     Merge all text files in `gemini_output` into a single prompt, ask Gemini to
     create a simple actions table with columns: symbol, action, reason, and
     save the result to `gemini_output/merged-actions.txt`.
+
+    Args:
+        client: Optional stand-in for the genai client (defaults to the shared one).
     """
     dir_path = "gemini_output"
 
     parts = []
     for fname in sorted(os.listdir(dir_path)):
-        if not fname.endswith(".txt"):
+        # Per-ticker advice only, free text or structured JSON
+        if not fname.endswith(("-advice.txt", "-advice.json")):
             continue
         file_path = os.path.join(dir_path, fname)
         try:
@@ -34,7 +33,7 @@ def merge_gemini_outputs_and_create_table():
             parts.append(f"--- File: {fname} ---\n{content}")
 
     if not parts:
-        print("No `.txt` files with content found in `gemini_output`.")
+        print("No advice files with content found in `gemini_output`.")
         return
 
     merged_content = "\n\n".join(parts)
@@ -56,14 +55,18 @@ Analyses:
 
     try:
         print("Sending merged prompt to Gemini to build actions table...")
+        client = client or gemini_client.get_client()
+        started = time.perf_counter()
         response = client.models.generate_content(
             model="gemini-3-flash-preview",
             contents=prompt
         )
+        instrumentation.record_llm_call("merge", time.perf_counter() - started, response)
         out_path = os.path.join(dir_path, "merged-actions.txt")
         with open(out_path, "w", encoding="utf-8") as f:
             text = getattr(response, "text", None) or str(response)
             f.write(text)
+        instrumentation.record_bytes("merge", len(text.encode("utf-8")))
         print(f"Wrote merged actions to {out_path}")
     except Exception as e:
         print(f"API Error: {e}")
\ No newline at end of file
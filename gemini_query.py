@@ -1,18 +1,234 @@
 import json
 import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from google import genai
-from google.genai import types
+import gemini_client
+import instrumentation
+from prompts import ADVICE_PROMPT, STRUCTURED_ADVICE_PROMPT
 
-# 1. Setup API Key (Best practice: use environment variable, or paste here for testing)
-API_KEY = open('../api_key', 'r').read().strip()
-client = genai.Client(
-        api_key=API_KEY,
-        http_options=types.HttpOptions(api_version="v1beta")  # Force beta version
-    )
+MODEL = "gemini-3-flash-preview"
 
+# How the shared prompt instructions reach the model: "cache" registers them once
+# per run as cached context (falling back to "system" when that isn't possible),
+# "system" sends them as the system instruction of each request, "inline" embeds
+# them in every prompt like before
+PREFIX_MODES = ("cache", "system", "inline")
 
-def analyze_stock(json_file_path):
+# Explicit context caching has a minimum size; below it the create call is skipped
+CONTEXT_CACHE_MIN_TOKENS = 1024
+
+ADVICE_ACTIONS = ["Buy", "Fix Stop", "Add Stop", "Hold", "Sell", "Reduce", "Close"]
+
+ADVICE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "symbol": {"type": "STRING"},
+        "actions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "action": {"type": "STRING", "enum": ADVICE_ACTIONS},
+                    "qty": {"type": "NUMBER"},
+                    "price_low": {"type": "NUMBER", "nullable": True},
+                    "price_high": {"type": "NUMBER", "nullable": True},
+                    "stop_price": {"type": "NUMBER", "nullable": True},
+                    "confidence": {"type": "INTEGER"},
+                    "reason": {"type": "STRING"},
+                },
+                "required": ["action", "qty", "confidence", "reason"],
+            },
+        },
+    },
+    "required": ["symbol", "actions"],
+}
+
+STRUCTURED_CONFIG = {"response_mime_type": "application/json", "response_schema": ADVICE_SCHEMA}
+
+# Packed requests (several tickers per request) answer with one advice object per ticker
+PACKED_STRUCTURED_CONFIG = {"response_mime_type": "application/json",
+                            "response_schema": {"type": "ARRAY", "items": ADVICE_SCHEMA}}
+
+# Local token estimate (no tokenizer call): ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+# Packed mode: most tickers in one request, so a long answer can't run into the output limit
+PACK_MAX_TICKERS = 8
+
+# `=== SYMBOL ===` section headers of packed free-text answers
+SECTION_HEADER = re.compile(r"^[ \t#*]*=+[ \t]*\[?([A-Za-z0-9.\-^]+)\]?[ \t]*=+[ \t*]*$", re.MULTILINE)
+
+# Rate limited / transient server errors worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces call starts evenly so that no more than
+    `requests_per_minute` begin in any minute.
+    """
+
+    def __init__(self, requests_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+
+def _default_client():
+    return gemini_client.get_client()
+
+
+class SharedPrefix:
+    """
+    Sends a template's instructions once per run instead of inside every prompt.
+
+    In "cache" mode the instructions are registered with `client.caches.create`
+    on first use and every request references the cached content by name;
+    requests then only carry their ticker data. When the instructions are below
+    `min_tokens` (see `estimate_tokens`) or the create call fails, the
+    instructions go out as `system_instruction` instead. Call `close()` at the
+    end of the run to drop the cached content.
+    """
+
+    def __init__(self, template, mode="cache", client=None, model=MODEL, ttl_seconds=3600, min_tokens=None):
+        if mode not in PREFIX_MODES:
+            raise ValueError(f"Unknown prefix mode {mode!r}, expected one of {PREFIX_MODES}")
+        self.template = template
+        self.mode = mode
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = CONTEXT_CACHE_MIN_TOKENS if min_tokens is None else min_tokens
+        self.cache_name = None
+        self.resolved = False
+        self.lock = threading.Lock()
+
+    def contents(self, stock_json):
+        """The per-request message for one ticker's JSON."""
+        if self.mode == "inline":
+            return self.template.render_inline(stock_json)
+        return self.template.render(stock_json)
+
+    def packed_contents(self, stock_jsons):
+        """The per-request message for several tickers (symbol -> JSON)."""
+        if self.mode == "inline":
+            return self.template.render_packed_inline(stock_jsons)
+        return self.template.render_packed(stock_jsons)
+
+    def config(self):
+        """The `generate_content` config entries that deliver the instructions."""
+        if self.mode == "inline":
+            return {}
+        if self.mode == "cache" and self._cached_content():
+            return {"cached_content": self.cache_name}
+        return {"system_instruction": self.template.instructions}
+
+    def _cached_content(self):
+        with self.lock:
+            if self.resolved:
+                return self.cache_name
+            self.resolved = True
+            if estimate_tokens(self.template.instructions) < self.min_tokens:
+                print(f"Prompt {self.template.id} is below the context cache minimum, "
+                      f"sending it as system instruction")
+                return None
+            try:
+                cached = (self.client or _default_client()).caches.create(
+                    model=self.model,
+                    config={"system_instruction": self.template.instructions,
+                            "display_name": self.template.id,
+                            "ttl": f"{self.ttl_seconds}s"},
+                )
+                self.cache_name = cached.name
+                print(f"Registered prompt {self.template.id} as cached context {self.cache_name}")
+            except Exception as e:
+                print(f"Context cache unavailable ({e}), sending the prompt as system instruction")
+            return self.cache_name
+
+    def close(self):
+        if self.cache_name:
+            try:
+                (self.client or _default_client()).caches.delete(name=self.cache_name)
+            except Exception as e:
+                print(f"Warning: failed to delete cached context {self.cache_name}: {e}")
+            self.cache_name = None
+
+
+def prompt_template(structured=False):
+    return STRUCTURED_ADVICE_PROMPT if structured else ADVICE_PROMPT
+
+
+def estimate_tokens(text):
+    """Rough token count of `text`, computed locally."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _status_code(error):
+    """HTTP status of an API error (google.genai errors expose it as `code`)."""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def generate_with_retries(contents, client=None, limiter=None, max_retries=5,
+                          base_delay=1.0, max_delay=60.0, sleep=time.sleep, symbol=None, **kwargs):
+    """
+    Calls `client.models.generate_content`, retrying 429/5xx responses with
+    exponential backoff (plus jitter). Other errors are raised immediately.
+    `symbol` only labels the call in the run trace.
+    """
+    client = client or _default_client()
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            started = time.perf_counter()
+            response = client.models.generate_content(model=MODEL, contents=contents, **kwargs)
+            instrumentation.record_llm_call("analyze", time.perf_counter() - started, response,
+                                            ticker=symbol, attempt=attempt)
+            return response
+        except Exception as e:
+            code = _status_code(e)
+            if code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Gemini returned {code}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+            sleep(delay)
+
+
+def advice_path(symbol, structured=False):
+    """`gemini_output/<SYMBOL>-advice.txt`, or `.json` for structured advice."""
+    return os.path.join("gemini_output", f"{symbol}-advice.{'json' if structured else 'txt'}")
+
+
+def analyze_stock(json_file_path, client=None, limiter=None, max_retries=5, cache=None, structured=False,
+                  prefix=None):
+    """
+    Sends one ticker JSON file to Gemini and writes the advice to
+    `gemini_output/<SYMBOL>-advice.txt` (`.json` when `structured`).
+
+    Returns:
+        str: Path of the advice file, or None if the request failed.
+    """
     # Use v1beta if the model isn't found on the stable v1 endpoint
 
     # 2. Load your Stock Data
@@ -23,39 +239,381 @@ def analyze_stock(json_file_path):
         print(f"Error: File not found at {json_file_path}")
         return
 
+    return analyze_payload(stock_data, client=client, limiter=limiter, max_retries=max_retries, cache=cache,
+                           structured=structured, prefix=prefix)
+
+
+def analyze_payload(stock_data, client=None, limiter=None, max_retries=5, cache=None, structured=False,
+                    prefix=None):
+    """
+    Sends one ticker object (as built by the splitter) to Gemini and writes the
+    advice to `gemini_output/<SYMBOL>-advice.txt`.
+
+    With a `ResponseCache`, a ticker whose payload and prompt are unchanged
+    reuses the stored advice instead of calling the API.
+
+    With `structured`, the response is constrained to ADVICE_SCHEMA JSON and
+    written to `gemini_output/<SYMBOL>-advice.json`; answers that don't parse
+    are kept for inspection but not cached.
+
+    `prefix` (a SharedPrefix for the same template) delivers the shared
+    instructions; without one they go out as the system instruction.
+
+    Returns:
+        str: Path of the advice file, or None if the request failed.
+    """
     symbol = stock_data.get('symbol', 'Unknown')
+    with instrumentation.span("analyze.ticker", ticker=symbol):
+        return _analyze_payload(symbol, stock_data, client, limiter, max_retries, cache, structured, prefix)
+
+
+def render_stock_json(stock_data):
+    """The ticker object as embedded in the prompt."""
+    # Columnar and summary payloads are machine-shaped, embed them without indentation
+    if stock_data.get('technical_data', {}).get('payload_format') in ('columnar', 'summary'):
+        return json.dumps(stock_data, separators=(",", ":"))
+    return json.dumps(stock_data, indent=2)
+
+
+def _analyze_payload(symbol, stock_data, client, limiter, max_retries, cache, structured=False, prefix=None):
+    template = prompt_template(structured)
+    file_path = advice_path(symbol, structured)
+    cache_key = cache.key(MODEL, template.fingerprint(), stock_data) if cache else None
+    cached_text = cache.get(cache_key) if cache else None
+    if cached_text is not None:
+        print(f"Using cached advice for {symbol}")
+        return _write_advice(symbol, cached_text, structured, cached=True)
 
     # 3. Construct the Prompt
-    # We embed the instructions and the JSON data into one clear message
-    prompt = f"""
-    I am a swing trader that does changes on a weekly basis. I check stocks weekly at market close.
-    please do technical analysis based on the technical indicators provided in the JSON below following these rules:
-    
-    
-    1. Audit my current position.
-    2. Review my Stop Loss (ensure it covers the full position)
-    3. Advise on my Free Cash usage (only buy if trend is confirmed)
-    4. use min/max in-day prices not close prices for calculations such as stop loss or buy limit price.
-    5. for every buy - give score from 1 to 10 about certainty of the buy based on technical analysis (10 being highest confidence)
-    6. you can sell partial amount 
-    7. avoid over-trading
-    8. Provide a neat table of actions.
-    
-    Stock Data JSON:
-    {json.dumps(stock_data, indent=2)}
-    """
+    # The shared instructions travel through the prefix, the message is just the ticker data.
+    # Only built for a request that is sent, so an all-cached run never registers a context cache.
+    prefix = prefix or SharedPrefix(template, mode="system")
+    prompt = prefix.contents(render_stock_json(stock_data))
+    config = {**(STRUCTURED_CONFIG if structured else {}), **prefix.config()}
+    extra = {"config": config} if config else {}
 
     # 4. Send to Gemini
     try:
         print(f"Analyzing {symbol}...")
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=prompt
-        )
+        response = generate_with_retries(prompt, client=client, limiter=limiter, max_retries=max_retries,
+                                         symbol=symbol, **extra)
         # save response to gemini_output\{stock}-advice.txt
-        file_path = os.path.join("gemini_output", f"{symbol}-advice.txt")
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(response.text)
+        _write_advice(symbol, response.text, structured)
+        if structured and parse_advice(response.text) is None:
+            print(f"Warning: advice for {symbol} is not valid JSON, not caching it")
+        elif cache:
+            cache.put(cache_key, response.text)
+        return file_path
 
     except Exception as e:
-        print(f"API Error: {e}")
\ No newline at end of file
+        print(f"API Error: {e}")
+
+
+def _write_advice(symbol, text, structured=False, **attrs):
+    file_path = advice_path(symbol, structured)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    instrumentation.record_bytes("analyze", len(text.encode("utf-8")), ticker=symbol, **attrs)
+    return file_path
+
+
+def _strip_fence(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else ""
+    return text
+
+
+def parse_advice(text):
+    """Parses structured advice JSON (tolerating a ```json fence); None if it isn't valid."""
+    try:
+        advice = json.loads(_strip_fence(text))
+    except ValueError:
+        return None
+    if not isinstance(advice, dict) or not isinstance(advice.get("actions"), list):
+        return None
+    return advice
+
+
+# -------------------------------------------------------
+# PACKED REQUESTS
+# -------------------------------------------------------
+class Packer:
+    """
+    Groups ticker objects, in arrival order, into packs whose ticker JSON stays
+    within `token_budget` estimated tokens and `max_tickers` tickers. A ticker
+    larger than the budget gets a pack of its own.
+    """
+
+    def __init__(self, token_budget, max_tickers=PACK_MAX_TICKERS):
+        self.token_budget = token_budget
+        self.max_tickers = max_tickers
+        self.pack = []
+        self.tokens = 0
+
+    def add(self, stock_data):
+        """Adds a ticker object; returns the pack it closed, if any."""
+        tokens = estimate_tokens(render_stock_json(stock_data))
+        closed = None
+        if self.pack and (self.tokens + tokens > self.token_budget or len(self.pack) >= self.max_tickers):
+            closed = self.flush()
+        self.pack.append(stock_data)
+        self.tokens += tokens
+        return closed
+
+    def flush(self):
+        """Returns the open pack (None if empty) and starts a new one."""
+        pack, self.pack, self.tokens = self.pack or None, [], 0
+        return pack
+
+
+def pack_payloads(stock_datas, token_budget, max_tickers=PACK_MAX_TICKERS):
+    """Splits ticker objects into packs (see `Packer`), keeping their order."""
+    packer = Packer(token_budget, max_tickers)
+    packs = [pack for pack in map(packer.add, stock_datas) if pack]
+    last = packer.flush()
+    return packs + [last] if last else packs
+
+
+def split_packed_response(text, symbols, structured=False):
+    """
+    Splits a packed answer into per-symbol advice.
+
+    Free text is split at `=== SYMBOL ===` header lines; structured answers are
+    a JSON list of advice objects (a truncated list still yields its complete
+    objects). Sections for other symbols, repeated or empty sections and
+    objects without an actions list are dropped.
+
+    Returns:
+        dict: Symbol -> advice text, for the symbols with a usable section.
+    """
+    wanted = {symbol.upper(): symbol for symbol in symbols}
+    sections = {}
+    if structured:
+        for advice in _iter_json_objects(text):
+            symbol = wanted.get(str(advice.get("symbol", "")).upper())
+            if symbol and symbol not in sections and isinstance(advice.get("actions"), list):
+                sections[symbol] = json.dumps({**advice, "symbol": symbol}, indent=2)
+        return sections
+
+    headers = list(SECTION_HEADER.finditer(text))
+    for header, following in zip(headers, headers[1:] + [None]):
+        symbol = wanted.get(header.group(1).upper())
+        body = text[header.end():following.start() if following else len(text)].strip()
+        if symbol and body and symbol not in sections:
+            sections[symbol] = body
+    return sections
+
+
+def _iter_json_objects(text):
+    """The objects of a JSON list (or a lone object), up to the first one that doesn't parse."""
+    text = _strip_fence(text)
+    if not text.startswith("["):
+        advice = parse_advice(text)
+        if advice is not None:
+            yield advice
+        return
+    decoder = json.JSONDecoder()
+    pos = 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            return
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            return
+        if isinstance(item, dict):
+            yield item
+
+
+def analyze_packed(stock_datas, client=None, limiter=None, max_retries=5, cache=None, structured=False,
+                   prefix=None):
+    """
+    Sends several ticker objects to Gemini in one request and writes each
+    ticker's section to its own `gemini_output/<SYMBOL>-advice.txt` (`.json`
+    when `structured`).
+
+    Cached tickers are answered from the `ResponseCache` and left out of the
+    request. Tickers whose section is missing or malformed - or all of them if
+    the request fails - are re-queried one by one with `analyze_payload`.
+
+    Returns:
+        dict: Symbol -> advice file path (None for failed requests).
+    """
+    with instrumentation.span("analyze.pack", tickers=len(stock_datas)):
+        return _analyze_packed(stock_datas, client, limiter, max_retries, cache, structured, prefix)
+
+
+def _analyze_packed(stock_datas, client, limiter, max_retries, cache, structured=False, prefix=None):
+    template = prompt_template(structured)
+    prefix = prefix or SharedPrefix(template, mode="system")
+    results = {}
+
+    # 1. Cache hits don't need to go into the request
+    pending, cache_keys = {}, {}
+    for stock_data in stock_datas:
+        symbol = stock_data.get('symbol', 'Unknown')
+        cache_key = cache.key(MODEL, template.fingerprint(), stock_data) if cache else None
+        cached_text = cache.get(cache_key) if cache else None
+        if cached_text is not None:
+            print(f"Using cached advice for {symbol}")
+            results[symbol] = _write_advice(symbol, cached_text, structured, cached=True)
+        else:
+            pending[symbol] = stock_data
+            cache_keys[symbol] = cache_key
+
+    # 2. One request for the rest, split back into per-symbol sections
+    sections = {}
+    if len(pending) > 1:
+        prompt = prefix.packed_contents({symbol: render_stock_json(d) for symbol, d in pending.items()})
+        config = {**(PACKED_STRUCTURED_CONFIG if structured else {}), **prefix.config()}
+        extra = {"config": config} if config else {}
+        try:
+            print(f"Analyzing {', '.join(pending)} in one request...")
+            response = generate_with_retries(prompt, client=client, limiter=limiter, max_retries=max_retries,
+                                             symbol=",".join(pending), **extra)
+            sections = split_packed_response(response.text, list(pending), structured)
+        except Exception as e:
+            print(f"API Error: {e}")
+    for symbol, text in sections.items():
+        results[symbol] = _write_advice(symbol, text, structured)
+        if cache:
+            cache.put(cache_keys[symbol], text)
+
+    # 3. Missing or malformed sections: the ticker goes again on its own
+    for symbol, stock_data in pending.items():
+        if symbol in sections:
+            continue
+        if len(pending) > 1:
+            print(f"No usable section for {symbol} in the packed answer, re-querying it alone")
+        results[symbol] = analyze_payload(stock_data, client=client, limiter=limiter, max_retries=max_retries,
+                                          cache=cache, structured=structured, prefix=prefix)
+    return results
+
+
+@instrumentation.traced("analyze")
+def analyze_stocks(json_file_paths, max_workers=4, requests_per_minute=60, max_retries=5, client=None,
+                   cache=None, structured=False, prefix_mode="cache", pack_tokens=None,
+                   pack_max_tickers=PACK_MAX_TICKERS):
+    """
+    Runs `analyze_stock` for many ticker files concurrently (`analyze_packed`
+    for groups of them with `pack_tokens`).
+
+    Args:
+        json_file_paths (list): Ticker JSON files to analyze.
+        max_workers (int): Maximum number of requests in flight.
+        requests_per_minute (int): Request start rate limit (0/None for unlimited).
+        max_retries (int): Retries per request on 429/5xx responses.
+        client: Optional stand-in for the genai client.
+        cache (ResponseCache): Optional response cache shared by all requests.
+        structured (bool): Request ADVICE_SCHEMA JSON instead of free text.
+        prefix_mode (str): How the shared instructions are sent, one of PREFIX_MODES.
+        pack_tokens (int): Pack several tickers per request, up to this many estimated
+                           tokens of ticker data (one ticker per request if None/0).
+        pack_max_tickers (int): Most tickers in one packed request.
+
+    Returns:
+        dict: Input path -> advice file path (None for failed requests), in input order.
+    """
+    limiter = RateLimiter(requests_per_minute)
+    prefix = SharedPrefix(prompt_template(structured), mode=prefix_mode, client=client)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            if pack_tokens:
+                payloads = {}
+                for path in json_file_paths:
+                    try:
+                        with open(path, 'r') as f:
+                            payloads[path] = json.load(f)
+                    except FileNotFoundError:
+                        print(f"Error: File not found at {path}")
+                futures = [
+                    pool.submit(analyze_packed, pack, client=client, limiter=limiter, max_retries=max_retries,
+                                cache=cache, structured=structured, prefix=prefix)
+                    for pack in pack_payloads(list(payloads.values()), pack_tokens, pack_max_tickers)
+                ]
+                by_symbol = {}
+                for future in futures:
+                    by_symbol.update(future.result())
+                return {path: by_symbol.get(payloads[path].get('symbol', 'Unknown')) if path in payloads else None
+                        for path in json_file_paths}
+
+            futures = [
+                pool.submit(analyze_stock, path, client=client, limiter=limiter,
+                            max_retries=max_retries, cache=cache, structured=structured, prefix=prefix)
+                for path in json_file_paths
+            ]
+            return {path: future.result() for path, future in zip(json_file_paths, futures)}
+    finally:
+        prefix.close()
+
+
+_END_OF_STREAM = object()
+
+
+@instrumentation.traced("analyze")
+def analyze_stream(ticker_objects, max_workers=4, requests_per_minute=60, max_retries=5, client=None,
+                   cache=None, structured=False, prefix_mode="cache", pack_tokens=None,
+                   pack_max_tickers=PACK_MAX_TICKERS):
+    """
+    Consumes ticker objects from an iterable (e.g. `result_splitter.iter_ticker_objects`)
+    and analyzes each one as soon as it arrives, so producing the technical data
+    and the Gemini requests overlap. With `pack_tokens`, each pack is sent as
+    soon as it is full.
+
+    The iterable is drained in the calling thread and pushed onto a bounded queue
+    read by `max_workers` analysis threads. Other arguments as in `analyze_stocks`.
+
+    Returns:
+        dict: Symbol -> advice file path (None for failed requests).
+    """
+    limiter = RateLimiter(requests_per_minute)
+    prefix = SharedPrefix(prompt_template(structured), mode=prefix_mode, client=client)
+    work = queue.Queue(maxsize=max_workers * 2)
+    results = {}
+
+    packer = Packer(pack_tokens, pack_max_tickers) if pack_tokens else None
+
+    def worker():
+        while True:
+            stock_data = work.get()
+            if stock_data is _END_OF_STREAM:
+                return
+            # A failed item must not end the thread, or the queue stops draining and the producer blocks
+            packed = stock_data if isinstance(stock_data, list) else [stock_data]
+            try:
+                if isinstance(stock_data, list):
+                    results.update(analyze_packed(stock_data, client=client, limiter=limiter,
+                                                  max_retries=max_retries, cache=cache, structured=structured,
+                                                  prefix=prefix))
+                    continue
+                results[stock_data.get('symbol', 'Unknown')] = analyze_payload(
+                    stock_data, client=client, limiter=limiter, max_retries=max_retries, cache=cache,
+                    structured=structured, prefix=prefix
+                )
+            except Exception as e:
+                symbols = [item.get('symbol', 'Unknown') for item in packed]
+                print(f"Error analyzing {', '.join(symbols)}: {e}")
+                results.update(dict.fromkeys(symbols))
+
+    threads = [threading.Thread(target=worker, name=f"gemini-{i}", daemon=True) for i in range(max_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for stock_data in ticker_objects:
+            item = packer.add(stock_data) if packer else stock_data
+            if item:
+                work.put(item)
+    finally:
+        last = packer.flush() if packer else None
+        if last:
+            work.put(last)
+        for _ in threads:
+            work.put(_END_OF_STREAM)
+        for thread in threads:
+            thread.join()
+        prefix.close()
+    return results
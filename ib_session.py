@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import sys
+import time
+
+_loop = None
+
+# Order statuses that are still waiting for TWS to accept the request
+PENDING_STATUSES = {"PendingSubmit", "ApiPending", "PendingCancel"}
+
+
+# ==========================================
+# FIX: Python 3.14 / Windows Event Loop Support
+# ==========================================
+def ensure_event_loop():
+    """Installs the event loop ib_insync needs on first use instead of at import time."""
+    global _loop
+    if _loop is None:
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def import_ib_insync():
+    """Imports ib_insync lazily; the import itself needs an event loop."""
+    ensure_event_loop()
+    import ib_insync
+    return ib_insync
+
+
+def _default_ib():
+    ib_insync = import_ib_insync()
+    # Reduce log noise
+    ib_insync.util.logToConsole(logging.CRITICAL)
+    return ib_insync.IB()
+
+
+class IBSession:
+    """
+    One long-lived connection to TWS / IB Gateway.
+
+    Every call goes through `ensure_connected()`, which (re)connects when the
+    connection is missing or dropped, so a session can be kept for the whole
+    process. Requests that belong together are sent concurrently through the
+    async API and awaited on their completion events instead of fixed sleeps.
+    Qualified contracts are cached per (symbol, asset type, exchange, currency).
+
+    Args:
+        host (str): Gateway / TWS host.
+        port (int): 4001 for Gateway, 7496 for TWS.
+        client_id (int): API client id.
+        timeout (float): Seconds to wait for a connection or a batch of requests.
+        ib_factory (callable): Builds the `ib_insync.IB` instance (or a stand-in).
+        max_connect_attempts (int): Connection attempts before giving up.
+        retry_delay (float): Seconds between connection attempts.
+    """
+
+    def __init__(self, host='127.0.0.1', port=4001, client_id=2, timeout=10, ib_factory=None,
+                 max_connect_attempts=3, retry_delay=2.0, sleep=time.sleep):
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.timeout = timeout
+        self.ib_factory = ib_factory or _default_ib
+        self.max_connect_attempts = max_connect_attempts
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.ib = None
+        self.contracts = {}
+
+    def __enter__(self):
+        self.ensure_connected()
+        return self
+
+    def __exit__(self, *exc):
+        self.disconnect()
+
+    # -------------------------------------------------------
+    # CONNECTION
+    # -------------------------------------------------------
+    def ensure_connected(self):
+        """Returns the connected IB instance, connecting (again) if needed."""
+        if self.ib is None:
+            self.ib = self.ib_factory()
+        if self.ib.isConnected():
+            return self.ib
+
+        last_error = None
+        for attempt in range(1, self.max_connect_attempts + 1):
+            try:
+                self.ib.connect(self.host, self.port, clientId=self.client_id, timeout=self.timeout)
+                return self.ib
+            except (OSError, asyncio.TimeoutError) as e:
+                last_error = e
+                print(f"IB connection attempt {attempt}/{self.max_connect_attempts} failed: {e}")
+                if attempt < self.max_connect_attempts:
+                    self.sleep(self.retry_delay)
+        raise ConnectionError(f"Could not connect to IB at {self.host}:{self.port}: {last_error}")
+
+    def disconnect(self):
+        if self.ib is not None and self.ib.isConnected():
+            self.ib.disconnect()
+
+    def run(self, *awaitables):
+        """Runs awaitables concurrently on the IB event loop and returns their results."""
+        return self.ensure_connected().run(*awaitables, timeout=self.timeout)
+
+    def next_order_id(self):
+        """Reserves an order id (needed up front to attach bracket children)."""
+        return self.ensure_connected().client.getReqId()
+
+    def wait_for_acks(self, trades):
+        """Waits on the status events until no trade is pending (or the timeout passes)."""
+        async def acknowledged(trade):
+            while trade.orderStatus.status in PENDING_STATUSES:
+                await trade.statusEvent
+
+        pending = [acknowledged(t) for t in trades if t.orderStatus.status in PENDING_STATUSES]
+        if not pending:
+            return
+        try:
+            self.run(*pending)
+        except asyncio.TimeoutError:
+            print(f"Warning: some orders were not acknowledged within {self.timeout}s")
+
+    # -------------------------------------------------------
+    # PORTFOLIO
+    # -------------------------------------------------------
+    def fetch_portfolio(self):
+        """
+        Fetches positions, account summary and open orders in one round of
+        concurrent requests.
+
+        Returns:
+            dict: {"account", "cash_usd", "positions", "open_orders"} as written
+                  to `output/portfolio.json`.
+        """
+        ib = self.ensure_connected()
+        positions, summary, _ = self.run(
+            ib.reqPositionsAsync(), ib.accountSummaryAsync(), ib.reqAllOpenOrdersAsync()
+        )
+
+        free_cash = 0.0
+        for item in summary:
+            if item.tag == 'TotalCashValue' and item.currency == 'USD':
+                free_cash = float(item.value)
+                break
+
+        # openTrades() holds contract + order for everything reqAllOpenOrders returned
+        orders = []
+        for t in ib.openTrades():
+            orders.append({
+                "symbol": t.contract.symbol,
+                "action": t.order.action,  # Buy/Sell
+                "qty": t.order.totalQuantity,
+                "type": t.order.orderType,  # LMT/MKT/STP
+                "status": t.orderStatus.status,  # Submitted/PreSubmitted
+                "stop_price": t.order.auxPrice if t.order.auxPrice else 0.0
+            })
+
+        return {
+            "account": ib.wrapper.accounts[0] if ib.wrapper.accounts else "Unknown",
+            "cash_usd": free_cash,
+            "positions": [{"symbol": p.contract.symbol, "shares": p.position, "avg_cost": p.avgCost}
+                          for p in positions],
+            "open_orders": orders
+        }
+
+    # -------------------------------------------------------
+    # CONTRACTS
+    # -------------------------------------------------------
+    def contract(self, symbol, asset_type='STK', exchange='SMART', currency='USD'):
+        """Returns the qualified contract for `symbol`, qualifying it on first use."""
+        contracts = self.qualify([(symbol, asset_type, exchange, currency)])
+        if symbol not in contracts:
+            raise ValueError(f"IB could not qualify {symbol}")
+        return contracts[symbol]
+
+    def qualify(self, specs):
+        """
+        Qualifies contracts in one batch, skipping ones already cached.
+
+        Args:
+            specs (list): (symbol, asset_type, exchange, currency) tuples.
+
+        Returns:
+            dict: symbol -> qualified contract (symbols IB couldn't qualify are left out).
+        """
+        ib_insync = import_ib_insync()
+        specs = list(dict.fromkeys(specs))
+        missing = [spec for spec in specs if spec not in self.contracts]
+        if missing:
+            ib = self.ensure_connected()
+            contracts = [ib_insync.Stock(sym, exchange, currency) if asset_type == 'STK'
+                         else ib_insync.Crypto(sym, exchange, currency)
+                         for sym, asset_type, exchange, currency in missing]
+            self.run(ib.qualifyContractsAsync(*contracts))
+            for spec, contract in zip(missing, contracts):
+                if contract.conId:
+                    self.contracts[spec] = contract
+                else:
+                    print(f"Warning: IB could not qualify {spec[0]}")
+        return {spec[0]: self.contracts[spec] for spec in specs if spec in self.contracts}
+
+    # -------------------------------------------------------
+    # ORDERS
+    # -------------------------------------------------------
+    def place_market_order(self, symbol, qty, action='BUY', asset_type='STK', exchange='SMART', currency='USD'):
+        """Places a simple Market Order."""
+        contract = self.contract(symbol, asset_type, exchange, currency)
+        order = import_ib_insync().MarketOrder(action, qty)
+        return self.ensure_connected().placeOrder(contract, order)
+
+    def place_stop_loss(self, symbol, qty, stop_price, action='SELL'):
+        """Places a standalone Stop Loss order."""
+        contract = self.contract(symbol)
+        # Stop order uses auxPrice for the trigger point
+        order = import_ib_insync().StopOrder(action, qty, stop_price)
+        return self.ensure_connected().placeOrder(contract, order)
+
+    def modify_open_order(self, symbol, new_qty=None, new_price=None):
+        """
+        Finds an open stop/limit order for a symbol and updates it.
+        In IB-insync, placing an order with the same OrderId modifies the existing one.
+        """
+        ib = self.ensure_connected()
+        self.run(ib.reqAllOpenOrdersAsync())
+
+        for trade in ib.openTrades():
+            if trade.contract.symbol == symbol:
+                if new_qty:
+                    trade.order.totalQuantity = new_qty
+                if new_price:
+                    # For Stop orders, price is in auxPrice. For Limit, it's lmtPrice.
+                    if trade.order.orderType == 'STP':
+                        trade.order.auxPrice = new_price
+                    elif trade.order.orderType == 'LMT':
+                        trade.order.lmtPrice = new_price
+
+                # Re-submit the modified order object
+                ib.placeOrder(trade.contract, trade.order)
+                return f"Modified {symbol} order successfully."
+
+        return f"No open order found for {symbol}."
@@ -0,0 +1,191 @@
+"""
+Fused indicator kernel: RSI, SMA_20..SMA_150, MACD and Bollinger Bands for
+many tickers in one pass over a (tickers, bars) close matrix.
+
+Replaces the chain of `ta` indicator objects (one Series scan and a handful of
+intermediate Series per indicator) with one output block of float arrays. With
+numba installed the whole set is computed by one compiled loop per ticker;
+otherwise the recursive filters (RSI averages, the three EMAs) share a single
+NumPy loop over time, vectorized across tickers, and the rolling windows come
+from one cumulative sum.
+
+The values follow the `ta` library conventions (see also
+`indicator_state.IndicatorState`, the streaming version of the same set).
+"""
+import numpy as np
+
+from indicator_state import (BB_DEV, BB_WINDOW, INDICATOR_COLUMNS, MACD_FAST, MACD_SIGNAL, MACD_SLOW,
+                             RSI_WINDOW, SMA_WINDOWS)
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_ROW = {name: i for i, name in enumerate(INDICATOR_COLUMNS)}
+
+
+def indicator_matrix(close, dtype=np.float64, use_numba=None):
+    """
+    Computes the INDICATOR_COLUMNS for every row of `close`.
+
+    Args:
+        close (array): 2-D array shaped (tickers, bars), oldest bar first (a 1-D
+                       array is one ticker). Histories of different lengths are
+                       NaN-padded at the start; gaps inside a history must be filled.
+        dtype: Float type of the output block (float32 halves its size).
+        use_numba (bool): Use the compiled kernel; defaults to whether numba is installed.
+
+    Returns:
+        dict: Indicator name -> (tickers, bars) array, NaN until the indicator's
+              window is full. All arrays are views of one contiguous block.
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=float))
+    n_tickers, n_bars = close.shape
+    valid = np.isfinite(close)
+    start = np.where(valid.any(axis=1), valid.argmax(axis=1), n_bars)
+
+    if use_numba is None:
+        use_numba = numba is not None
+    if use_numba:
+        out = np.full((len(INDICATOR_COLUMNS), n_tickers, n_bars), np.nan)
+        _fused_loop_jit(close, start, out)
+    else:
+        out = _fused_numpy(close, start)
+    if out.dtype != dtype:
+        out = out.astype(dtype)
+    return {name: out[i] for i, name in enumerate(INDICATOR_COLUMNS)}
+
+
+def _fused_numpy(close, start):
+    n_tickers, n_bars = close.shape
+    out = np.full((len(INDICATOR_COLUMNS), n_tickers, n_bars), np.nan)
+    if n_bars == 0:
+        return out
+
+    # Bars since each ticker's first close; the padding takes the first close, so every
+    # recursion below sits at its seed value until the ticker's history starts
+    age = np.arange(n_bars) - start[:, None]
+    first = close[np.arange(n_tickers), np.minimum(start, n_bars - 1)]
+    filled = np.where(age < 0, first[:, None], close)
+
+    # 1. Recursive filters - one loop over time, rows laid out (bars, tickers)
+    diff = np.diff(filled, axis=1, prepend=filled[:, :1]).T
+    up, down = np.maximum(diff, 0.0), np.maximum(-diff, 0.0)
+    series = np.ascontiguousarray(filled.T)
+    seed_signal = (age <= MACD_SLOW - 1).T
+    a_rsi, a_fast = 1.0 / RSI_WINDOW, 2.0 / (MACD_FAST + 1)
+    a_slow, a_signal = 2.0 / (MACD_SLOW + 1), 2.0 / (MACD_SIGNAL + 1)
+
+    avg_up, avg_down = up[0].copy(), down[0].copy()
+    ema_fast, ema_slow = series[0].copy(), series[0].copy()
+    signal = np.zeros(n_tickers)
+    rec = np.empty((4, n_bars, n_tickers))
+    for t in range(n_bars):
+        if t:
+            avg_up += a_rsi * (up[t] - avg_up)
+            avg_down += a_rsi * (down[t] - avg_down)
+            ema_fast += a_fast * (series[t] - ema_fast)
+            ema_slow += a_slow * (series[t] - ema_slow)
+        macd = ema_fast - ema_slow
+        # The signal EMA starts at the first MACD value
+        signal = np.where(seed_signal[t], macd, signal + a_signal * (macd - signal))
+        rec[0, t], rec[1, t], rec[2, t], rec[3, t] = avg_up, avg_down, macd, signal
+    avg_up, avg_down, macd, signal = (r.T for r in rec)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_down == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_up / avg_down))
+    out[_ROW["RSI"]] = np.where(age >= RSI_WINDOW - 1, rsi, np.nan)
+    out[_ROW["MACD"]] = np.where(age >= MACD_SLOW - 1, macd, np.nan)
+    has_signal = age >= MACD_SLOW + MACD_SIGNAL - 2
+    out[_ROW["MACD_Signal"]] = np.where(has_signal, signal, np.nan)
+    out[_ROW["MACD_Hist"]] = np.where(has_signal, macd - signal, np.nan)
+
+    # 2. Rolling windows from cumulative sums, centered on the first close to limit rounding
+    centered = filled - first[:, None]
+    sums = np.zeros((n_tickers, n_bars + 1))
+    np.cumsum(centered, axis=1, out=sums[:, 1:])
+    sums_sq = np.zeros((n_tickers, n_bars + 1))
+    np.cumsum(centered * centered, axis=1, out=sums_sq[:, 1:])
+
+    def window_mean(cumulative, window):
+        mean = np.full((n_tickers, n_bars), np.nan)
+        mean[:, window - 1:] = (cumulative[:, window:] - cumulative[:, :-window]) / window
+        return np.where(age >= window - 1, mean, np.nan)
+
+    for window in SMA_WINDOWS:
+        out[_ROW[f"SMA_{window}"]] = first[:, None] + window_mean(sums, window)
+    mid = window_mean(sums, BB_WINDOW)
+    std = np.sqrt(np.maximum(window_mean(sums_sq, BB_WINDOW) - mid * mid, 0.0))
+    mid += first[:, None]
+    out[_ROW["BB_Mid"]] = mid
+    out[_ROW["BB_High"]] = mid + BB_DEV * std
+    out[_ROW["BB_Low"]] = mid - BB_DEV * std
+    return out
+
+
+def _fused_loop(close, start, out):
+    """Per-ticker loop computing the whole set in one pass (compiled with numba when available)."""
+    n_tickers, n_bars = close.shape
+    a_rsi, a_fast = 1.0 / RSI_WINDOW, 2.0 / (MACD_FAST + 1)
+    a_slow, a_signal = 2.0 / (MACD_SLOW + 1), 2.0 / (MACD_SIGNAL + 1)
+    windows = np.array(SMA_WINDOWS)
+    sums = np.zeros(len(SMA_WINDOWS))
+    for i in range(n_tickers):
+        s = start[i]
+        if s >= n_bars:
+            continue
+        first = close[i, s]
+        avg_up = avg_down = 0.0
+        ema_fast = ema_slow = signal = first
+        sums[:] = 0.0
+        bb_sum = bb_sum_sq = 0.0
+        for t in range(s, n_bars):
+            age = t - s
+            x = close[i, t]
+
+            # RSI - the first bar counts as no move
+            if age:
+                diff = x - close[i, t - 1]
+                avg_up += a_rsi * (max(diff, 0.0) - avg_up)
+                avg_down += a_rsi * (max(-diff, 0.0) - avg_down)
+                ema_fast += a_fast * (x - ema_fast)
+                ema_slow += a_slow * (x - ema_slow)
+            if age >= RSI_WINDOW - 1:
+                out[0, i, t] = 100.0 if avg_down == 0 else 100.0 - 100.0 / (1.0 + avg_up / avg_down)
+
+            # MACD - the signal EMA starts at the first MACD value
+            macd = ema_fast - ema_slow
+            if age <= MACD_SLOW - 1:
+                signal = macd
+            else:
+                signal += a_signal * (macd - signal)
+            if age >= MACD_SLOW - 1:
+                out[5, i, t] = macd
+            if age >= MACD_SLOW + MACD_SIGNAL - 2:
+                out[6, i, t] = signal
+                out[7, i, t] = macd - signal
+
+            # Rolling windows - add the new close, drop the one leaving each window
+            centered = x - first
+            for k in range(len(windows)):
+                sums[k] += centered
+                if age >= windows[k]:
+                    sums[k] -= close[i, t - windows[k]] - first
+                if age >= windows[k] - 1:
+                    out[1 + k, i, t] = first + sums[k] / windows[k]
+            bb_sum += centered
+            bb_sum_sq += centered * centered
+            if age >= BB_WINDOW:
+                leaving = close[i, t - BB_WINDOW] - first
+                bb_sum -= leaving
+                bb_sum_sq -= leaving * leaving
+            if age >= BB_WINDOW - 1:
+                mean = bb_sum / BB_WINDOW
+                std = np.sqrt(max(bb_sum_sq / BB_WINDOW - mean * mean, 0.0))
+                out[8, i, t] = first + mean + BB_DEV * std
+                out[9, i, t] = first + mean - BB_DEV * std
+                out[10, i, t] = first + mean
+
+
+_fused_loop_jit = numba.njit(cache=True)(_fused_loop) if numba is not None else _fused_loop
@@ -0,0 +1,188 @@
+import copy
+import math
+from collections import deque
+
+# Indicator columns produced by the engine, same names as the kernel path in stocks_data
+INDICATOR_COLUMNS = ["RSI", "SMA_20", "SMA_50", "SMA_100", "SMA_150",
+                     "MACD", "MACD_Signal", "MACD_Hist", "BB_High", "BB_Low", "BB_Mid"]
+
+RSI_WINDOW = 14
+SMA_WINDOWS = (20, 50, 100, 150)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_WINDOW, BB_DEV = 20, 2
+
+
+class IndicatorState:
+    """
+    Streaming state for RSI, SMA_20..SMA_150, MACD and Bollinger Bands.
+
+    `update(close)` consumes one bar in O(1) and returns that bar's indicator
+    values, following the `ta` library conventions (Wilder RSI via EWM with
+    alpha=1/14, EMAs with adjust=False, values are None until the window is full,
+    population std for the bands).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.prev_close = None
+        self.avg_up = 0.0
+        self.avg_down = 0.0
+        self.ema_fast = None
+        self.ema_slow = None
+        self.signal = None
+        self.signal_count = 0
+        self.window = deque(maxlen=max(SMA_WINDOWS))
+        self.sums = {n: 0.0 for n in SMA_WINDOWS}
+        self.bb_sum_sq = 0.0
+
+    def update(self, close):
+        """Consumes the next closed bar and returns its indicator values."""
+        close = float(close)
+        self.count += 1
+
+        # RSI - Wilder smoothing (ta seeds the first bar's move with 0)
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        up, down = max(diff, 0.0), max(-diff, 0.0)
+        if self.count == 1:
+            self.avg_up, self.avg_down = up, down
+        else:
+            alpha = 1.0 / RSI_WINDOW
+            self.avg_up += alpha * (up - self.avg_up)
+            self.avg_down += alpha * (down - self.avg_down)
+        self.prev_close = close
+
+        # MACD - EMAs run from the first bar, the signal starts at the first MACD value
+        self.ema_fast = _ema_step(self.ema_fast, close, MACD_FAST)
+        self.ema_slow = _ema_step(self.ema_slow, close, MACD_SLOW)
+        macd = signal = None
+        if self.count >= MACD_SLOW:
+            macd = self.ema_fast - self.ema_slow
+            self.signal = _ema_step(self.signal, macd, MACD_SIGNAL)
+            self.signal_count += 1
+            if self.signal_count >= MACD_SIGNAL:
+                signal = self.signal
+
+        # Rolling windows - add the new close, drop the one leaving each window
+        for n in SMA_WINDOWS:
+            self.sums[n] += close
+            if len(self.window) >= n:
+                self.sums[n] -= self.window[-n]
+        self.bb_sum_sq += close * close
+        if len(self.window) >= BB_WINDOW:
+            leaving = self.window[-BB_WINDOW]
+            self.bb_sum_sq -= leaving * leaving
+        self.window.append(close)
+
+        values = dict.fromkeys(INDICATOR_COLUMNS)
+        if self.count >= RSI_WINDOW:
+            if self.avg_down == 0:
+                values["RSI"] = 100.0
+            else:
+                values["RSI"] = 100.0 - 100.0 / (1.0 + self.avg_up / self.avg_down)
+        for n in SMA_WINDOWS:
+            if self.count >= n:
+                values[f"SMA_{n}"] = self.sums[n] / n
+        if macd is not None:
+            values["MACD"] = macd
+        if signal is not None:
+            values["MACD_Signal"] = signal
+            values["MACD_Hist"] = macd - signal
+        if self.count >= BB_WINDOW:
+            mean = self.sums[BB_WINDOW] / BB_WINDOW
+            std = math.sqrt(max(self.bb_sum_sq / BB_WINDOW - mean * mean, 0.0))
+            values["BB_Mid"] = mean
+            values["BB_High"] = mean + BB_DEV * std
+            values["BB_Low"] = mean - BB_DEV * std
+        return values
+
+    def peek(self, close):
+        """Indicator values for a (still forming) bar without advancing the state."""
+        return copy.deepcopy(self).update(close)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "prev_close": self.prev_close,
+            "avg_up": self.avg_up,
+            "avg_down": self.avg_down,
+            "ema_fast": self.ema_fast,
+            "ema_slow": self.ema_slow,
+            "signal": self.signal,
+            "signal_count": self.signal_count,
+            "window": list(self.window),
+            "sums": {str(n): s for n, s in self.sums.items()},
+            "bb_sum_sq": self.bb_sum_sq,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        for key in ("count", "prev_close", "avg_up", "avg_down", "ema_fast", "ema_slow",
+                    "signal", "signal_count", "bb_sum_sq"):
+            setattr(state, key, data[key])
+        state.window.extend(data["window"])
+        state.sums = {int(n): s for n, s in data["sums"].items()}
+        return state
+
+
+def _ema_step(previous, value, span):
+    if previous is None:
+        return value
+    alpha = 2.0 / (span + 1)
+    return previous + alpha * (value - previous)
+
+
+def update_indicators(ticker, df, store, interval="1wk", states=None):
+    """
+    Returns the indicator columns for `df`'s bars, advancing the persisted state
+    only over bars that are new since the last run.
+
+    All bars but the last are treated as closed and folded into the stored state;
+    the last bar may still be forming, so its values are computed with `peek`.
+    The state is rebuilt from `df` when it is missing or the stored bars it was
+    built on have changed (e.g. after a forced refresh).
+
+    Args:
+        ticker (str): Ticker symbol.
+        df (DataFrame): Bars with a Close column, oldest first.
+        store (BarStore): Store holding the indicator state and values.
+        interval (str): Bar interval the state belongs to.
+        states (dict): Optional in-memory copy of the states, (ticker, interval) ->
+                       (state, last_date, last_close), read instead of the store
+                       and kept up to date (e.g. by a long-running process).
+
+    Returns:
+        DataFrame: INDICATOR_COLUMNS indexed like `df`.
+    """
+    closes = df["Close"]
+    closed_bars = closes.iloc[:-1]
+
+    cached = states.get((ticker, interval)) if states is not None else None
+    if cached is not None:
+        # Advanced below, so the cached copy stays intact if this call fails
+        state, last_date, last_close = copy.deepcopy(cached[0]), cached[1], cached[2]
+    else:
+        state, last_date, last_close = store.load_indicator_state(ticker, interval)
+    start = 0
+    if state is not None and last_date in closed_bars.index and closed_bars[last_date] == last_close:
+        start = closed_bars.index.get_loc(last_date) + 1
+    else:
+        state = IndicatorState()
+        store.clear_indicators(ticker, interval)
+
+    rows = {}
+    for date, close in closed_bars.iloc[start:].items():
+        rows[date] = state.update(close)
+    advanced = start < len(closed_bars)
+    rows[closes.index[-1]] = state.peek(closes.iloc[-1])
+
+    if advanced:
+        store.save_indicators(ticker, interval, rows, state=state,
+                              last_date=closed_bars.index[-1], last_close=float(closed_bars.iloc[-1]))
+    else:
+        store.save_indicators(ticker, interval, rows)
+    if states is not None and len(closed_bars):
+        states[(ticker, interval)] = (state, closed_bars.index[-1], float(closed_bars.iloc[-1]))
+
+    values = store.load_indicator_values(ticker, interval, start=df.index[0])
+    return values.reindex(df.index)
@@ -0,0 +1,158 @@
+"""
+Lightweight run tracing: wall/CPU time per stage and per ticker, bytes written
+and Gemini call latency/token usage.
+
+Disabled by default - `span()` then returns a shared no-op context manager and
+the record helpers return immediately, so instrumented code pays one global
+lookup. Call `enable()` at the start of a run and `finish()` at the end to write
+the trace (JSON lines) and print a summary.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+_tracer = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def _emit(self, event):
+        event["t"] = round(time.time() - self.started, 6)
+        event["thread"] = threading.current_thread().name
+        with self.lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            event = {"type": "span", "name": name,
+                     "wall_s": time.perf_counter() - wall, "cpu_s": time.thread_time() - cpu, **attrs}
+            if error:
+                event["error"] = error
+            self._emit(event)
+
+    def write(self):
+        if not self.trace_path:
+            return
+        if os.path.dirname(self.trace_path):
+            os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+        with open(self.trace_path, "w", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def summary(self):
+        spans = defaultdict(lambda: {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        written = defaultdict(int)
+        llm = {"calls": 0, "latency_s": 0.0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+               "total_tokens": 0}
+        for event in self.events:
+            if event["type"] == "span":
+                stats = spans[event["name"]]
+                stats["count"] += 1
+                stats["wall_s"] += event["wall_s"]
+                stats["cpu_s"] += event["cpu_s"]
+            elif event["type"] == "bytes":
+                written[event["name"]] += event["bytes"]
+            elif event["type"] == "llm":
+                llm["calls"] += 1
+                llm["latency_s"] += event["latency_s"]
+                for key in ("prompt_tokens", "cached_tokens", "output_tokens", "total_tokens"):
+                    llm[key] += event.get(key) or 0
+
+        lines = [f"{'STAGE':<28} {'COUNT':>6} {'WALL(s)':>9} {'CPU(s)':>9}"]
+        for name, stats in spans.items():
+            lines.append(f"{name:<28} {stats['count']:>6} {stats['wall_s']:>9.3f} {stats['cpu_s']:>9.3f}")
+        for name, total in written.items():
+            lines.append(f"bytes written [{name}]: {total:,}")
+        if llm["calls"]:
+            lines.append(
+                f"Gemini: {llm['calls']} calls, avg latency {llm['latency_s'] / llm['calls']:.2f}s, "
+                f"tokens in/out/total {llm['prompt_tokens']:,}/{llm['output_tokens']:,}/{llm['total_tokens']:,} "
+                f"({llm['cached_tokens']:,} of the input from cached context)"
+            )
+        return "\n".join(lines)
+
+
+def enable(trace_path=None):
+    """Starts recording; the trace is written to `trace_path` by `finish()`."""
+    global _tracer
+    _tracer = Tracer(trace_path)
+    return _tracer
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def span(name, **attrs):
+    """Context manager timing a block (wall + thread CPU time) as stage `name`."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **attrs)
+
+
+def traced(name):
+    """Decorator timing every call of a function as stage `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(name, num_bytes, **attrs):
+    """Records `num_bytes` written by stage `name`."""
+    if _tracer is None:
+        return
+    _tracer._emit({"type": "bytes", "name": name, "bytes": num_bytes, **attrs})
+
+
+def record_llm_call(name, latency_s, response=None, **attrs):
+    """Records one Gemini call with its latency and the token counts from `usage_metadata`."""
+    if _tracer is None:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    _tracer._emit({
+        "type": "llm",
+        "name": name,
+        "latency_s": latency_s,
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "cached_tokens": getattr(usage, "cached_content_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "total_tokens": getattr(usage, "total_token_count", None),
+        **attrs,
+    })
+
+
+def finish():
+    """Writes the trace file, prints the summary and stops recording."""
+    global _tracer
+    if _tracer is None:
+        return
+    tracer, _tracer = _tracer, None
+    tracer.write()
+    print("\nRun summary:")
+    print(tracer.summary())
+    if tracer.trace_path:
+        print(f"Trace written to {tracer.trace_path}")
@@ -1,17 +1,167 @@
 import os
 from collections import defaultdict
 
-import my_portfolio
+import instrumentation
+from advice_merger import merge_advice_files
+from calc_cash_balance import default_quote_service
 from gemini_merge_results import merge_gemini_outputs_and_create_table
-from gemini_query import analyze_stock
-from result_splitter import split_portfolio_data
+from gemini_query import analyze_stocks, analyze_stream
+from response_cache import ResponseCache
 
-def sendToGemini():
-    output_dir = 'output'
-    for fn in os.listdir(output_dir):
-        file_path = os.path.join(output_dir, fn)
-        if os.path.isfile(file_path):
-            analyze_stock(file_path)
+# my_portfolio (ib_insync) and result_splitter (pandas, yfinance) are imported
+# where they are used, so `cli.py` commands that don't need them start fast
+
+# Stream ticker objects straight from the splitter to Gemini instead of going through `output/`
+STREAMING_PIPELINE = True
+# In streaming mode, also save `output/ticker_<SYMBOL>.json` as a side stage
+WRITE_ARTIFACTS = True
+
+# "columnar" keeps per-ticker files and prompts compact, "records" is the date-keyed schema,
+# "summary" sends locally computed features (latest values, slopes, crosses, levels)
+# plus the last SUMMARY_TAIL_BARS raw bars instead of the full series
+PAYLOAD_FORMAT = "columnar"
+SUMMARY_TAIL_BARS = 8
+
+# Download daily bars once and resample weekly/monthly locally; adds daily/monthly
+# indicators, the daily ATR and recent swing lows to the payload (stop inputs)
+MULTI_TIMEFRAME = True
+
+# Worker processes for indicator computation (None = serial); pays off with hundreds of tickers
+INDICATOR_WORKERS = None
+
+# Update indicators from state persisted next to the bars instead of recomputing 5y of history
+INCREMENTAL_INDICATORS = True
+
+# Gemini request concurrency / rate limit
+GEMINI_MAX_WORKERS = 4
+GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_MAX_RETRIES = 5
+
+# How the shared prompt instructions are sent: "cache" (cached context, falls back
+# to "system" when too short/unavailable), "system" or "inline" (in every prompt)
+GEMINI_PROMPT_PREFIX = "cache"
+
+# Pack several tickers into one request, up to this many estimated tokens of ticker
+# data (None = one ticker per request); answers are split back per symbol and
+# tickers without a usable section are re-queried alone
+GEMINI_PACK_TOKENS = None
+GEMINI_PACK_MAX_TICKERS = 8
+
+# Ask for schema-constrained JSON advice and merge it locally (budget allocation,
+# partial buys, totals); LLM_MERGE sends the advice to Gemini for the table instead
+STRUCTURED_OUTPUT = True
+LLM_MERGE = False
+
+# Local merge: estimate the positions' and BUYs' covariance from the stored bars and
+# fund BUYs that are highly correlated with the portfolio last (see risk.py)
+RISK_ADJUSTED_MERGE = True
+
+# Reuse advice for tickers whose data is unchanged; BYPASS forces fresh answers
+GEMINI_CACHE_ENABLED = True
+GEMINI_CACHE_BYPASS = False
+
+# Record per-stage timings, bytes written and Gemini usage; summary printed at the end
+TRACE_ENABLED = False
+TRACE_PATH = os.path.join("data", "trace.jsonl")
+
+# Symbols to analyze besides the current positions
+CANDIDATES = ["AMD",
+              "TSM",
+              "INTC",
+              "PLTR",
+              "AAPL",
+              "SANM",
+              "AVGO",
+              "HOOD",
+              "OKLO",
+              "ESTC",
+              "VRT",
+              "MSFT",
+              "ORCL",
+              "TSLA",
+              "AMZN",
+              "SEDG",
+              "COHU",
+              "COMP",
+              "META",
+              "NNE",
+              "MP",
+              "XOM",
+              "SOFI"]
+
+# Optional universe file (one symbol per line, e.g. index constituents). When it exists,
+# it is screened together with CANDIDATES and only the SCREEN_TOP_N best-scoring symbols
+# (plus the held positions) go to Gemini; see screener.py
+UNIVERSE_FILE = os.path.join("data", "universe.txt")
+SCREEN_TOP_N = 15
+
+def sendToGemini(file_paths=None):
+    """Analyzes `file_paths`, by default every ticker file in output/ (not portfolio.json)."""
+    if file_paths is None:
+        from result_splitter import list_ticker_files
+
+        file_paths = list_ticker_files('output')
+    analyze_stocks(file_paths,
+                   max_workers=GEMINI_MAX_WORKERS,
+                   requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                   max_retries=GEMINI_MAX_RETRIES,
+                   cache=make_cache(),
+                   structured=STRUCTURED_OUTPUT,
+                   prefix_mode=GEMINI_PROMPT_PREFIX,
+                   pack_tokens=GEMINI_PACK_TOKENS,
+                   pack_max_tickers=GEMINI_PACK_MAX_TICKERS)
+
+def stream_to_gemini(data, download=None, store=None, frames=None, indicator_states=None):
+    """
+    Streaming pipeline: each ticker object goes to the Gemini workers as soon as
+    its technical data is ready; files are only written as an optional side stage.
+
+    Args:
+        frames (dict): Bars already loaded by the caller (e.g. the daemon), so none are fetched.
+        indicator_states (dict): In-memory incremental indicator states kept by the caller.
+
+    Returns:
+        dict: Symbol -> advice file path (None for failed requests).
+    """
+    from result_splitter import iter_ticker_objects, write_ticker_files
+
+    ticker_objects = iter_ticker_objects(data, payload_format=PAYLOAD_FORMAT, workers=INDICATOR_WORKERS,
+                                         incremental=INCREMENTAL_INDICATORS, multi_timeframe=MULTI_TIMEFRAME,
+                                         summary_tail=SUMMARY_TAIL_BARS, download=download, store=store,
+                                         frames=frames, indicator_states=indicator_states)
+    if WRITE_ARTIFACTS:
+        ticker_objects = write_ticker_files(ticker_objects, payload_format=PAYLOAD_FORMAT)
+    return analyze_stream(ticker_objects,
+                          max_workers=GEMINI_MAX_WORKERS,
+                          requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                          max_retries=GEMINI_MAX_RETRIES,
+                          cache=make_cache(),
+                          structured=STRUCTURED_OUTPUT,
+                          prefix_mode=GEMINI_PROMPT_PREFIX,
+                          pack_tokens=GEMINI_PACK_TOKENS,
+                          pack_max_tickers=GEMINI_PACK_MAX_TICKERS)
+
+
+def merge_results(portfolio, store=None, quotes=None):
+    """
+    Builds the actions table - locally from structured advice, or with a second Gemini call.
+
+    Args:
+        store (BarStore): Bars for the risk model (defaults to `BarStore()`).
+        quotes (QuoteService): Price source; pass one built on the IB session to use
+                               IB snapshots (defaults to the shared yfinance-backed service).
+    """
+    if STRUCTURED_OUTPUT and not LLM_MERGE:
+        if RISK_ADJUSTED_MERGE and store is None:
+            from bar_store import BarStore
+            store = BarStore()
+        merge_advice_files(portfolio, quotes=quotes or default_quote_service(), store=store if RISK_ADJUSTED_MERGE else None,
+                           interval="1d" if MULTI_TIMEFRAME else "1wk")
+    else:
+        merge_gemini_outputs_and_create_table()
+
+def make_cache():
+    return ResponseCache(bypass=GEMINI_CACHE_BYPASS) if GEMINI_CACHE_ENABLED else None
 
 def empty_folders():
     output_dir = 'output'
@@ -34,33 +184,39 @@ def empty_folders():
                 except OSError:
                     pass
 
-def enrich_portfolio(data):
-    candidates = ["AMD",
-                  "TSM",
-                  "INTC",
-                  "PLTR",
-                  "AAPL",
-                  "SANM",
-                  "AVGO",
-                  "HOOD",
-                  "OKLO",
-                  "ESTC",
-                  "VRT",
-                  "MSFT",
-                  "SANM",
-                  "ORCL",
-                  "TSLA",
-                  "AMZN",
-                  "SEDG",
-                  "COHU",
-                  "COMP",
-                  "META",
-                  "SEDG",
-                  "NNE",
-                  "MP",
-                  "XOM",
-                  "SOFI"]
+def screen_universe(exclude=()):
+    """The symbols `screen_candidates` picks from: CANDIDATES (+ UNIVERSE_FILE when it exists), minus `exclude`."""
+    if not UNIVERSE_FILE or not os.path.isfile(UNIVERSE_FILE):
+        return CANDIDATES
+    from screener import load_universe
+
+    exclude = set(exclude)
+    return [sym for sym in dict.fromkeys(CANDIDATES + load_universe(UNIVERSE_FILE)) if sym not in exclude]
+
+
+def screen_candidates(exclude=(), download=None, store=None, frames=None):
+    """
+    CANDIDATES, or the top SCREEN_TOP_N of CANDIDATES + UNIVERSE_FILE when the file exists.
+
+    Args:
+        exclude (iterable): Symbols left out of the ranking (e.g. held positions).
+        download, store, frames: Passed on to `screener.screen`.
+    """
+    if not UNIVERSE_FILE or not os.path.isfile(UNIVERSE_FILE):
+        return CANDIDATES
+    from screener import screen
+
+    symbols, _ = screen(screen_universe(exclude), top_n=SCREEN_TOP_N, download=download, store=store,
+                        multi_timeframe=MULTI_TIMEFRAME, frames=frames)
+    return symbols
+
 
+def enrich_portfolio(data, candidates=None, split=True):
+    """
+    Attaches open orders to positions and lists the candidates not held yet.
+    Without explicit `candidates`, they come from `screen_candidates()`.
+    With `split`, also writes the per-ticker files (the non-streaming pipeline).
+    """
     # 1. Group open orders by symbol
     orders_map = defaultdict(list)
     for order in data.get("open_orders", []):
@@ -77,21 +233,56 @@ def enrich_portfolio(data):
         # Add matching orders to the position
         position["active_orders"] = orders_map.get(symbol, [])
 
+    if candidates is None:
+        candidates = screen_candidates(exclude=portfolio_symbols)
+
     # Filter: Only keep candidates that are NOT in the current portfolio
     data["interesting_symbols"] = [
         sym for sym in candidates
         if sym not in portfolio_symbols
     ]
 
-    split_portfolio_data(data)
+    if split:
+        split_to_files(data)
+    return data
+
+
+def split_to_files(data):
+    """
+    Writes the per-ticker files of enriched portfolio data (the non-streaming pipeline).
+
+    Returns:
+        list: Paths of the ticker files, to pass to `sendToGemini`.
+    """
+    from result_splitter import split_portfolio_data
+
+    file_paths = split_portfolio_data(data, payload_format=PAYLOAD_FORMAT, workers=INDICATOR_WORKERS,
+                                      incremental=INCREMENTAL_INDICATORS, multi_timeframe=MULTI_TIMEFRAME,
+                                      summary_tail=SUMMARY_TAIL_BARS)
 
     del data["open_orders"]
     del data["account"]
-    return data
+    return file_paths
+
+
+def run_pipeline():
+    """Full run: portfolio -> indicators -> per-ticker advice -> merged actions table."""
+    import my_portfolio
+    from quote_service import QuoteService
+
+    empty_folders()
+    input_json = my_portfolio.get_portfolio_json()
+    if STREAMING_PIPELINE:
+        stream_to_gemini(enrich_portfolio(input_json, split=False))
+    else:
+        sendToGemini(split_to_files(enrich_portfolio(input_json, split=False)))
+    # IB snapshots on the session the portfolio came from, yfinance for what IB can't price
+    merge_results(input_json, quotes=QuoteService(session=my_portfolio.default_session()))
 
 
-empty_folders()
-input_json = my_portfolio.get_portfolio_json()
-enriched_data = enrich_portfolio(input_json)
-sendToGemini()
-merge_gemini_outputs_and_create_table()
\ No newline at end of file
+# Guarded so worker processes (spawned on Windows) don't re-run the pipeline on import
+if __name__ == "__main__":
+    if TRACE_ENABLED:
+        instrumentation.enable(TRACE_PATH)
+    run_pipeline()
+    instrumentation.finish()
\ No newline at end of file
@@ -0,0 +1,323 @@
+import copy
+
+from ib_session import import_ib_insync
+
+# Canonical action names; anything else (e.g. "Hold") places no orders
+BUY, FIX_STOP, ADD_STOP, REDUCE, CLOSE = "Buy", "Fix Stop", "Add Stop", "Reduce", "Close"
+
+_ACTION_ALIASES = {
+    "buy": BUY,
+    "fix stop": FIX_STOP,
+    "fix stop loss": FIX_STOP,
+    "add stop": ADD_STOP,
+    "add stop loss": ADD_STOP,
+    "reduce": REDUCE,
+    "sell": REDUCE,
+    "close": CLOSE,
+}
+
+# Order statuses that no longer count as open
+DONE_STATUSES = {"Filled", "Cancelled", "ApiCancelled", "Inactive"}
+
+# Price tolerance when deciding whether an open order already matches
+PRICE_TOLERANCE = 0.005
+
+
+def normalize_action(name):
+    """Maps an action name from the actions table to its canonical form (None = no orders)."""
+    return _ACTION_ALIASES.get(" ".join(str(name).lower().split()))
+
+
+class OrderEngine:
+    """
+    Applies a structured action list to the account in one pass.
+
+    Each action is a dict like
+    {"symbol": "AMD", "action": "Buy", "qty": 10, "limit_price": 150.0, "stop_price": 140.0}
+    (`qty`, `limit_price` and `stop_price` are optional depending on the action).
+
+    `plan()` diffs the actions against the current positions and open orders and
+    returns only the creates, modifies and cancels needed to get there:
+
+    - Buy: a BUY limit (market without a limit price); with a stop price it is
+      sent as a bracket - the parent plus an attached protective stop. An open
+      buy is resized/repriced instead, along with its attached stop (a stop
+      price for a buy without one is reported and skipped).
+    - Fix Stop / Add Stop: one SELL stop covering `qty` (default: the whole
+      position); an existing stop over the whole position is modified and its
+      duplicates are cancelled. Bracket children and scaled stops (smaller
+      stops set deliberately) are left alone.
+    - Reduce: a SELL for `qty` and the stops resized to the remaining shares.
+    - Close: a SELL for the whole position. At market, every other open order
+      is cancelled; with a limit price, the sell and the stop are put in one OCA
+      group so whichever fills first cancels the other.
+
+    `execute()` qualifies every contract it needs in one batch, submits all
+    operations back to back and waits for the acknowledgements together.
+
+    Args:
+        session (IBSession): Connection used for reads and orders.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    # -------------------------------------------------------
+    # PLANNING
+    # -------------------------------------------------------
+    def plan(self, actions):
+        """
+        Returns the list of operations for `actions`.
+
+        Each operation is a dict {"op": "create"|"modify"|"cancel", "symbol",
+        "order", "trade" (the open trade for modify/cancel), "reason", "parent"
+        (for a bracket child, the create op of its parent)}.
+        """
+        ib = self.session.ensure_connected()
+        positions, _ = self.session.run(ib.reqPositionsAsync(), ib.reqAllOpenOrdersAsync())
+        shares = {p.contract.symbol: p.position for p in positions}
+        open_trades = {}
+        for trade in ib.openTrades():
+            if trade.orderStatus.status not in DONE_STATUSES:
+                open_trades.setdefault(trade.contract.symbol, []).append(trade)
+
+        ops = []
+        for action in actions:
+            symbol = action["symbol"]
+            kind = normalize_action(action.get("action", ""))
+            trades = open_trades.get(symbol, [])
+            position = shares.get(symbol, 0)
+            if kind == BUY:
+                ops += self._plan_buy(symbol, action, trades)
+            elif kind in (FIX_STOP, ADD_STOP):
+                ops += self._plan_stop(symbol, action, trades, position)
+            elif kind == REDUCE:
+                ops += self._plan_reduce(symbol, action, trades, position)
+            elif kind == CLOSE:
+                ops += self._plan_close(symbol, action, trades, position)
+        return ops
+
+    def _plan_buy(self, symbol, action, trades):
+        ib_insync = import_ib_insync()
+        qty = action.get("qty")
+        if not qty:
+            print(f"Skipping Buy {symbol}: no quantity")
+            return []
+        limit_price = action.get("limit_price")
+        stop_price = action.get("stop_price")
+        buys = [t for t in trades if t.order.action == "BUY" and t.order.orderType in ("LMT", "MKT")]
+
+        if buys:
+            # Resize / reprice the existing buy instead of stacking a new one
+            ops = [_cancel(t, symbol, "duplicate buy") for t in buys[1:]]
+            changes = {"totalQuantity": qty}
+            if limit_price and buys[0].order.orderType == "LMT":
+                changes["lmtPrice"] = limit_price
+            ops = _modify_if_changed(buys[0], symbol, changes, "buy") + ops
+
+            # Its attached stop follows the new size and stop price
+            children = _bracket_stops(trades, buys[0])
+            stop_changes = {"totalQuantity": qty}
+            if stop_price:
+                stop_changes["auxPrice"] = stop_price
+            if children:
+                ops += _modify_if_changed(children[0], symbol, stop_changes, "buy (bracket stop)")
+            elif stop_price:
+                print(f"Skipping stop {stop_price} for Buy {symbol}: the open buy has no attached stop")
+            return ops
+
+        if limit_price:
+            parent = ib_insync.LimitOrder("BUY", qty, limit_price)
+        else:
+            parent = ib_insync.MarketOrder("BUY", qty)
+        if not stop_price:
+            return [_create(symbol, parent, "buy")]
+
+        # Bracket: the stop only goes live once the parent fills. The ids are
+        # linked in execute(), so planning doesn't reserve order ids.
+        parent.transmit = False
+        stop = ib_insync.StopOrder("SELL", qty, stop_price, transmit=True)
+        parent_op = _create(symbol, parent, "buy (bracket parent)")
+        return [parent_op, _create(symbol, stop, "buy (bracket stop)", parent=parent_op)]
+
+    def _plan_stop(self, symbol, action, trades, position, qty=None):
+        ib_insync = import_ib_insync()
+        qty = qty if qty is not None else (action.get("qty") or position)
+        stop_price = action.get("stop_price")
+        if qty <= 0:
+            print(f"Skipping stop for {symbol}: no shares to protect")
+            return []
+
+        # Only stops over the whole position are ours to change; smaller ones are scaled stops
+        stops = _stops(trades)
+        covering = [t for t in stops if t.order.totalQuantity >= position]
+        scaled = [t for t in stops if t not in covering]
+        target = covering or [t for t in scaled if t.order.totalQuantity == qty]
+        if not target:
+            if scaled and qty >= position:
+                print(f"Skipping stop for {symbol}: protected by {len(scaled)} scaled stop(s), left unchanged")
+                return []
+            if not stop_price:
+                print(f"Skipping stop for {symbol}: no stop price")
+                return []
+            return [_create(symbol, ib_insync.StopOrder("SELL", qty, stop_price), "stop")]
+
+        changes = {"totalQuantity": qty}
+        if stop_price:
+            changes["auxPrice"] = stop_price
+        ops = _modify_if_changed(target[0], symbol, changes, "stop")
+        return ops + [_cancel(t, symbol, "duplicate stop") for t in covering[1:]]
+
+    def _plan_exit(self, symbol, qty, limit_price, trades, reason, oca_group=""):
+        """A SELL (limit or market) for `qty`, reusing an open exit order if there is one."""
+        exits = _exits(trades)
+        if not exits or exits[0].order.orderType != ("LMT" if limit_price else "MKT"):
+            order = _sell_order(qty, limit_price)
+            if oca_group:
+                order.ocaGroup, order.ocaType = oca_group, 1
+            return [_create(symbol, order, reason)] + [_cancel(t, symbol, f"replaced {reason}") for t in exits]
+
+        changes = {"totalQuantity": qty}
+        if limit_price:
+            changes["lmtPrice"] = limit_price
+        ops = _modify_if_changed(exits[0], symbol, changes, reason)
+        return ops + [_cancel(t, symbol, f"duplicate {reason}") for t in exits[1:]]
+
+    def _plan_reduce(self, symbol, action, trades, position):
+        qty = action.get("qty")
+        if not qty or qty >= position:
+            return self._plan_close(symbol, action, trades, position)
+        ops = self._plan_exit(symbol, qty, action.get("limit_price"), trades, "reduce")
+        return ops + self._plan_stop(symbol, action, trades, position, qty=position - qty)
+
+    def _plan_close(self, symbol, action, trades, position):
+        if position <= 0:
+            return [_cancel(t, symbol, "close (no position)") for t in trades]
+        limit_price = action.get("limit_price")
+        stops, exits = _stops(trades), _exits(trades)
+        others = [t for t in trades if t not in stops and t not in exits]
+        ops = [_cancel(t, symbol, "close") for t in others]
+        if not limit_price:
+            return ops + self._plan_exit(symbol, position, None, trades, "close") + \
+                [_cancel(t, symbol, "close") for t in stops]
+
+        # Limit exit: keep a stop as protection in one OCA group with the sell, so
+        # whichever fills first cancels the other. Orders can't join a group once
+        # submitted, so a stop/sell outside the group is replaced, not modified.
+        oca_group = f"close-{symbol}"
+        in_group = [t for t in exits if t.order.ocaGroup == oca_group]
+        ops += self._plan_exit(symbol, position, limit_price, in_group, "close", oca_group)
+        ops += [_cancel(t, symbol, "close (replaced by OCA sell)") for t in exits if t not in in_group]
+
+        grouped_stops = [t for t in stops if t.order.ocaGroup == oca_group]
+        stop_price = action.get("stop_price") or (stops[0].order.auxPrice if stops else None)
+        if grouped_stops:
+            ops += self._plan_stop(symbol, action, grouped_stops, position, qty=position)
+        elif stop_price:
+            stop = import_ib_insync().StopOrder("SELL", position, stop_price)
+            stop.ocaGroup, stop.ocaType = oca_group, 1
+            ops.append(_create(symbol, stop, "close (OCA stop)"))
+        return ops + [_cancel(t, symbol, "close (replaced by OCA stop)") for t in stops if t not in grouped_stops]
+
+    # -------------------------------------------------------
+    # EXECUTION
+    # -------------------------------------------------------
+    def execute(self, actions, dry_run=False):
+        """
+        Plans `actions` and, unless `dry_run`, submits the operations.
+
+        Returns:
+            list: The planned operations; submitted ones carry their "result" trade.
+        """
+        ops = self.plan(actions)
+        print_plan(ops, dry_run)
+        if dry_run or not ops:
+            return ops
+
+        creates = [op for op in ops if op["op"] == "create"]
+        contracts = self.session.qualify([(op["symbol"], "STK", "SMART", "USD") for op in creates])
+
+        ib = self.session.ensure_connected()
+        parents = {id(op["parent"]) for op in creates if op["parent"] is not None}
+        for op in ops:
+            if op["op"] == "cancel":
+                op["result"] = ib.cancelOrder(op["trade"].order)
+            elif op["op"] == "modify":
+                op["result"] = ib.placeOrder(op["trade"].contract, op["order"])
+            elif op["symbol"] in contracts:
+                # Bracket ids are reserved only now, right before the parent goes out
+                if id(op) in parents:
+                    op["order"].orderId = self.session.next_order_id()
+                elif op["parent"] is not None:
+                    op["order"].parentId = op["parent"]["order"].orderId
+                op["result"] = ib.placeOrder(contracts[op["symbol"]], op["order"])
+            else:
+                op["result"] = None
+                print(f"Skipping {op['symbol']}: contract not qualified")
+
+        self.session.wait_for_acks([op["result"] for op in ops if op["op"] != "cancel" and op["result"]])
+        return ops
+
+
+def _stops(trades):
+    """Position stops: SELL stops that aren't attached to a bracket parent."""
+    return [t for t in trades if t.order.action == "SELL" and t.order.orderType == "STP"
+            and not getattr(t.order, "parentId", 0)]
+
+
+def _bracket_stops(trades, parent):
+    """The stops attached to the bracket parent `parent`."""
+    return [t for t in trades if t.order.action == "SELL" and t.order.orderType == "STP"
+            and getattr(t.order, "parentId", 0) == parent.order.orderId]
+
+
+def _exits(trades):
+    return [t for t in trades if t.order.action == "SELL" and t.order.orderType in ("LMT", "MKT")]
+
+
+def _create(symbol, order, reason, parent=None):
+    """A create op; `parent` is the create op of the bracket parent for an attached order."""
+    return {"op": "create", "symbol": symbol, "order": order, "trade": None, "reason": reason, "parent": parent}
+
+
+def _cancel(trade, symbol, reason):
+    return {"op": "cancel", "symbol": symbol, "order": trade.order, "trade": trade, "reason": reason, "parent": None}
+
+
+def _modify_if_changed(trade, symbol, changes, reason):
+    """A modify op with `changes` applied to a copy of the order, or [] if nothing changes."""
+    differs = False
+    for field, value in changes.items():
+        current = getattr(trade.order, field, None)
+        if isinstance(value, float) and isinstance(current, (int, float)):
+            differs |= abs(current - value) > PRICE_TOLERANCE
+        else:
+            differs |= current != value
+    if not differs:
+        return []
+    order = copy.copy(trade.order)
+    for field, value in changes.items():
+        setattr(order, field, value)
+    return [{"op": "modify", "symbol": symbol, "order": order, "trade": trade, "reason": reason, "parent": None}]
+
+
+def _sell_order(qty, limit_price=None):
+    ib_insync = import_ib_insync()
+    if limit_price:
+        return ib_insync.LimitOrder("SELL", qty, limit_price)
+    return ib_insync.MarketOrder("SELL", qty)
+
+
+def print_plan(ops, dry_run=False):
+    title = "Order plan (dry run)" if dry_run else "Order plan"
+    if not ops:
+        print(f"{title}: nothing to do - open orders already match the actions.")
+        return
+    print(f"{title}:")
+    print(f"{'OP':<7} {'SYMBOL':<7} {'SIDE':<5} {'TYPE':<4} {'QTY':>7} {'LIMIT':>10} {'STOP':>10}  REASON")
+    for op in ops:
+        order = op["order"]
+        lmt = order.lmtPrice if order.orderType == "LMT" else None
+        aux = order.auxPrice if order.orderType == "STP" else None
+        print(f"{op['op']:<7} {op['symbol']:<7} {order.action:<5} {order.orderType:<4} {order.totalQuantity:>7g} "
+              f"{'' if lmt is None else f'{lmt:.2f}':>10} {'' if aux is None else f'{aux:.2f}':>10}  {op['reason']}")
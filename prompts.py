@@ -0,0 +1,87 @@
+"""
+Versioned prompt templates for the per-ticker Gemini requests.
+
+A template is split into the shared `instructions` - identical for every ticker
+and sent once per run as cached context (or as the system instruction) - and the
+short per-ticker part rendered around the ticker JSON (or around several tickers'
+JSON in packed requests). Bump `version` whenever the wording changes; the
+version is part of the response cache key.
+"""
+
+
+class PromptTemplate:
+    def __init__(self, name, version, instructions, ticker_template="Stock Data JSON:\n{stock_json}",
+                 packed_note=""):
+        self.name = name
+        self.version = version
+        self.instructions = instructions.strip()
+        self.ticker_template = ticker_template
+        # How to lay out the answer when one request carries several stocks
+        self.packed_note = packed_note.strip()
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    def render(self, stock_json):
+        """The per-ticker part of the request."""
+        return self.ticker_template.format(stock_json=stock_json)
+
+    def render_inline(self, stock_json):
+        """Instructions and ticker data as one message (no shared prefix)."""
+        return f"{self.instructions}\n\n{self.render(stock_json)}"
+
+    def render_packed(self, stock_jsons):
+        """
+        The per-request part for several tickers at once.
+
+        Args:
+            stock_jsons (dict): Symbol -> ticker JSON string.
+        """
+        symbols = ", ".join(stock_jsons)
+        parts = [f"This request contains {len(stock_jsons)} stocks: {symbols}. Apply the rules to each stock "
+                 f"on its own. {self.packed_note}"]
+        parts += [f"[{symbol}] {self.render(stock_json)}" for symbol, stock_json in stock_jsons.items()]
+        return "\n\n".join(parts)
+
+    def render_packed_inline(self, stock_jsons):
+        """Instructions and several tickers' data as one message."""
+        return f"{self.instructions}\n\n{self.render_packed(stock_jsons)}"
+
+    def fingerprint(self):
+        """Identifies the exact wording (for cache keys), even if the version wasn't bumped."""
+        return f"{self.id}\n{self.instructions}\n{self.ticker_template}"
+
+
+_RULES = """
+I am a swing trader that does changes on a weekly basis. I check stocks weekly at market close.
+Every request contains the JSON of one or more stocks; please do technical analysis of each stock on its own,
+based on the technical indicators provided for it, following these rules:
+
+
+1. Audit my current position.
+2. Review my Stop Loss (ensure it covers the full position)
+3. Advise on my Free Cash usage (only buy if trend is confirmed)
+4. use min/max in-day prices not close prices for calculations such as stop loss or buy limit price.
+5. for every buy - give score from 1 to 10 about certainty of the buy based on technical analysis (10 being highest confidence)
+6. you can sell partial amount
+7. avoid over-trading
+"""
+
+ADVICE_PROMPT = PromptTemplate("advice", 2, _RULES + """
+8. Provide a neat table of actions.
+""", packed_note="""
+Start each stock's answer with a line `=== <SYMBOL> ===` (e.g. `=== AMD ===`) and write nothing before the first one.
+""")
+
+STRUCTURED_ADVICE_PROMPT = PromptTemplate("structured-advice", 2, _RULES + """
+For each stock, answer with the list of actions for that stock only (use "Hold" when nothing should change):
+- action: Buy, Fix Stop, Add Stop, Hold, Sell, Reduce or Close
+- qty: number of shares (for stops: shares covered)
+- price_low / price_high: the entry (Buy) or exit (Sell/Reduce/Close) price range
+- stop_price: the stop loss price, when the action sets or keeps one
+- confidence: 1-10
+- reason: one short sentence
+""", packed_note="""
+Answer with a JSON list holding one object (symbol and actions) per stock.
+""")
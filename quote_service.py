@@ -0,0 +1,96 @@
+import math
+import threading
+import time
+
+
+class QuoteService:
+    """
+    Last/close prices for many symbols in one batch.
+
+    Symbols missing from the in-process cache are requested together: first as
+    an IB market data snapshot on `session` (an `ib_session.IBSession`, whose
+    contract cache saves re-qualifying symbols on every batch), then whatever
+    IB couldn't price through one batched yfinance download of recent daily
+    bars. Prices are cached for `ttl_seconds`. An already connected
+    `ib_insync.IB` can be passed as `ib` instead of a session.
+    """
+
+    def __init__(self, ib=None, ttl_seconds=60, clock=time.monotonic, download=None, session=None):
+        if session is None and ib is not None:
+            from ib_session import IBSession
+
+            session = IBSession(ib_factory=lambda: ib)
+            session.ib = ib
+        self.session = session
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.download = download
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def get_prices(self, symbols):
+        """
+        Returns {symbol: price} for the unique `symbols`; symbols no source could
+        price are left out.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        now = self.clock()
+        prices = {}
+        with self.lock:
+            for symbol in symbols:
+                entry = self.cache.get(symbol)
+                if entry and now - entry[1] <= self.ttl_seconds:
+                    prices[symbol] = entry[0]
+
+        missing = [s for s in symbols if s not in prices]
+        fetched = {}
+        ib = self.session.ib if self.session is not None else None
+        if missing and ib is not None and ib.isConnected():
+            fetched.update(self._ib_snapshot(missing))
+            missing = [s for s in missing if s not in fetched]
+        if missing:
+            fetched.update(self._yfinance_last_close(missing))
+
+        with self.lock:
+            for symbol, price in fetched.items():
+                self.cache[symbol] = (price, now)
+        prices.update(fetched)
+        return prices
+
+    def _ib_snapshot(self, symbols):
+        try:
+            # Only symbols the session hasn't qualified before cost a round trip
+            contracts = self.session.qualify([(symbol, 'STK', 'SMART', 'USD') for symbol in symbols])
+            # One snapshot request per contract, sent together and awaited as a batch
+            tickers = self.session.ib.reqTickers(*contracts.values()) if contracts else []
+        except Exception as e:
+            print(f"IB snapshot failed, falling back to yfinance: {e}")
+            return {}
+
+        prices = {}
+        for ticker in tickers:
+            price = _valid_price(ticker.marketPrice()) or _valid_price(ticker.close)
+            if price:
+                prices[ticker.contract.symbol] = price
+        return prices
+
+    def _yfinance_last_close(self, symbols):
+        from stocks_data import fetch_history
+
+        frames, errors = fetch_history(symbols, period="5d", interval="1d", download=self.download)
+        prices = {}
+        for symbol, df in frames.items():
+            closes = df["Close"].dropna()
+            if not closes.empty:
+                prices[symbol] = float(closes.iloc[-1])
+        return prices
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+def _valid_price(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value <= 0:
+        return None
+    return float(value)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join("data", "gemini_cache")
+
+# Fields that change on every run without changing what the model sees as data
+VOLATILE_KEYS = {"last_updated"}
+
+
+def normalize_payload(payload):
+    """Drops volatile fields (recursively) so unchanged data hashes the same."""
+    if isinstance(payload, dict):
+        return {k: normalize_payload(v) for k, v in payload.items() if k not in VOLATILE_KEYS}
+    if isinstance(payload, list):
+        return [normalize_payload(v) for v in payload]
+    return payload
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of LLM responses.
+
+    Entries are keyed by a hash of the model name, the prompt template and the
+    normalized payload, stored one file per key. Entries older than `ttl_seconds`
+    are ignored and removed; beyond `max_entries` the least recently used go first.
+    With `bypass`, lookups always miss but fresh responses are still stored.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, ttl_seconds=3 * 24 * 3600, max_entries=1000,
+                 bypass=False, clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.clock = clock
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(model, prompt_template, payload):
+        blob = json.dumps(
+            {"model": model, "template": prompt_template, "payload": normalize_payload(payload)},
+            sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f"{key}.txt")
+
+    def get(self, key):
+        """Returns the cached response text, or None on a miss."""
+        if self.bypass:
+            return None
+        path = self._entry_path(key)
+        try:
+            if self.clock() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            # Bump access time for LRU eviction (mtime doubles as "stored at")
+            os.utime(path, (self.clock(), os.path.getmtime(path)))
+            return text
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        now = self.clock()
+        os.utime(path, (now, now))
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            entries = []
+            for fname in os.listdir(self.path):
+                if not fname.endswith(".txt"):
+                    continue
+                full_path = os.path.join(self.path, fname)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_mtime, full_path))
+
+            now = self.clock()
+            live = []
+            for atime, mtime, full_path in entries:
+                if now - mtime > self.ttl_seconds:
+                    _remove(full_path)
+                else:
+                    live.append((atime, full_path))
+
+            if len(live) > self.max_entries:
+                live.sort()
+                for _, full_path in live[:len(live) - self.max_entries]:
+                    _remove(full_path)
+
+    def clear(self):
+        with self.lock:
+            for fname in os.listdir(self.path):
+                _remove(os.path.join(self.path, fname))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,12 +1,24 @@
 import json
+import os
 
-from stocks_data import get_technical_analysis_json
+import instrumentation
+from stocks_data import SUMMARY_TAIL, iter_technical_analysis
 
 
-def split_portfolio_data(data):
+def iter_ticker_objects(data, refresh=False, payload_format="records", workers=None, incremental=False,
+                        multi_timeframe=False, summary_tail=SUMMARY_TAIL, download=None, store=None,
+                        frames=None, indicator_states=None):
+    """
+    Builds the per-ticker objects (position, open orders, technical data) for
+    every symbol in positions, orders and `interesting_symbols`.
 
+    Returns a generator that yields each ticker object as soon as its technical
+    data is computed. The portfolio lookups are taken eagerly, so `data` may be
+    modified after this call returns. `download`, `store`, `frames` and
+    `indicator_states` are passed on to `iter_technical_analysis`.
+    """
     # ---------------------------------------------------------
-    # PART 2: SAVE PER-TICKER JSONs
+    # PART 2: BUILD PER-TICKER OBJECTS
     # ---------------------------------------------------------
     # We need to collect every symbol found in Positions, Orders, OR Technical Data
     all_symbols = set()
@@ -30,9 +42,11 @@ def split_portfolio_data(data):
     all_symbols.update(orders_map.keys())
     all_symbols.update(data.get('interesting_symbols'))
 
+    free_cash = data.get("cash_usd", 0.0)
+
     print(f"Found {len(all_symbols)} unique symbols. Splitting files...")
 
-    for sym in sorted(all_symbols):
+    def ticker_object(sym, tech_data):
         # 1. Get Position Data (default to 0 if not held)
         pos = positions_map.get(sym, {})
         shares = pos.get('shares', 0.0)
@@ -41,22 +55,79 @@ def split_portfolio_data(data):
         # 2. Get Open Orders (default to empty list)
         sym_orders = orders_map.get(sym, [])
 
-        # 3. Get Technical Data (default to None/Empty)
-        tech_data = technical_map.get(sym, {})
-
-        # 4. Construct the per-ticker object
-        ticker_obj = {
-            "free_cash": data.get("cash_usd", 0.0),
+        # 3. Construct the per-ticker object
+        return {
+            "free_cash": free_cash,
             "symbol": sym,
             "shares": shares,
             "avg_cost": avg_cost,
             "open_orders": sym_orders,
-            "technical_data": get_technical_analysis_json([sym])[0]
+            "technical_data": tech_data
         }
 
-        # 5. Save to file
-        filename = f"ticker_{sym}.json"
-        with open('output/'+filename, 'w') as f:
+    def generate():
+        # Fetch every symbol in one batch (single grouped download), then yield per ticker
+        pending = set(all_symbols)
+        for result in iter_technical_analysis(sorted(all_symbols), download=download, store=store, refresh=refresh,
+                                              payload_format=payload_format, workers=workers,
+                                              incremental=incremental, multi_timeframe=multi_timeframe,
+                                              summary_tail=summary_tail, frames=frames,
+                                              indicator_states=indicator_states):
+            sym = result['ticker']
+            pending.discard(sym)
+            yield ticker_object(sym, result)
+
+        # Symbols without fresh technical data (default to the provided data or empty)
+        for sym in sorted(pending):
+            yield ticker_object(sym, technical_map.get(sym, {}))
+
+    return generate()
+
+
+def write_ticker_file(ticker_obj, payload_format="records", output_dir="output"):
+    """Saves one ticker object as `<output_dir>/ticker_<SYMBOL>.json` and returns the path."""
+    sym = ticker_obj["symbol"]
+    filename = f"ticker_{sym}.json"
+    path = output_dir + '/' + filename
+    with open(path, 'w') as f:
+        if payload_format == "records":
             json.dump(ticker_obj, f, indent=4)
+        else:
+            # Machine mode: no indentation or padding
+            json.dump(ticker_obj, f, separators=(",", ":"))
+        instrumentation.record_bytes("split", f.tell(), ticker=sym)
+
+    print(f" -> Created {filename}")
+    return path
+
+
+def list_ticker_files(output_dir="output"):
+    """Paths of the `ticker_<SYMBOL>.json` files in `output_dir` (other files, e.g. portfolio.json, are left out)."""
+    return [
+        os.path.join(output_dir, fn) for fn in sorted(os.listdir(output_dir))
+        if fn.startswith("ticker_") and fn.endswith(".json") and os.path.isfile(os.path.join(output_dir, fn))
+    ]
+
+
+def write_ticker_files(ticker_objects, payload_format="records", output_dir="output"):
+    """Side stage for streams: writes each ticker object to disk and passes it on."""
+    for ticker_obj in ticker_objects:
+        write_ticker_file(ticker_obj, payload_format=payload_format, output_dir=output_dir)
+        yield ticker_obj
+
+
+@instrumentation.traced("split")
+def split_portfolio_data(data, refresh=False, payload_format="records", workers=None, incremental=False,
+                         multi_timeframe=False, summary_tail=SUMMARY_TAIL):
+    """
+    Writes one `output/ticker_<SYMBOL>.json` per symbol (see `iter_ticker_objects`).
 
-        print(f" -> Created {filename}")
\ No newline at end of file
+    Returns:
+        list: Paths of the written ticker files.
+    """
+    return [
+        write_ticker_file(ticker_obj, payload_format=payload_format)
+        for ticker_obj in iter_ticker_objects(data, refresh=refresh, payload_format=payload_format,
+                                              workers=workers, incremental=incremental,
+                                              multi_timeframe=multi_timeframe, summary_tail=summary_tail)
+    ]
@@ -0,0 +1,175 @@
+"""
+Cross-holding risk for the merge stage.
+
+Builds a returns panel for the positions and the proposed BUYs from the bars
+already in the bar store (no download), then gets the covariance/correlation
+matrix, the portfolio volatility and every BUY's marginal risk with a few
+matrix products - no loop over tickers or ticker pairs.
+"""
+import numpy as np
+import pandas as pd
+
+# Bars of history the matrix is estimated on, and bars per year to annualize with
+RISK_LOOKBACK = {"1d": 252, "1wk": 104}
+PERIODS_PER_YEAR = {"1d": 252, "1wk": 52}
+
+# Tickers with fewer returns than this are left out of the matrix
+MIN_OBSERVATIONS = 20
+
+
+class RiskModel:
+    """
+    Annualized covariance of the tickers' returns.
+
+    Args:
+        symbols (list): Tickers, in matrix order.
+        cov (array): Annualized covariance matrix, (tickers, tickers).
+        last_close (dict): Ticker -> latest close, to value positions.
+    """
+
+    def __init__(self, symbols, cov, last_close=None):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.cov = cov
+        self.vol = np.sqrt(np.diag(cov))
+        self.last_close = last_close or {}
+
+    @property
+    def corr(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.cov / np.outer(self.vol, self.vol)
+
+    def exposure(self, amounts, equity):
+        """Dollar amounts per symbol -> weight vector in matrix order (unknown symbols dropped)."""
+        weights = np.zeros(len(self.symbols))
+        for symbol, amount in amounts.items():
+            if symbol in self.index and equity:
+                weights[self.index[symbol]] += amount / equity
+        return weights
+
+    def portfolio_vol(self, weights):
+        """Annualized volatility of a weight vector."""
+        return float(np.sqrt(max(weights @ self.cov @ weights, 0.0)))
+
+    def buy_risk(self, weights, buys):
+        """
+        What each BUY would do to the portfolio, all BUYs at once.
+
+        Args:
+            weights (array): Current weights (see `exposure`).
+            buys (dict): Symbol -> weight the BUY adds.
+
+        Returns:
+            dict: Symbol -> {"corr_to_portfolio", "max_corr", "max_corr_symbol",
+                  "vol", "vol_after", "marginal_vol"}; symbols without enough
+                  history are missing.
+        """
+        symbols = [s for s in buys if s in self.index]
+        if not symbols:
+            return {}
+        idx = np.array([self.index[s] for s in symbols])
+        added = np.array([buys[s] for s in symbols], dtype=float)
+
+        cov_w = self.cov @ weights
+        variance = max(float(weights @ cov_w), 0.0)
+        port_vol = np.sqrt(variance)
+        # sigma(w + b e_i)^2 = w'Cw + 2 b (Cw)_i + b^2 C_ii
+        vol_after = np.sqrt(np.maximum(variance + 2 * added * cov_w[idx] + added ** 2 * self.cov[idx, idx], 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr_to_portfolio = cov_w[idx] / (self.vol[idx] * port_vol)
+
+        # Strongest correlation with a current holding
+        held = weights != 0
+        max_corr = np.full(len(idx), np.nan)
+        max_corr_symbol = [None] * len(idx)
+        if held.any():
+            corr = np.where(np.eye(len(self.symbols), dtype=bool), np.nan, self.corr)[np.ix_(idx, held)]
+            corr = np.where(np.isnan(corr), -np.inf, corr)
+            best = corr.argmax(axis=1)
+            max_corr = corr[np.arange(len(idx)), best]
+            held_symbols = np.array(self.symbols)[held]
+            max_corr_symbol = [held_symbols[b] if np.isfinite(c) else None for b, c in zip(best, max_corr)]
+
+        def num(value):
+            return None if not np.isfinite(value) else round(float(value), 4)
+
+        return {
+            symbol: {
+                "corr_to_portfolio": num(corr_to_portfolio[i]),
+                "max_corr": num(max_corr[i]),
+                "max_corr_symbol": max_corr_symbol[i],
+                "vol": num(self.vol[idx[i]]),
+                "vol_after": num(vol_after[i]),
+                "marginal_vol": num(vol_after[i] - port_vol),
+            }
+            for i, symbol in enumerate(symbols)
+        }
+
+
+def returns_panel(frames, lookback=None):
+    """
+    Simple returns of every ticker's Close on one date index.
+
+    Args:
+        frames (dict): ticker -> bars with a Close column.
+        lookback (int): Keep only the last `lookback` returns.
+
+    Returns:
+        DataFrame: dates x tickers, NaN where a ticker has no bar.
+    """
+    close = pd.DataFrame({t: df["Close"] for t, df in frames.items() if not df.empty}).sort_index()
+    returns = close.pct_change(fill_method=None).iloc[1:]
+    return returns.tail(lookback) if lookback else returns
+
+
+def covariance_matrix(returns, min_observations=MIN_OBSERVATIONS):
+    """
+    Pairwise covariance of a returns panel with missing values, in one pass:
+    the demeaned returns (missing = 0) and the validity mask go through one
+    matrix product each, so every pair is normalized by its own overlap.
+    Equal to pandas' pairwise `DataFrame.cov` when histories only differ in
+    where they start (the overlap is then one ticker's whole history).
+
+    Returns:
+        tuple: (symbols, covariance) - per-period covariance of the tickers with
+               at least `min_observations` returns.
+    """
+    valid = returns.notna()
+    returns = returns.loc[:, valid.sum() >= min_observations]
+    values = returns.to_numpy(dtype=float)
+    mask = np.isfinite(values)
+    centered = np.where(mask, values - np.nanmean(values, axis=0), 0.0)
+    overlap = mask.T.astype(float) @ mask
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (centered.T @ centered) / (overlap - 1)
+    cov[overlap < 2] = 0.0
+    return list(returns.columns), cov
+
+
+def build_risk_model(frames, interval="1wk", lookback=None, min_observations=MIN_OBSERVATIONS):
+    """
+    Risk model for the tickers in `frames`.
+
+    Args:
+        frames (dict): ticker -> OHLCV DataFrame (e.g. from `BarStore.load`).
+        interval (str): Bar interval of the frames ("1d" or "1wk").
+        lookback (int): Bars of history to use (RISK_LOOKBACK for the interval if None).
+
+    Returns:
+        RiskModel: The model (empty if no ticker has enough history).
+    """
+    lookback = lookback or RISK_LOOKBACK.get(interval, 104)
+    returns = returns_panel(frames, lookback)
+    symbols, cov = covariance_matrix(returns, min_observations)
+    last_close = {t: float(df["Close"].iloc[-1]) for t, df in frames.items() if not df.empty}
+    return RiskModel(symbols, cov * PERIODS_PER_YEAR.get(interval, 52), last_close)
+
+
+def load_risk_model(symbols, store, interval="1wk"):
+    """Risk model from the bars the pipeline already stored - nothing is downloaded."""
+    frames = {}
+    for symbol in dict.fromkeys(symbols):
+        df = store.load(symbol, interval)
+        if not df.empty:
+            frames[symbol] = df
+    return build_risk_model(frames, interval)
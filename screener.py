@@ -0,0 +1,191 @@
+"""
+Pre-screening of a large symbol universe before the per-ticker Gemini stage.
+
+Bars for the whole universe are loaded into one panel (one DataFrame per
+field, dates x tickers) and the ranking signals are computed across all
+tickers at once - the fused indicator kernel and the NumPy volume profile engine
+take the whole (tickers, bars) matrix, so there is no Python loop per ticker.
+"""
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from indicator_kernel import indicator_matrix
+from stocks_data import TIMEFRAMES, load_history, resample_bars
+from volume_profile import volume_profiles
+
+PANEL_FIELDS = ("High", "Low", "Close", "Volume")
+
+# Weight of each signal in the score (every signal is scaled to [-1, 1])
+SIGNAL_WEIGHTS = {
+    "trend": 2.0,
+    "rsi_regime": 1.0,
+    "macd_cross": 1.0,
+    "support": 1.0,
+}
+
+# A fresh MACD cross counts if it happened within this many bars
+MACD_CROSS_LOOKBACK = 3
+
+# Support further away than this share of the price scores 0
+MAX_SUPPORT_DISTANCE = 0.15
+
+
+def load_universe(path):
+    """
+    Reads a universe file: one symbol per line, blank lines and `#` comments
+    ignored, duplicates dropped (first occurrence kept).
+    """
+    symbols = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            symbol = line.split("#", 1)[0].strip().upper()
+            if symbol:
+                symbols.append(symbol)
+    return list(dict.fromkeys(symbols))
+
+
+def build_panel(frames, fields=PANEL_FIELDS):
+    """
+    Aligns per-ticker bars on one date index.
+
+    Args:
+        frames (dict): ticker -> OHLCV DataFrame (as returned by `load_history`).
+        fields (tuple): Columns to put in the panel.
+
+    Returns:
+        dict: field -> DataFrame (dates x tickers). Dates before a ticker's first
+              bar are NaN; gaps in Close are forward-filled.
+    """
+    panel = {field: pd.DataFrame({t: df[field] for t, df in frames.items()}).sort_index() for field in fields}
+    if "Close" in panel:
+        panel["Close"] = panel["Close"].ffill()
+    return panel
+
+
+def panel_indicators(close, names=("SMA_50", "SMA_150", "RSI", "MACD_Hist", "BB_Low")):
+    """
+    The ranking indicators for every column of `close`, from one call of the
+    fused kernel (same values as the `ta` library).
+
+    Returns:
+        dict: name -> DataFrame shaped like `close`.
+    """
+    values = indicator_matrix(close.to_numpy(dtype=float).T)
+    return {name: pd.DataFrame(values[name].T, index=close.index, columns=close.columns) for name in names}
+
+
+def screen_panel(panel, profile_bins=50, profile_lookback=90):
+    """
+    Scores every ticker in the panel on its latest bar.
+
+    Signals, each in [-1, 1]:
+    - trend: +0.5 for Close above SMA_50, +0.5 for SMA_50 above SMA_150 (negative otherwise)
+    - rsi_regime: 1 in the 50-70 momentum zone, 0.5 for 40-50, 0 when overbought (>= 70),
+      -1 below 40
+    - macd_cross: 1 for a bullish histogram cross in the last MACD_CROSS_LOOKBACK bars,
+      -1 for a bearish one, otherwise 0.5 / -0.5 for the histogram's sign
+    - support: 1 when the nearest support below the price (BB low, value area low
+      or point of control) is right under it, down to 0 at MAX_SUPPORT_DISTANCE;
+      -1 without any support below
+
+    Returns:
+        DataFrame: One row per ticker with the latest values, the signals and
+                   "score", sorted best first. Tickers without enough bars for
+                   the SMA_150 get NaN signals and sort last.
+    """
+    close = panel["Close"]
+    ind = panel_indicators(close)
+    last = {name: frame.iloc[-1] for name, frame in ind.items()}
+    price = close.iloc[-1]
+
+    # 1. Trend vs SMA_50 / SMA_150
+    trend = (0.5 * np.sign(price - last["SMA_50"]) + 0.5 * np.sign(last["SMA_50"] - last["SMA_150"]))
+
+    # 2. RSI regime
+    rsi = last["RSI"]
+    rsi_regime = pd.Series(np.select([rsi >= 70, rsi >= 50, rsi >= 40, rsi < 40], [0.0, 1.0, 0.5, -1.0],
+                                     default=np.nan), index=close.columns)
+
+    # 3. MACD cross within the last few bars
+    hist = ind["MACD_Hist"].tail(MACD_CROSS_LOOKBACK + 1)
+    sign = np.sign(hist)
+    crossed_up = ((sign.shift() <= 0) & (sign > 0)).iloc[1:].any()
+    crossed_down = ((sign.shift() >= 0) & (sign < 0)).iloc[1:].any()
+    macd_cross = pd.Series(np.select([crossed_up, crossed_down], [1.0, -1.0], default=0.5 * sign.iloc[-1]),
+                           index=close.columns)
+
+    # 4. Distance to the nearest support below the price
+    to_array = lambda field: panel[field].to_numpy(dtype=float).T
+    profiles = volume_profiles(to_array("High"), to_array("Low"), to_array("Volume"),
+                               bins=profile_bins, lookback=profile_lookback)
+    levels = np.vstack([last["BB_Low"].to_numpy(), profiles["value_area_low"], profiles["poc"]])
+    below = np.where(levels <= price.to_numpy(), levels, np.nan)
+    nearest = np.where(np.isnan(below), -np.inf, below).max(axis=0)
+    nearest[~np.isfinite(nearest)] = np.nan
+    distance = (price.to_numpy() - nearest) / price.to_numpy()
+    support = np.where(np.isnan(distance), -1.0, 1.0 - np.clip(distance / MAX_SUPPORT_DISTANCE, 0.0, 1.0))
+
+    result = pd.DataFrame({
+        "close": price,
+        "sma50": last["SMA_50"],
+        "sma150": last["SMA_150"],
+        "rsi": rsi,
+        "macd_hist": last["MACD_Hist"],
+        "bb_low": last["BB_Low"],
+        "value_area_low": profiles["value_area_low"],
+        "poc": profiles["poc"],
+        "support_distance": distance,
+        "trend": trend,
+        "rsi_regime": rsi_regime,
+        "macd_cross": macd_cross,
+        "support": support,
+    }, index=close.columns)
+
+    # Without the SMA_150 the trend (and so the score) is unknown
+    result.loc[last["SMA_150"].isna(), list(SIGNAL_WEIGHTS)] = np.nan
+    result["score"] = sum(weight * result[name] for name, weight in SIGNAL_WEIGHTS.items())
+    return result.sort_values("score", ascending=False, na_position="last")
+
+
+@instrumentation.traced("screen")
+def screen(tickers, top_n=20, download=None, store=None, refresh=False, multi_timeframe=False, frames=None):
+    """
+    Loads the universe's weekly bars (through the bar store, so later runs only
+    fetch new bars) and returns the best-scoring symbols.
+
+    Held positions don't need to be in `tickers`: the splitter always sends
+    them to the LLM stage next to the screened candidates.
+
+    Args:
+        tickers (list): The universe to screen.
+        top_n (int): Number of best-scoring symbols to return.
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        store (BarStore): Bar store to use, defaults to `BarStore()`.
+        refresh (bool): Re-download the full history instead of only new bars.
+        multi_timeframe (bool): Resample weekly bars from the daily ones, so the
+                                screen shares the LLM stage's daily download.
+        frames (dict): Bars already loaded with `load_history` for the same interval;
+                       nothing is downloaded and tickers missing from it are not screened.
+
+    Returns:
+        tuple: (symbols, ranking) - the top-N symbols, best first, and the full
+               `screen_panel` ranking.
+    """
+    if frames is not None:
+        errors = {t: "No data found" for t in tickers if t not in frames}
+        frames = {t: frames[t] for t in tickers if t in frames}
+    else:
+        frames, errors = load_history(tickers, period="5y", interval="1d" if multi_timeframe else "1wk",
+                                      download=download, store=store, refresh=refresh)
+    if multi_timeframe:
+        frames = {t: resample_bars(df, TIMEFRAMES["weekly"][1]) for t, df in frames.items()}
+    for ticker, error in errors.items():
+        print(f"Warning: {error} for {ticker}, not screened")
+    if not frames:
+        return [], pd.DataFrame()
+
+    ranking = screen_panel(build_panel(frames))
+    top = ranking.index[ranking["score"].notna()][:top_n].tolist()
+    print(f"Screened {len(ranking)} symbols, top {len(top)}: {top}")
+    return top, ranking
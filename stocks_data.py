@@ -1,153 +1,857 @@
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
-import ta
 import yfinance as yf
 
+import instrumentation
+from bar_store import BarStore
+from indicator_kernel import indicator_matrix
+from indicator_state import INDICATOR_COLUMNS, update_indicators
+from volume_profile import volume_profile
 
-def get_technical_analysis_json(tickers):
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Incremental downloads re-fetch this many closed bars before the last stored one;
+# if their prices moved by more than the tolerance (relative), a split or dividend
+# re-adjusted the history and the ticker is downloaded again in full
+OVERLAP_BARS = 3
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+PAYLOAD_FORMATS = ("records", "columnar", "summary")
+
+# "summary" payload: raw bars kept at the end of it (0 = none), bars used for
+# slopes and changes, and how far back MA/MACD crosses are reported
+SUMMARY_TAIL = 8
+SLOPE_BARS = 4
+CROSS_LOOKBACK = 8
+
+# Output field name -> DataFrame column, for the columnar payload
+COLUMNAR_FIELDS = {
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volume": "Volume",
+    "rsi": "RSI",
+    "sma20": "SMA_20",
+    "sma50": "SMA_50",
+    "sma100": "SMA_100",
+    "sma150": "SMA_150",
+    "macd": "MACD",
+    "macd_signal": "MACD_Signal",
+    "macd_hist": "MACD_Hist",
+    "bb_high": "BB_High",
+    "bb_mid": "BB_Mid",
+    "bb_low": "BB_Low",
+    "atr": "ATR",
+}
+
+# Multi-timeframe mode: one daily download, the other timeframes resampled from it.
+# Timeframe -> (interval the bar store keys its indicator state by, resample rule or None)
+TIMEFRAMES = {
+    "daily": ("1d", None),
+    # Monday-labelled weeks, like yfinance's weekly bars
+    "weekly": ("1wk", "W-MON"),
+    "monthly": ("1mo", "MS"),
+}
+
+# Bars of each extra timeframe included in the payload (the weekly section keeps 90)
+TIMEFRAME_TAIL = {"daily": 30, "monthly": 36}
+
+ATR_WINDOW = 14
+# A swing low is the lowest Low of the SWING_WINDOW bars on either side of it
+SWING_WINDOW = 3
+SWING_LOOKBACK = 90
+MAX_SWING_LOWS = 5
+
+
+def columnar_series(output_df):
     """
-    Fetches market data, calculates technical indicators (RSI, MACD, SMA, VRVP),
-    and returns a JSON string containing the analysis.
+    Converts the output candles/indicators into {"date": [...], field: [...]} with
+    NaN mapped to None, working on whole NumPy columns instead of per-cell checks.
+    """
+    series = {"date": output_df.index.strftime('%Y-%m-%d').tolist()}
+    for field, column in COLUMNAR_FIELDS.items():
+        if column not in output_df.columns:
+            continue
+        values = output_df[column].to_numpy(dtype=float)
+        series[field] = np.where(np.isnan(values), None, values).tolist()
+    return series
+
+
+def resample_bars(df, rule):
+    """
+    Aggregates OHLCV bars to a coarser timeframe (e.g. "W-MON", "MS"), each bar
+    labelled with the start of its period. Periods without bars are dropped.
+    """
+    bars = df[OHLCV_COLUMNS].resample(rule, label="left", closed="left").agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    )
+    return bars.dropna(subset=["Close"])
+
+
+def timeframe_bars(daily_df):
+    """Daily bars plus the weekly and monthly bars resampled from them (see TIMEFRAMES)."""
+    return {name: daily_df if rule is None else resample_bars(daily_df, rule)
+            for name, (_, rule) in TIMEFRAMES.items()}
+
+
+def swing_lows(df, window=SWING_WINDOW, lookback=SWING_LOOKBACK, limit=MAX_SWING_LOWS):
+    """
+    Recent swing lows: bars whose Low is the lowest of the `window` bars before
+    and after them. The last `window` bars can't be confirmed yet and are skipped.
+
+    Returns:
+        list: Up to `limit` {"date", "low"} dicts, most recent first.
+    """
+    return _swing_points(df["Low"], "low", window, lookback, limit)
+
+
+def swing_highs(df, window=SWING_WINDOW, lookback=SWING_LOOKBACK, limit=MAX_SWING_LOWS):
+    """Recent swing highs, the mirror image of `swing_lows`."""
+    return _swing_points(df["High"], "high", window, lookback, limit)
+
+
+def _swing_points(series, key, window, lookback, limit):
+    series = series.tail(lookback)
+    rolling = series.rolling(2 * window + 1, center=True)
+    extreme = rolling.min() if key == "low" else rolling.max()
+    pivots = series[series == extreme]
+    return [{"date": idx.strftime('%Y-%m-%d'), key: round(float(val), 2)}
+            for idx, val in pivots.iloc[::-1].head(limit).items()]
+
+
+def records_series(output_df):
+    """Converts candles/indicators into a dict keyed by date, NaN mapped to None."""
+    candles_dict = {}
+    for index, row in output_df.iterrows():
+        # Handle potentially missing values (NaN) for JSON compliance
+        row_data = row.to_dict()
+        cleaned_row = {k: (None if pd.isna(v) else v) for k, v in row_data.items()}
+
+        date_str = index.strftime('%Y-%m-%d')
+        candles_dict[date_str] = cleaned_row
+    return candles_dict
+
+
+def fetch_history(tickers, period="5y", interval="1wk", download=None, start=None):
+    """
+    Downloads OHLCV bars for all tickers in a single grouped request and splits
+    the result into one DataFrame per ticker.
 
     Args:
         tickers (list): A list of ticker symbols strings, e.g. ["AAPL", "NVDA"]
+        period (str): yfinance period string.
+        interval (str): yfinance interval string.
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        start (Timestamp): Fetch from this date instead of the whole period.
 
     Returns:
-        str: A JSON formatted string with the results.
+        tuple: (frames, errors) - dict of ticker -> DataFrame and
+               dict of ticker -> error message for symbols that failed or were empty.
     """
+    download = download or yf.download
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}, {}
 
-    # Helper to fix JSON date serialization issues
-    def json_serial(obj):
-        if isinstance(obj, (pd.Timestamp, datetime)):
-            return obj.isoformat()
-        raise TypeError(f"Type {type(obj)} not serializable")
+    if start is not None:
+        span = {"start": pd.Timestamp(start).strftime('%Y-%m-%d')}
+    else:
+        span = {"period": period}
 
-    all_results = []
-    print(f"Starting analysis for: {tickers}")
+    try:
+        raw = download(tickers, interval=interval, group_by="ticker",
+                       progress=False, threads=True, **span)
+    except Exception as e:
+        return {}, {ticker: f"Download failed: {e}" for ticker in tickers}
 
-    for ticker in tickers:
-        try:
-            print(f"Processing {ticker}...")
+    return split_download(raw, tickers)
 
-            # 1. FETCH DATA
-            # Fetch weekly data for the past 5 years to ensure enough data for calculations
-            df = yf.download(ticker, period="5y", interval="1wk", progress=False)
 
-            # Fix for yfinance MultiIndex columns (common in newer versions)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
+def split_download(raw, tickers):
+    """
+    Splits a (possibly grouped) yfinance download into per-ticker frames.
 
-            if df.empty:
-                print(f"Warning: No data found for {ticker}")
-                continue
+    Handles both column layouts yfinance produces - (Ticker, Price) and
+    (Price, Ticker) - as well as a flat frame for a single ticker.
 
-            # 2. CALCULATE INDICATORS
-            # RSI (14 weeks)
-            df['RSI'] = ta.momentum.RSIIndicator(df['Close'], window=14).rsi()
-
-            # SMAs (20, 50, 100, 150 weeks)
-            df['SMA_20'] = ta.trend.SMAIndicator(df['Close'], window=20).sma_indicator()
-            df['SMA_50'] = ta.trend.SMAIndicator(df['Close'], window=50).sma_indicator()
-            df['SMA_100'] = ta.trend.SMAIndicator(df['Close'], window=100).sma_indicator()
-            df['SMA_150'] = ta.trend.SMAIndicator(df['Close'], window=150).sma_indicator()
-
-            # MACD
-            macd = ta.trend.MACD(df['Close'])
-            df['MACD'] = macd.macd()
-            df['MACD_Signal'] = macd.macd_signal()
-            df['MACD_Hist'] = macd.macd_diff()
-
-            # BB
-            indicator_bb = ta.volatility.BollingerBands(close=df["Close"], window=20, window_dev=2)
-            df['BB_High'] = indicator_bb.bollinger_hband()
-            df['BB_Low'] = indicator_bb.bollinger_lband()
-            df['BB_Mid'] = indicator_bb.bollinger_mavg()
-
-            # 3. CALCULATE VOLUME PROFILE (VRVP Approx)
-            # Use the last 90 weeks for the profile to keep it relevant to current price action
-            recent_df = df.tail(90).copy()
-
-            if recent_df.empty:
+    Returns:
+        tuple: (frames, errors) as in `fetch_history`.
+    """
+    frames, errors = {}, {}
+
+    if raw is None or raw.empty:
+        return {}, {ticker: "No data found" for ticker in tickers}
+
+    ticker_level = None
+    if isinstance(raw.columns, pd.MultiIndex):
+        for level in range(raw.columns.nlevels):
+            if set(tickers) & set(raw.columns.get_level_values(level)):
+                ticker_level = level
+                break
+
+    for ticker in tickers:
+        if ticker_level is not None:
+            if ticker not in raw.columns.get_level_values(ticker_level):
+                errors[ticker] = "No data found"
                 continue
+            df = raw.xs(ticker, axis=1, level=ticker_level)
+        elif not isinstance(raw.columns, pd.MultiIndex) and len(tickers) == 1:
+            df = raw
+        else:
+            errors[ticker] = "No data found"
+            continue
+
+        # Grouped downloads align all tickers on one index, drop the padding rows
+        if "Close" not in df.columns:
+            errors[ticker] = "No Close column in download"
+            continue
+        df = df.dropna(subset=["Close"])
+        if df.empty:
+            errors[ticker] = "No data found"
+            continue
+
+        df = df[[col for col in OHLCV_COLUMNS if col in df.columns]].copy()
+        df.columns.name = None
+        frames[ticker] = df
+
+    return frames, errors
+
+
+def period_start(period, now=None):
+    """
+    Converts a yfinance period string ("5y", "6mo", "2wk", "10d", "max") into
+    the first date it covers.
+    """
+    if period == "max":
+        return None
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+
+    count, unit = int(match.group(1)), match.group(2)
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+    offsets = {
+        "d": pd.DateOffset(days=count),
+        "wk": pd.DateOffset(weeks=count),
+        "mo": pd.DateOffset(months=count),
+        "y": pd.DateOffset(years=count),
+    }
+    return (now - offsets[unit]).normalize()
+
 
-            price_bins = 50
-            price_min = recent_df['Close'].min()
-            price_max = recent_df['Close'].max()
-            price_range = price_max - price_min
+def load_history(tickers, period="5y", interval="1wk", download=None, store=None, refresh=False):
+    """
+    Returns OHLCV history per ticker from the local bar store, downloading only
+    the bars that are missing.
+
+    Tickers with no stored history get the whole period. Tickers with history
+    get one grouped download starting OVERLAP_BARS closed bars before their last
+    stored bar, because that bar may have still been forming (e.g. the current
+    week) when it was saved. yfinance returns split/dividend adjusted prices, so
+    when the re-fetched closed bars no longer match the stored ones the stored
+    history is on an old adjustment and the ticker is downloaded again in full.
+
+    Args:
+        tickers (list): A list of ticker symbols strings, e.g. ["AAPL", "NVDA"]
+        period (str): yfinance period string to return (and to fetch on first use).
+        interval (str): yfinance interval string.
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        store (BarStore): Bar store to use, defaults to `BarStore()`.
+        refresh (bool): Ignore stored bars and re-download the whole period.
+
+    Returns:
+        tuple: (frames, errors) as in `fetch_history`.
+    """
+    store = store or BarStore()
+    tickers = list(dict.fromkeys(tickers))
+    frames, errors = {}, {}
+
+    # 1. Group tickers by where their download has to start
+    full_fetch = []
+    tail_fetch = defaultdict(list)
+    overlap = {}
+    for ticker in tickers:
+        stored = None if refresh else store.tail(ticker, interval, OVERLAP_BARS + 1)
+        if stored is None or stored.empty:
+            full_fetch.append(ticker)
+        else:
+            # The last stored bar may have been forming, only the ones before it are compared
+            overlap[ticker] = stored.iloc[:-1]
+            tail_fetch[stored.index[0]].append(ticker)
+
+    if full_fetch:
+        fetched, failed = fetch_history(full_fetch, period=period, interval=interval, download=download)
+        for ticker, df in fetched.items():
+            store.save(ticker, interval, df, replace=True)
+        errors.update(failed)
 
-            if price_range == 0:
-                bin_size = 1
+    # 2. Tail downloads, checking the overlap for a changed split/dividend adjustment
+    readjusted = []
+    for start_date, group in tail_fetch.items():
+        fetched, failed = fetch_history(group, interval=interval, download=download, start=start_date)
+        for ticker, df in fetched.items():
+            if adjustment_changed(overlap[ticker], df):
+                readjusted.append(ticker)
             else:
-                bin_size = price_range / price_bins
-
-            def get_bin(price):
-                # Bin floor logic
-                return int((price - price_min) / bin_size) * bin_size + price_min
-
-            recent_df['Price_Bin'] = recent_df['Close'].apply(get_bin)
-
-            # Group by bin and sum volume
-            vp_series = recent_df.groupby('Price_Bin')['Volume'].sum()
-
-            # Convert VRVP to list of dicts for JSON
-            volume_profile_list = []
-            for price_level, volume in vp_series.items():
-                volume_profile_list.append({
-                    "price_level": round(price_level, 2),
-                    "volume": int(volume)
-                })
-
-            # 4. STRUCTURE DATA
-            # Slice the last 90 candles for the weekly data output
-            output_df = df.tail(90).copy()
-
-            # Convert weekly candles dataframe to a dictionary keyed by Date
-            candles_dict = {}
-            for index, row in output_df.iterrows():
-                # Handle potentially missing values (NaN) for JSON compliance
-                row_data = row.to_dict()
-                cleaned_row = {k: (None if pd.isna(v) else v) for k, v in row_data.items()}
-
-                date_str = index.strftime('%Y-%m-%d')
-                candles_dict[date_str] = cleaned_row
-
-            # 5. FINAL OBJECT
-            ticker_data = {
-                "ticker": ticker,
-                "last_updated": datetime.now().isoformat(),
-                "weekly_candles": candles_dict,
-                "volume_profile": volume_profile_list,
-                'rsi': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                        output_df['RSI'].items()},
-                "bollinger_bands": {
-                    "high": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                             output_df['BB_High'].items()},
-                    "mid": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                            output_df['BB_Mid'].items()},
-                    "low": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                            output_df['BB_Low'].items()},
-                },
-                'sma20': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                          output_df['SMA_20'].items()},
-                'sma50': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                          output_df['SMA_50'].items()},
-                'sma100': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                           output_df['SMA_100'].items()},
-                'sma150': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                           output_df['SMA_150'].items()},
-                'macd': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                         output_df['MACD'].items()},
-                'macd_signal': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                                output_df['MACD_Signal'].items()},
-                'macd_hist': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
-                              output_df['MACD_Hist'].items()}
-            }
-
-            all_results.append(ticker_data)
+                store.save(ticker, interval, df)
+        for ticker, error in failed.items():
+            print(f"Warning: {error} for {ticker}, using stored bars")
+
+    # 3. Re-adjusted tickers get their whole history replaced
+    if readjusted:
+        print(f"Adjusted prices changed for {', '.join(readjusted)}, downloading full history")
+        fetched, failed = fetch_history(readjusted, period=period, interval=interval, download=download)
+        for ticker, df in fetched.items():
+            store.save(ticker, interval, df, replace=True)
+            store.clear_indicators(ticker, interval)
+        for ticker, error in failed.items():
+            print(f"Warning: {error} for {ticker}, using stored bars")
 
+    start = period_start(period)
+    for ticker in tickers:
+        if ticker in errors:
+            continue
+        df = store.load(ticker, interval, start=start)
+        if df.empty:
+            errors[ticker] = "No data found"
+        else:
+            frames[ticker] = df
+
+    return frames, errors
+
+
+def adjustment_changed(stored, fetched, tolerance=ADJUSTMENT_TOLERANCE):
+    """
+    Whether re-fetched bars disagree with the stored ones on the same dates.
+
+    Args:
+        stored (DataFrame): Closed bars from the bar store.
+        fetched (DataFrame): Freshly downloaded bars covering (some of) the same dates.
+        tolerance (float): Largest relative price difference still treated as equal.
+
+    Returns:
+        bool: True if any shared bar's Open/High/Low/Close moved by more than `tolerance`.
+    """
+    dates = stored.index.intersection(fetched.index)
+    if dates.empty:
+        return False
+    columns = [col for col in ("Open", "High", "Low", "Close") if col in fetched.columns]
+    old = stored.loc[dates, columns].to_numpy(dtype=float)
+    new = fetched.loc[dates, columns].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.abs(new - old) / np.abs(old)
+    return bool(np.nanmax(change, initial=0.0) > tolerance)
+
+
+def calculate_indicators(df):
+    """
+    Adds the RSI, SMA, MACD and Bollinger Band columns to `df` (in place),
+    recomputing them over the whole history with the fused kernel.
+    """
+    values = indicator_matrix(df['Close'].to_numpy(dtype=float))
+    for name in INDICATOR_COLUMNS:
+        df[name] = values[name][0]
+    return df
+
+
+def batch_indicators(frames):
+    """
+    The INDICATOR_COLUMNS for many tickers with one kernel call: the closes are
+    right-aligned into one NaN-padded (tickers, bars) matrix.
+
+    Args:
+        frames (dict): ticker -> bars with a Close column, oldest first.
+
+    Returns:
+        dict: ticker -> DataFrame of INDICATOR_COLUMNS indexed like its bars.
+    """
+    frames = {ticker: df for ticker, df in frames.items() if not df.empty}
+    if not frames:
+        return {}
+    n_bars = max(len(df) for df in frames.values())
+    close = np.full((len(frames), n_bars), np.nan)
+    for row, df in enumerate(frames.values()):
+        close[row, n_bars - len(df):] = df['Close'].to_numpy(dtype=float)
+    values = indicator_matrix(close)
+    return {
+        ticker: pd.DataFrame({name: values[name][row, n_bars - len(df):] for name in INDICATOR_COLUMNS},
+                             index=df.index)
+        for row, (ticker, df) in enumerate(frames.items())
+    }
+
+
+def calculate_atr(df, window=ATR_WINDOW):
+    """
+    Adds the Average True Range column `ATR` to `df` (in place), see `atr_matrix`.
+    """
+    df['ATR'] = atr_matrix(*(df[col].to_numpy(dtype=float) for col in ('High', 'Low', 'Close')), window=window)[0]
+    return df
+
+
+def atr_matrix(high, low, close, window=ATR_WINDOW):
+    """
+    Average True Range for (tickers, bars) arrays - the same values as `ta`'s
+    AverageTrueRange: seeded with the mean of the first `window` true ranges,
+    then Wilder smoothing, NaN before the first full window.
+
+    Args:
+        high, low, close (array): 2-D arrays shaped (tickers, bars), oldest bar first
+                                  (1-D = one ticker). Shorter histories are NaN-padded
+                                  at the start; each ticker is seeded at its first bar.
+        window (int): ATR window.
+
+    Returns:
+        array: (tickers, bars) ATR values.
+    """
+    high, low, close = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (high, low, close))
+    n_tickers, n_bars = close.shape
+    valid = np.isfinite(close)
+    start = np.where(valid.any(axis=1), valid.argmax(axis=1), n_bars)
+    age = np.arange(n_bars) - start[:, None]
+
+    prev_close = np.concatenate([np.full((n_tickers, 1), np.nan), close[:, :-1]], axis=1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    # Seed: mean of the true ranges over each ticker's first `window` bars
+    in_seed = (age >= 0) & (age < window) & np.isfinite(true_range)
+    with np.errstate(invalid="ignore"):
+        seed = np.where(in_seed, true_range, 0.0).sum(axis=1) / in_seed.sum(axis=1)
+
+    # Wilder smoothing - one loop over time, vectorized across tickers
+    atr = np.full((n_tickers, n_bars), np.nan)
+    value = np.full(n_tickers, np.nan)
+    for t in range(n_bars):
+        value = np.where(age[:, t] == window - 1, seed, (value * (window - 1) + true_range[:, t]) / window)
+        atr[:, t] = np.where(age[:, t] >= window - 1, value, np.nan)
+    return atr
+
+
+def _num(value, digits=2):
+    """Rounded float for the summary payload, None for NaN/missing."""
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+
+def _pct(value, base):
+    """`value` relative to `base` in percent (e.g. distance from the close)."""
+    return None if base is None or pd.isna(base) or not base else _num((value / base - 1) * 100)
+
+
+def summarize_features(df, tail=SUMMARY_TAIL):
+    """
+    The decision-relevant facts of one timeframe, computed locally: latest
+    indicator values and slopes, the MA stack and recent crosses, swing
+    highs/lows, ATR and the distance to the Bollinger Bands.
+
+    Args:
+        df (DataFrame): Bars with the INDICATOR_COLUMNS (ATR is added if missing).
+        tail (int): Raw bars appended as a columnar "tail" (none if 0).
+
+    Returns:
+        dict: The feature summary.
+    """
+    if 'ATR' not in df.columns:
+        df = calculate_atr(df.copy())
+    last = df.iloc[-1]
+    close = last['Close']
+
+    def slope(column):
+        # Average change per bar over the last SLOPE_BARS bars, in percent
+        series = df[column].dropna()
+        if len(series) <= SLOPE_BARS:
+            return None
+        return _num((series.iloc[-1] / series.iloc[-1 - SLOPE_BARS] - 1) * 100 / SLOPE_BARS, 3)
+
+    def change(bars):
+        return _pct(close, df['Close'].iloc[-1 - bars]) if len(df) > bars else None
+
+    # MA stack, highest first, e.g. ["close", "sma20", "sma50", "sma150", "sma100"]
+    stack = {"close": close, **{f"sma{n}": last[f"SMA_{n}"] for n in (20, 50, 100, 150)}}
+    ma_stack = [name for name, value in sorted(stack.items(), key=lambda kv: -kv[1]) if not pd.isna(value)]
+
+    crosses = []
+    recent = df.tail(CROSS_LOOKBACK + 1)
+    for name, fast, slow in (("close/sma50", "Close", "SMA_50"), ("sma20/sma50", "SMA_20", "SMA_50"),
+                             ("sma50/sma150", "SMA_50", "SMA_150"), ("macd/signal", "MACD", "MACD_Signal")):
+        above = (recent[fast] > recent[slow]).where(recent[slow].notna())
+        flips = above.ne(above.shift()) & above.notna() & above.shift().notna()
+        for date in recent.index[flips.to_numpy()]:
+            bars_ago = len(recent) - 1 - recent.index.get_loc(date)
+            crosses.append({"cross": name, "direction": "bullish" if above[date] else "bearish",
+                            "date": date.strftime('%Y-%m-%d'), "bars_ago": bars_ago})
+    crosses.sort(key=lambda c: c["bars_ago"])
+
+    bb_width = last['BB_High'] - last['BB_Low']
+    volume_avg = df['Volume'].tail(20).mean()
+    summary = {
+        "last_bar": {"date": df.index[-1].strftime('%Y-%m-%d'),
+                     **{col.lower(): _num(last[col]) for col in OHLCV_COLUMNS}},
+        "change_pct": {f"{bars}_bars": change(bars) for bars in (1, 4, 13)},
+        "indicators": {field: _num(last[col], 3) for field, col in COLUMNAR_FIELDS.items()
+                       if col in INDICATOR_COLUMNS + ['ATR']},
+        "slopes_pct_per_bar": {f"sma{n}": slope(f"SMA_{n}") for n in (20, 50, 150)},
+        "rsi_change": _num(last['RSI'] - df['RSI'].iloc[-1 - SLOPE_BARS]) if len(df) > SLOPE_BARS else None,
+        "macd_hist_change": _num(last['MACD_Hist'] - df['MACD_Hist'].iloc[-1 - SLOPE_BARS], 3)
+        if len(df) > SLOPE_BARS else None,
+        "ma_stack": ma_stack,
+        "crosses": crosses,
+        "bollinger": {
+            "percent_b": _num((close - last['BB_Low']) / bb_width, 3) if bb_width else None,
+            "to_high_pct": _pct(last['BB_High'], close),
+            "to_low_pct": _pct(last['BB_Low'], close),
+            "width_pct": _num(bb_width / last['BB_Mid'] * 100) if last['BB_Mid'] else None,
+        },
+        "atr_pct": _num(last['ATR'] / close * 100) if close else None,
+        "volume_vs_avg20": _num(last['Volume'] / volume_avg) if volume_avg else None,
+        "swing_highs": swing_highs(df),
+        "swing_lows": swing_lows(df),
+    }
+    if tail:
+        output_df = df.tail(tail)
+        series = {"date": output_df.index.strftime('%Y-%m-%d').tolist()}
+        for col in OHLCV_COLUMNS:
+            series[col.lower()] = [_num(v) for v in output_df[col]]
+        summary["tail"] = series
+    return summary
+
+
+def summary_levels(close, profile, features):
+    """
+    Volume profile levels with their distance from the close, and the nearest
+    support below / resistance above it (value area, POC, Bollinger Bands, swing points).
+    """
+    candidates = {
+        "poc": profile["poc"],
+        "value_area_high": profile["value_area_high"],
+        "value_area_low": profile["value_area_low"],
+        "bb_high": features["indicators"].get("bb_high"),
+        "bb_low": features["indicators"].get("bb_low"),
+        **{f"swing_low {p['date']}": p["low"] for p in features["swing_lows"]},
+        **{f"swing_high {p['date']}": p["high"] for p in features["swing_highs"]},
+    }
+    below = [(close - price, name, price) for name, price in candidates.items() if price is not None and price <= close]
+    above = [(price - close, name, price) for name, price in candidates.items() if price is not None and price > close]
+
+    def level(found):
+        _, name, price = min(found)
+        return {"price": price, "source": name, "distance_pct": _pct(price, close)}
+
+    return {
+        "volume_profile": {key: {"price": profile[key], "distance_pct": _pct(profile[key], close)
+                                 if profile[key] is not None else None}
+                           for key in ("poc", "value_area_high", "value_area_low")},
+        "nearest_support": level(below) if below else None,
+        "nearest_resistance": level(above) if above else None,
+    }
+
+
+def analyze_frame(ticker, df, profile_bins=50, profile_lookback=90, payload_format="records", indicators=None,
+                  summary_tail=SUMMARY_TAIL):
+    """
+    Calculates the indicators and volume profile for one ticker's bars and
+    shapes them into the per-ticker analysis dict.
+
+    Module-level (and free of shared state) so it can run in a worker process.
+
+    Args:
+        indicators (DataFrame): Precomputed INDICATOR_COLUMNS for `df`'s index
+                                (e.g. from the incremental engine); computed with the kernel if None.
+        summary_tail (int): Raw bars kept in the "summary" payload.
+
+    Returns:
+        dict: The analysis, or None if there are no bars.
+    """
+    df = df.copy()
+
+    # 2. CALCULATE INDICATORS
+    if indicators is None:
+        calculate_indicators(df)
+    else:
+        df = df.join(indicators[INDICATOR_COLUMNS])
+
+    # 3. CALCULATE VOLUME PROFILE (VRVP Approx)
+    # Use the last `profile_lookback` weeks to keep it relevant to current price action.
+    # Each week's volume is spread over its High-Low range.
+    if df.empty:
+        return None
+
+    profile = volume_profile(df['High'], df['Low'], df['Volume'],
+                             bins=profile_bins, lookback=profile_lookback)
+
+    # 4. STRUCTURE DATA
+    # Slice the last 90 candles for the weekly data output
+    output_df = df.tail(90).copy()
+
+    volume_profile_levels = {
+        "poc": profile["poc"],
+        "value_area_high": profile["value_area_high"],
+        "value_area_low": profile["value_area_low"],
+    }
+
+    if payload_format == "summary":
+        # Features computed here instead of raw candles; the profile keeps only its levels
+        features = summarize_features(df, tail=summary_tail)
+        ticker_data = {
+            "ticker": ticker,
+            "last_updated": datetime.now().isoformat(),
+            "payload_format": "summary",
+            "weekly": features,
+            "levels": summary_levels(df['Close'].iloc[-1], profile, features),
+        }
+    elif payload_format == "columnar":
+        # One shared date index plus one array per field
+        ticker_data = {
+            "ticker": ticker,
+            "last_updated": datetime.now().isoformat(),
+            "payload_format": "columnar",
+            "volume_profile": profile["bins"],
+            "volume_profile_levels": volume_profile_levels,
+            "weekly": columnar_series(output_df),
+        }
+    else:
+        # 5. FINAL OBJECT
+        ticker_data = {
+            "ticker": ticker,
+            "last_updated": datetime.now().isoformat(),
+            "weekly_candles": records_series(output_df),
+            "volume_profile": profile["bins"],
+            "volume_profile_levels": volume_profile_levels,
+            'rsi': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                    output_df['RSI'].items()},
+            "bollinger_bands": {
+                "high": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                         output_df['BB_High'].items()},
+                "mid": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                        output_df['BB_Mid'].items()},
+                "low": {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                        output_df['BB_Low'].items()},
+            },
+            'sma20': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                      output_df['SMA_20'].items()},
+            'sma50': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                      output_df['SMA_50'].items()},
+            'sma100': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                       output_df['SMA_100'].items()},
+            'sma150': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                       output_df['SMA_150'].items()},
+            'macd': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                     output_df['MACD'].items()},
+            'macd_signal': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                            output_df['MACD_Signal'].items()},
+            'macd_hist': {idx.strftime('%Y-%m-%d'): (None if pd.isna(val) else float(val)) for idx, val in
+                          output_df['MACD_Hist'].items()}
+        }
+
+    return ticker_data
+
+
+def analyze_timeframes(ticker, bars, profile_bins=50, profile_lookback=90, payload_format="records",
+                       indicators=None, summary_tail=SUMMARY_TAIL):
+    """
+    Multi-timeframe analysis of one ticker from its daily bars.
+
+    The weekly part (candles, indicators, volume profile) is the same payload
+    `analyze_frame` builds. On top of it come the last daily and monthly bars
+    with the same indicators, the daily ATR and the recent daily swing lows
+    (stop inputs based on intraday lows).
+
+    Module-level (and free of shared state) so it can run in a worker process.
+
+    Args:
+        bars (dict): Timeframe -> bars, as returned by `timeframe_bars`.
+        indicators (dict): Timeframe -> precomputed INDICATOR_COLUMNS (e.g. from the
+                           incremental engine); computed with the kernel when missing.
+        summary_tail (int): Raw daily bars kept in the "summary" payload.
+
+    Returns:
+        dict: The analysis, or None if there are no bars.
+    """
+    indicators = indicators or {}
+    ticker_data = analyze_frame(ticker, bars["weekly"], profile_bins, profile_lookback, payload_format,
+                                indicators.get("weekly"), summary_tail=0)
+    if ticker_data is None:
+        return None
+
+    for name, tail in TIMEFRAME_TAIL.items():
+        df = bars[name].copy()
+        if indicators.get(name) is None:
+            calculate_indicators(df)
+        else:
+            df = df.join(indicators[name][INDICATOR_COLUMNS])
+        if name == "daily":
+            calculate_atr(df)
+            daily = df
+        output_df = df.tail(tail)
+        if payload_format == "summary":
+            # The daily summary carries the ATR, swing lows and the raw tail for stop placement
+            ticker_data[name] = summarize_features(df, tail=summary_tail if name == "daily" else 0)
+        elif payload_format == "columnar":
+            ticker_data[name] = columnar_series(output_df)
+        else:
+            ticker_data[f"{name}_candles"] = records_series(output_df)
+    if payload_format == "summary":
+        return ticker_data
+
+    atr, close = daily['ATR'].iloc[-1], daily['Close'].iloc[-1]
+    ticker_data["daily_atr"] = {
+        "window": ATR_WINDOW,
+        "atr": None if pd.isna(atr) else round(float(atr), 4),
+        "atr_pct": None if pd.isna(atr) or not close else round(float(atr / close * 100), 2),
+    }
+    ticker_data["swing_lows"] = swing_lows(daily)
+    return ticker_data
+
+
+@instrumentation.traced("indicators")
+def get_technical_analysis_json(tickers, download=None, store=None, refresh=False,
+                                profile_bins=50, profile_lookback=90, payload_format="records", workers=None,
+                                incremental=False, multi_timeframe=False, summary_tail=SUMMARY_TAIL,
+                                frames=None, indicator_states=None):
+    """
+    Fetches market data, calculates technical indicators (RSI, MACD, SMA, VRVP),
+    and returns a JSON-serializable analysis per ticker.
+
+    Market data comes from the local bar store; only missing bars are fetched,
+    with one grouped download. Symbols that fail or come back empty are
+    reported and skipped.
+
+    Args:
+        tickers (list): A list of ticker symbols strings, e.g. ["AAPL", "NVDA"]
+        download (callable): Optional stand-in for `yf.download` (same signature).
+        store (BarStore): Bar store to use, defaults to `BarStore()`.
+        refresh (bool): Re-download the full history instead of only new bars.
+        profile_bins (int): Number of price bins in the volume profile.
+        profile_lookback (int): Number of recent weeks the volume profile covers.
+        payload_format (str): "records" for the date-keyed candle/indicator dicts,
+                              "columnar" for one date list plus one array per field,
+                              "summary" for locally computed features instead of the series.
+        workers (int): Compute indicators in this many worker processes (serial if None/1).
+                       Results keep the input order; a failing ticker only drops itself.
+        incremental (bool): Update indicators from the state persisted in the bar store
+                            (only new bars are processed) instead of recomputing them. Otherwise
+                            all tickers go through one `batch_indicators` call.
+        multi_timeframe (bool): Download daily bars instead of weekly ones and derive the
+                                weekly and monthly bars from them (see `analyze_timeframes`).
+        summary_tail (int): Raw bars appended to the "summary" payload (0 = none).
+        frames (dict): Bars the caller already loaded with `load_history` (ticker -> DataFrame,
+                       daily with `multi_timeframe`, weekly otherwise). Nothing is downloaded;
+                       tickers missing from it are skipped.
+        indicator_states (dict): In-memory indicator states for the incremental engine
+                                 (the `states` of `indicator_state.update_indicators`).
+
+    Returns:
+        list: One analysis dict per ticker that had data.
+    """
+    return list(iter_technical_analysis(
+        tickers, download=download, store=store, refresh=refresh, profile_bins=profile_bins,
+        profile_lookback=profile_lookback, payload_format=payload_format, workers=workers,
+        incremental=incremental, multi_timeframe=multi_timeframe, summary_tail=summary_tail,
+        frames=frames, indicator_states=indicator_states
+    ))
+
+
+def iter_technical_analysis(tickers, download=None, store=None, refresh=False,
+                            profile_bins=50, profile_lookback=90, payload_format="records", workers=None,
+                            incremental=False, multi_timeframe=False, summary_tail=SUMMARY_TAIL,
+                            frames=None, indicator_states=None):
+    """
+    Generator version of `get_technical_analysis_json` (same arguments): the
+    bars are fetched up front, then each ticker's analysis is yielded as soon
+    as it is computed, in input order.
+    """
+    if payload_format not in PAYLOAD_FORMATS:
+        raise ValueError(f"Unknown payload format: {payload_format}")
+
+    print(f"Starting analysis for: {tickers}")
+
+    # 1. FETCH DATA
+    # Fetch 5 years of weekly data (or daily data to resample) to ensure enough data for calculations
+    store = store or BarStore()
+    interval = "1d" if multi_timeframe else "1wk"
+    if frames is not None:
+        errors = {ticker: "No data found" for ticker in tickers if ticker not in frames}
+    else:
+        with instrumentation.span("indicators.fetch", tickers=len(tickers)):
+            frames, errors = load_history(tickers, period="5y", interval=interval, download=download,
+                                          store=store, refresh=refresh)
+    for ticker, error in errors.items():
+        print(f"Warning: {error} for {ticker}")
+
+    compute_args = (profile_bins, profile_lookback, payload_format)
+    ready = [ticker for ticker in tickers if ticker in frames]
+    bars = {}
+    if multi_timeframe:
+        for ticker in ready:
+            try:
+                bars[ticker] = timeframe_bars(frames[ticker])
+            except Exception as e:
+                print(f"Error processing {ticker}: {str(e)}")
+        ready = [ticker for ticker in ready if ticker in bars]
+
+    # Without the incremental engine every ticker's indicators come from one kernel call per timeframe
+    batch = {}
+    if not incremental:
+        with instrumentation.span("indicators.batch", tickers=len(ready)):
+            if multi_timeframe:
+                batch = {name: batch_indicators({t: bars[t][name] for t in ready}) for name in TIMEFRAMES}
+            else:
+                batch = batch_indicators({t: frames[t] for t in ready})
+
+    def job(ticker):
+        """The analysis function and its arguments for one ticker."""
+        # Incremental indicators only touch new bars, so they are updated here against the store
+        if not multi_timeframe:
+            indicators = batch.get(ticker)
+            if incremental:
+                with instrumentation.span("indicators.incremental", ticker=ticker):
+                    indicators = update_indicators(ticker, frames[ticker], store, interval="1wk",
+                                                   states=indicator_states)
+            return analyze_frame, (ticker, frames[ticker], *compute_args, indicators, summary_tail)
+
+        indicators = {name: batch[name].get(ticker) for name in TIMEFRAMES} if batch else None
+        if incremental:
+            with instrumentation.span("indicators.incremental", ticker=ticker):
+                indicators = {name: update_indicators(ticker, bars[ticker][name], store, interval=key,
+                                                      states=indicator_states)
+                              for name, (key, _) in TIMEFRAMES.items()}
+        return analyze_timeframes, (ticker, bars[ticker], *compute_args, indicators, summary_tail)
+
+    if workers and workers > 1 and len(ready) > 1:
+        # 2. CALCULATE INDICATORS in worker processes, results kept in input order
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for ticker in ready:
+                try:
+                    func, args = job(ticker)
+                    futures.append((ticker, pool.submit(func, *args)))
+                except Exception as e:
+                    print(f"Error processing {ticker}: {str(e)}")
+            for ticker, future in futures:
+                try:
+                    with instrumentation.span("indicators.wait", ticker=ticker):
+                        ticker_data = future.result()
+                except Exception as e:
+                    print(f"Error processing {ticker}: {str(e)}")
+                    continue
+                if ticker_data is not None:
+                    yield ticker_data
+        return
+
+    for ticker in ready:
+        try:
+            print(f"Processing {ticker}...")
+            func, args = job(ticker)
+            with instrumentation.span("indicators.compute", ticker=ticker):
+                ticker_data = func(*args)
         except Exception as e:
             print(f"Error processing {ticker}: {str(e)}")
             continue
-
-    return all_results
\ No newline at end of file
+        if ticker_data is not None:
+            yield ticker_data
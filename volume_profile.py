@@ -0,0 +1,147 @@
+import numpy as np
+
+
+def volume_profiles(high, low, volume, bins=50, lookback=None, value_area=0.70):
+    """
+    Builds volume profiles (VRVP) for many tickers at once.
+
+    Each bar's volume is spread uniformly over its High-Low range, so a wide
+    bar contributes to every price bin it traded through. The work is done with
+    bincount over flattened (ticker, bin) slots - no Python loop per bar or ticker.
+
+    Args:
+        high, low, volume (array): 2-D arrays shaped (tickers, bars). NaN bars are ignored,
+                                   so histories of different lengths can be NaN-padded.
+        bins (int): Number of price bins per ticker.
+        lookback (int): Only use the last `lookback` bars (all bars if None).
+        value_area (float): Share of total volume the value area must contain.
+
+    Returns:
+        dict: Arrays per ticker - "edges" (tickers, bins + 1), "volume" (tickers, bins),
+              "poc", "value_area_high", "value_area_low" (tickers,), NaN for tickers
+              without usable bars.
+    """
+    high = np.atleast_2d(np.asarray(high, dtype=float))
+    low = np.atleast_2d(np.asarray(low, dtype=float))
+    volume = np.atleast_2d(np.asarray(volume, dtype=float))
+    if lookback:
+        high, low, volume = high[:, -lookback:], low[:, -lookback:], volume[:, -lookback:]
+
+    n_tickers = high.shape[0]
+    valid = np.isfinite(high) & np.isfinite(low) & np.isfinite(volume) & (volume > 0)
+    # Tolerate bars with High/Low swapped
+    high, low = np.maximum(high, low), np.minimum(high, low)
+
+    with np.errstate(invalid="ignore"):
+        price_min = np.nanmin(np.where(valid, low, np.nan), axis=1, initial=np.inf)
+        price_max = np.nanmax(np.where(valid, high, np.nan), axis=1, initial=-np.inf)
+    empty = ~np.isfinite(price_min)
+    price_min[empty], price_max[empty] = 0.0, 0.0
+
+    bin_size = (price_max - price_min) / bins
+    bin_size[bin_size == 0] = 1.0
+    edges = price_min[:, None] + bin_size[:, None] * np.arange(bins + 1)
+
+    # Bar positions in bin units, [0, bins]
+    pos_low = np.where(valid, (low - price_min[:, None]) / bin_size[:, None], 0.0)
+    pos_high = np.where(valid, (high - price_min[:, None]) / bin_size[:, None], 0.0)
+    first_bin = np.clip(np.floor(pos_low).astype(int), 0, bins - 1)
+    last_bin = np.clip(np.floor(pos_high).astype(int), 0, bins - 1)
+    vol = np.where(valid, volume, 0.0)
+
+    span = pos_high - pos_low
+    single = first_bin == last_bin
+    with np.errstate(divide="ignore", invalid="ignore"):
+        density = np.where(single, 0.0, vol / span)
+
+    # Partial first/last bins get their exact overlap; bars inside one bin put everything there
+    first_share = np.where(single, vol, density * (first_bin + 1 - pos_low))
+    last_share = np.where(single, 0.0, density * (pos_high - last_bin))
+
+    slots = bins + 1
+    offset = (np.arange(n_tickers) * slots)[:, None]
+    size = n_tickers * slots
+
+    direct = np.bincount((offset + first_bin).ravel(), weights=first_share.ravel(), minlength=size)
+    direct += np.bincount((offset + last_bin).ravel(), weights=last_share.ravel(), minlength=size)
+
+    # Fully covered interior bins: +density from first_bin + 1 until last_bin (difference array)
+    interior = np.bincount((offset + first_bin + 1).ravel(), weights=density.ravel(), minlength=size)
+    interior -= np.bincount((offset + last_bin).ravel(), weights=density.ravel(), minlength=size)
+
+    direct = direct.reshape(n_tickers, slots)[:, :bins]
+    interior = np.cumsum(interior.reshape(n_tickers, slots), axis=1)[:, :bins]
+    profile = direct + interior
+
+    poc, va_high, va_low = _value_area(profile, edges, value_area)
+    poc[empty], va_high[empty], va_low[empty] = np.nan, np.nan, np.nan
+    return {
+        "edges": edges,
+        "volume": profile,
+        "poc": poc,
+        "value_area_high": va_high,
+        "value_area_low": va_low,
+    }
+
+
+def _value_area(profile, edges, value_area):
+    """
+    Point of control (middle of the highest-volume bin) and the value area,
+    taken as the span of the highest-volume bins that together hold `value_area`
+    of the total volume.
+    """
+    rows = np.arange(profile.shape[0])
+    poc_bin = np.argmax(profile, axis=1)
+    poc = (edges[rows, poc_bin] + edges[rows, poc_bin + 1]) / 2
+
+    order = np.argsort(-profile, axis=1, kind="stable")
+    sorted_volume = np.take_along_axis(profile, order, axis=1)
+    total = profile.sum(axis=1, keepdims=True)
+    # A bin is in the value area if the volume before it has not reached the target yet
+    before = np.cumsum(sorted_volume, axis=1) - sorted_volume
+    selected = before < value_area * total
+    selected[:, 0] = True
+
+    in_area = np.zeros_like(selected)
+    np.put_along_axis(in_area, order, selected, axis=1)
+    bin_index = np.arange(profile.shape[1])
+    low_bin = np.where(in_area, bin_index, profile.shape[1]).min(axis=1)
+    high_bin = np.where(in_area, bin_index, -1).max(axis=1)
+
+    return poc, edges[rows, high_bin + 1], edges[rows, low_bin]
+
+
+def volume_profile(high, low, volume, bins=50, lookback=90, value_area=0.70):
+    """
+    Volume profile for a single ticker, shaped for the JSON payload.
+
+    Args:
+        high, low, volume (array): 1-D price/volume series (e.g. DataFrame columns).
+        bins (int): Number of price bins.
+        lookback (int): Only use the last `lookback` bars.
+        value_area (float): Share of total volume the value area must contain.
+
+    Returns:
+        dict: "bins" (list of {"price_level", "volume"} for non-empty bins, price_level
+              being the bin floor), "poc", "value_area_high" and "value_area_low"
+              (None when there is no usable bar).
+    """
+    result = volume_profiles(
+        np.asarray(high, dtype=float)[None, :],
+        np.asarray(low, dtype=float)[None, :],
+        np.asarray(volume, dtype=float)[None, :],
+        bins=bins, lookback=lookback, value_area=value_area
+    )
+    edges, profile = result["edges"][0], result["volume"][0]
+
+    filled = profile > 0
+    bins_list = [
+        {"price_level": price_level, "volume": vol}
+        for price_level, vol in zip(np.round(edges[:-1][filled], 2).tolist(),
+                                    np.rint(profile[filled]).astype(np.int64).tolist())
+    ]
+    levels = {key: result[key][0] for key in ("poc", "value_area_high", "value_area_low")}
+    return {
+        "bins": bins_list,
+        **{key: (None if np.isnan(val) else round(float(val), 2)) for key, val in levels.items()},
+    }